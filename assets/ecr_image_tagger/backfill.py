@@ -0,0 +1,286 @@
+"""
+Backfill ``deployed-at-`` tags on images that are already running.
+
+The Lambda only tags images when a service reaches steady state, so a
+service that enabled ``enable_ecr_image_tagging`` late has no deployed
+tags on the images it runs today, and an ECR lifecycle policy may expire
+them. This command scans the running tasks of every service of one or
+more ECS clusters, finds the image digests their containers run, and tags
+them the way the Lambda would: the same image parser, the same skip of
+images that already have a tag with the prefix, and the same
+per-repository batching.
+
+Run it with credentials for the account that owns the clusters::
+
+    python assets/ecr_image_tagger/backfill.py --cluster my-cluster --dry-run
+
+It exits non-zero if any image could not be tagged.
+"""
+
+import argparse
+import logging
+import sys
+import threading
+import time
+
+import main as tagger
+import metrics
+import retry
+from clients import get_client
+from image_ref import parse_image
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_TAG_PREFIX = "deployed-at-"
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RATE = 5.0
+
+# DescribeTasks accepts at most this many tasks per call.
+DESCRIBE_TASKS_BATCH = 100
+
+
+class RateLimiter:
+    """Token bucket shared by all worker threads.
+
+    :param rate: Calls per second allowed on average.
+    :param burst: Calls allowed back to back after an idle period.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self._interval = 1 / rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a call is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._burst, self._tokens + (now - self._updated) / self._interval
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self._interval
+            time.sleep(wait)
+
+
+class RateLimitedRetrier(retry.AdaptiveRetrier):
+    """An :class:`~retry.AdaptiveRetrier` whose every attempt takes a token.
+
+    :param limiter: Rate limiter shared by all calls.
+    :param kwargs: Other :class:`~retry.AdaptiveRetrier` arguments.
+    """
+
+    def __init__(self, limiter: RateLimiter, **kwargs):
+        super().__init__(**kwargs)
+        self._limiter = limiter
+
+    def call(self, func, *args, **kwargs):
+        def _limited(*limited_args, **limited_kwargs):
+            self._limiter.acquire()
+            return func(*limited_args, **limited_kwargs)
+
+        return super().call(_limited, *args, **kwargs)
+
+
+def running_images(
+    ecs_client, cluster: str, retrier: retry.AdaptiveRetrier
+) -> list[str]:
+    """Return the images that the services of a cluster run now.
+
+    The task definitions may reference mutable tags, which can point to
+    another image by now, so the digest comes from each running
+    container's ``imageDigest``. During a rollout the tasks of both the
+    old and the new deployment are running. Tasks that were not started
+    by a service, and containers whose image is not pulled yet, are
+    skipped.
+
+    :param ecs_client: Boto3 ECS client.
+    :param cluster: ECS cluster name or ARN.
+    :param retrier: Retries throttled ECS calls.
+    :return: Image URIs pinned by digest, without duplicates.
+    """
+    task_arns = list(
+        _paginate(
+            ecs_client.list_tasks,
+            "taskArns",
+            retrier,
+            cluster=cluster,
+            desiredStatus="RUNNING",
+        )
+    )
+
+    images = []
+    for start in range(0, len(task_arns), DESCRIBE_TASKS_BATCH):
+        tasks = retrier.call(
+            ecs_client.describe_tasks,
+            cluster=cluster,
+            tasks=task_arns[start : start + DESCRIBE_TASKS_BATCH],
+        )["tasks"]
+        for task in tasks:
+            if not task.get("group", "").startswith("service:"):
+                continue
+            for container in task.get("containers", []):
+                ref = parse_image(container.get("image", ""))
+                digest = container.get("imageDigest")
+                if ref is None or not digest:
+                    LOG.debug("Skipping container %s", container.get("name"))
+                    continue
+                uri = ref.with_digest(digest)
+                if uri not in images:
+                    images.append(uri)
+    LOG.info(
+        "Cluster %s: %d running task(s), %d image(s)",
+        cluster,
+        len(task_arns),
+        len(images),
+    )
+    return images
+
+
+def _paginate(method, key: str, retrier: retry.AdaptiveRetrier, **kwargs):
+    """Yield the items of every page of a paginated ECS call.
+
+    Unlike a boto3 paginator, each page is requested through the retrier,
+    so it waits for the rate limiter like every other call.
+
+    :param method: Boto3 client method that takes and returns ``nextToken``.
+    :param key: Response key of the items.
+    :param retrier: Retries throttled calls.
+    :param kwargs: Arguments of the call.
+    """
+    while True:
+        page = retrier.call(method, **kwargs)
+        yield from page[key]
+        if not page.get("nextToken"):
+            return
+        kwargs["nextToken"] = page["nextToken"]
+
+
+def backfill(
+    clusters: list[str],
+    tag_prefix: str = DEFAULT_TAG_PREFIX,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    rate: float = DEFAULT_RATE,
+    dry_run: bool = False,
+    region: str = None,
+) -> tuple[list[str], list[str]]:
+    """Tag the images running in the given clusters.
+
+    :param clusters: ECS cluster names or ARNs.
+    :param tag_prefix: Prefix of deployed tags; images that already have
+        one are skipped.
+    :param max_workers: Maximum number of repositories processed
+        concurrently.
+    :param rate: Maximum AWS API calls per second, across all workers.
+    :param dry_run: Report what would be tagged without tagging.
+    :param region: Region of the clusters. ``None`` means the default.
+    :return: Tagged (or, in a dry run, to-be-tagged) image URIs, and
+        error messages for images that could not be tagged.
+    """
+    # The retrier owns the retries, so every attempt takes a token.
+    ecs_client = get_client("ecs", region=region, max_attempts=1)
+    retrier = RateLimitedRetrier(RateLimiter(rate, burst=max_workers))
+
+    image_uris = []
+    for cluster in clusters:
+        for uri in running_images(ecs_client, cluster, retrier):
+            if uri not in image_uris:
+                image_uris.append(uri)
+
+    images_by_repo = tagger.group_ecr_images(image_uris)
+    LOG.info(
+        "%d image(s) in %d ECR repositories%s",
+        sum(len(refs) for refs in images_by_repo.values()),
+        len(images_by_repo),
+        " (dry run)" if dry_run else "",
+    )
+    return tagger.tag_all_repos(
+        images_by_repo,
+        tagger.deployed_tag_now(tag_prefix),
+        tag_prefix,
+        max_workers,
+        metrics.InvocationTimer(),
+        retrier,
+        dry_run,
+    )
+
+
+def _parse_args(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Tag ECR images that ECS services are running now "
+        "with a deployed tag, as the ECR image tagger Lambda would."
+    )
+    parser.add_argument(
+        "--cluster",
+        dest="clusters",
+        action="append",
+        required=True,
+        help="ECS cluster name or ARN. Repeat for several clusters.",
+    )
+    parser.add_argument("--region", help="Region of the clusters.")
+    parser.add_argument(
+        "--tag-prefix",
+        default=DEFAULT_TAG_PREFIX,
+        help="Deployed tag prefix, as in deployed_image_tag_prefix. "
+        "Default: %(default)s",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Repositories processed concurrently. Default: %(default)s",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help="Maximum AWS API calls per second. Default: %(default)s",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show the images that would be tagged, without tagging them.",
+    )
+    parser.add_argument("--debug", action="store_true", help="Debug logging.")
+    args = parser.parse_args(argv)
+    if args.max_workers < 1 or args.rate <= 0:
+        parser.error("--max-workers and --rate must be positive")
+    return args
+
+
+def main(argv: list[str] = None) -> int:
+    """Command line entry point.
+
+    :return: Process exit code.
+    """
+    args = _parse_args(argv)
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    tagger.setup_logging(args.debug)
+
+    tagged, errors = backfill(
+        args.clusters,
+        tag_prefix=args.tag_prefix,
+        max_workers=args.max_workers,
+        rate=args.rate,
+        dry_run=args.dry_run,
+        region=args.region,
+    )
+    for uri in tagged:
+        print(f"{'would tag' if args.dry_run else 'tagged'} {uri}")
+    LOG.info(
+        "%s %d image(s), %d error(s).",
+        "Would tag" if args.dry_run else "Tagged",
+        len(tagged),
+        len(errors),
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Process-wide boto3 clients for the ECR image tagger.
+
+Lambda keeps the Python process alive between invocations of a warm
+container. Creating a boto3 session loads credentials and service models,
+and every new client opens its own connection pool, so each invocation
+used to pay for fresh TLS handshakes to ECS and ECR. Clients created here
+are cached per ``(service, region)`` for the life of the process and reused
+by every invocation and every worker thread.
+
+boto3 is imported when the first client is created, not at module import:
+it is the bulk of the tagger's cold import time, and an event for another
+cluster never needs it.
+"""
+
+import logging
+import threading
+
+LOG = logging.getLogger(__name__)
+
+# botocore's default is 10. Each cached client is shared by all tagger
+# worker threads, so size its pool for the largest allowed worker count.
+MAX_POOL_CONNECTIONS = 16
+
+# ECR throttling and transport errors are retried by the tagger itself (see
+# :mod:`retry`), within the Lambda's remaining time; botocore's own retries
+# would multiply the attempts. Other services keep botocore's defaults.
+# botocore's ``max_attempts`` counts retries only; ``total_max_attempts``
+# includes the first attempt.
+_RETRIES = {"ecr": {"mode": "standard", "total_max_attempts": 1}}
+
+_LOCK = threading.Lock()
+_SESSION = None
+_CLIENTS = {}
+
+
+def get_client(service_name: str, region: str = None, max_attempts: int = None):
+    """Return a cached boto3 client for a service in a region.
+
+    Safe to call from multiple threads: ``boto3.Session`` is not
+    thread-safe, so client creation is serialized. The returned clients
+    themselves are thread-safe.
+
+    :param service_name: AWS service name, e.g. ``"ecr"``.
+    :param region: AWS region. ``None`` means the Lambda's own region.
+    :param max_attempts: botocore attempts per call, the first one included,
+        for a caller that retries by itself. ``None`` means the service
+        default above.
+    :return: A boto3 client.
+    """
+    key = (service_name, region, max_attempts)
+    client = _CLIENTS.get(key)
+    if client is not None:
+        return client
+
+    # pylint: disable=import-outside-toplevel
+    import boto3
+    from botocore.config import Config
+
+    global _SESSION  # pylint: disable=global-statement
+    with _LOCK:
+        if key not in _CLIENTS:
+            if _SESSION is None:
+                _SESSION = boto3.Session()
+            _CLIENTS[key] = _SESSION.client(
+                service_name,
+                region_name=region,
+                config=Config(
+                    max_pool_connections=MAX_POOL_CONNECTIONS,
+                    retries=(
+                        _RETRIES.get(service_name)
+                        if max_attempts is None
+                        else {"mode": "standard", "total_max_attempts": max_attempts}
+                    ),
+                ),
+            )
+            LOG.debug(
+                "Created %s client in %s region",
+                service_name,
+                _CLIENTS[key].meta.region_name,
+            )
+        return _CLIENTS[key]
+
+
+def reset() -> None:
+    """Drop the cached session and clients, as a cold start would."""
+    global _SESSION  # pylint: disable=global-statement
+    with _LOCK:
+        _SESSION = None
+        _CLIENTS.clear()
@@ -0,0 +1,144 @@
+"""
+Dedup cache for task definitions whose images were already tagged.
+
+ECS fires SERVICE_STEADY_STATE every few hours even when nothing was
+deployed. A task definition ARN includes its revision, but a revision's
+images stay the same only if they are pinned by digest: a mutable tag such
+as ``app:latest`` can be pushed again and rolled out under the same
+revision by a forced new deployment. So a task definition is remembered by
+its ARN only when every ECR image in it is pinned, and otherwise by the
+digests its tags resolved to (see :func:`digest_key`). Once a key has been
+tagged every later event for it is a no-op. The cache answers that from a
+warm container's memory, or, after a cold start, with one SSM
+``GetParameter`` call per invocation (see :class:`StoredKey`).
+"""
+
+import logging
+from collections import OrderedDict
+
+from clients import get_client
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAXSIZE = 32
+
+
+class TaskDefinitionCache:
+    """LRU of tagged task definitions with an optional SSM backing store.
+
+    Entries are keys: a task definition ARN, or a :func:`digest_key`. The
+    in-memory part survives warm invocations of the same Lambda
+    container. The SSM parameter, when given, holds the last tagged key
+    and survives cold starts.
+
+    :param maxsize: Maximum number of keys kept in memory.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self._maxsize = maxsize
+        self._keys = OrderedDict()
+
+    def seen(self, key: str, stored: "StoredKey" = None) -> bool:
+        """Return ``True`` if the key was already tagged.
+
+        :param key: Full task definition ARN, including revision, of a task
+            definition whose images are all pinned; or a :func:`digest_key`.
+        :param stored: The last tagged key in SSM. If ``None``, only the
+            in-memory cache is consulted.
+        """
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return True
+
+        if stored is not None and stored.value == key:
+            self._remember_locally(key)
+            return True
+
+        return False
+
+    def remember(self, key: str, stored: "StoredKey" = None) -> None:
+        """Record that the images behind the key were tagged.
+
+        :param key: See :meth:`seen`.
+        :param stored: Where to store the key in SSM. If ``None``, the key
+            is only kept in memory.
+        """
+        self._remember_locally(key)
+        if stored is not None:
+            stored.store(key)
+
+    def clear(self) -> None:
+        """Forget every key held in memory."""
+        self._keys.clear()
+
+    def _remember_locally(self, key: str) -> None:
+        self._keys[key] = True
+        self._keys.move_to_end(key)
+        while len(self._keys) > self._maxsize:
+            self._keys.popitem(last=False)
+
+
+class StoredKey:
+    """The last tagged key, kept in an SSM parameter.
+
+    Create one per invocation: the parameter is read at most once, however
+    many keys the invocation checks against it.
+
+    :param parameter_name: SSM parameter name.
+    """
+
+    _UNREAD = object()
+
+    def __init__(self, parameter_name: str):
+        self.parameter_name = parameter_name
+        self._value = self._UNREAD
+
+    @property
+    def value(self) -> str | None:
+        """The stored key, or ``None`` if the parameter does not exist."""
+        if self._value is self._UNREAD:
+            self._value = _get_parameter(self.parameter_name)
+        return self._value
+
+    def store(self, key: str) -> None:
+        """Overwrite the stored key.
+
+        :param key: See :meth:`TaskDefinitionCache.seen`.
+        """
+        get_client("ssm").put_parameter(
+            Name=self.parameter_name,
+            Value=key,
+            Type="String",
+            Overwrite=True,
+        )
+        self._value = key
+
+
+def digest_key(digests: list[str]) -> str:
+    """Return the cache key of a set of image digests.
+
+    :param digests: Digests of every ECR image of a task definition, as
+        its tags resolved.
+    :return: The sorted digests, comma-separated; the same set always gives
+        the same key.
+    """
+    return ",".join(sorted(set(digests)))
+
+
+def _get_parameter(parameter_name: str) -> str | None:
+    """Read an SSM parameter value.
+
+    :return: The parameter value, or ``None`` if it does not exist.
+    """
+    from botocore.exceptions import (  # pylint: disable=import-outside-toplevel
+        ClientError,
+    )
+
+    try:
+        response = get_client("ssm").get_parameter(Name=parameter_name)
+    except ClientError as err:
+        if err.response["Error"]["Code"] == "ParameterNotFound":
+            LOG.info("Dedup parameter %s does not exist yet.", parameter_name)
+            return None
+        raise
+    return response["Parameter"]["Value"]
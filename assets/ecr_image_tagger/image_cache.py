@@ -0,0 +1,75 @@
+"""
+On-disk cache of the container images of a task definition revision.
+
+A task definition revision is immutable, so the image list
+``DescribeTaskDefinition`` returns for an ARN never changes. Lambda keeps
+``/tmp`` for the life of an execution environment, so caching the list
+there saves the describe call whenever a revision is seen again, e.g. when
+a failed invocation is retried or the in-memory dedup cache has evicted it.
+
+Every function is a no-op when the cache directory is not configured, and
+a missing or unreadable entry is a cache miss, never an error.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+LOG = logging.getLogger(__name__)
+
+
+def load(cache_dir: str | None, task_def_arn: str) -> list[str] | None:
+    """Return the cached image URIs of a task definition.
+
+    :param cache_dir: Cache directory. ``None`` disables the cache.
+    :param task_def_arn: Full task definition ARN, including revision.
+    :return: Image URIs, or ``None`` on a cache miss.
+    """
+    if not cache_dir:
+        return None
+    try:
+        with open(_entry_path(cache_dir, task_def_arn), encoding="utf-8") as entry:
+            cached = json.load(entry)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as err:
+        LOG.warning(
+            "Ignoring unreadable image cache entry for %s: %s", task_def_arn, err
+        )
+        return None
+
+    # The file name is a hash; make sure it is the entry we asked for.
+    if cached.get("taskDefinitionArn") != task_def_arn:
+        return None
+    LOG.debug("Image list of %s found in %s", task_def_arn, cache_dir)
+    return cached["images"]
+
+
+def store(cache_dir: str | None, task_def_arn: str, image_uris: list[str]) -> None:
+    """Cache the image URIs of a task definition.
+
+    The entry is written to a temporary file and renamed into place, so a
+    concurrent reader never sees a partial entry.
+
+    :param cache_dir: Cache directory. ``None`` disables the cache.
+    :param task_def_arn: Full task definition ARN, including revision.
+    :param image_uris: Image URIs of all container definitions.
+    """
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=cache_dir, suffix=".tmp", delete=False, encoding="utf-8"
+        ) as entry:
+            json.dump({"taskDefinitionArn": task_def_arn, "images": image_uris}, entry)
+        os.replace(entry.name, _entry_path(cache_dir, task_def_arn))
+    except OSError as err:
+        LOG.warning("Could not cache the image list of %s: %s", task_def_arn, err)
+
+
+def _entry_path(cache_dir: str, task_def_arn: str) -> str:
+    digest = hashlib.sha256(task_def_arn.encode()).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.json")
@@ -0,0 +1,174 @@
+"""
+Parsed container image references for ECR registries.
+
+The tagger used to match every image URI against a regular expression and
+carry the ``re.Match`` around; backfill and audit tools read whole task
+definition histories, where the same few URIs repeat thousands of times.
+:func:`parse_image` memoizes its result, so a repeated URI costs one
+dictionary lookup and returns the very same :class:`ImageRef`.
+
+Recognized registries:
+
+* private ECR: ``ACCOUNT.dkr.ecr.REGION.amazonaws.com/REPO``
+* private ECR FIPS endpoints: ``ACCOUNT.dkr.ecr-fips.REGION.amazonaws.com``
+* private ECR in China: ``ACCOUNT.dkr.ecr.REGION.amazonaws.com.cn``
+* ECR Public: ``public.ecr.aws/ALIAS/REPO``
+
+The reference may end in ``:TAG``, ``@sha256:DIGEST``, or both
+(``:TAG@sha256:DIGEST``), in which case the digest is what runs.
+"""
+
+import re
+from functools import lru_cache
+
+# Distinct URIs kept by the parse cache. A task definition history rarely
+# references more than a few hundred.
+PARSE_CACHE_SIZE = 4096
+
+PUBLIC_REGISTRY = "public.ecr.aws"
+
+_PRIVATE_REGISTRY = re.compile(
+    r"^(?P<account>\d{12})\.dkr\.ecr(?P<fips>-fips)?\.(?P<region>[a-z0-9-]+)"
+    r"\.amazonaws\.com(?:\.cn)?$"
+)
+_REFERENCE = re.compile(
+    r"^(?P<registry>[^/]+)/(?P<repo>[a-z0-9][a-z0-9._/-]*)"
+    r"(?::(?P<tag>[\w][\w.-]{0,127}))?"
+    r"(?:@(?P<digest>sha256:[a-f0-9]{64}))?$"
+)
+
+
+class ImageRef:
+    """An immutable, hashable reference to an image in an ECR registry.
+
+    :param registry: Registry host, e.g.
+        ``123456789012.dkr.ecr.us-west-2.amazonaws.com``.
+    :param repo: Repository name; for ECR Public it includes the alias.
+    :param tag: Image tag, or ``None``.
+    :param digest: Image digest, ``sha256:...``, or ``None``.
+    :param account: AWS account of a private registry.
+    :param region: AWS region of a private registry.
+    :param fips: Whether the registry host is a FIPS endpoint.
+    """
+
+    __slots__ = ("registry", "repo", "tag", "digest", "account", "region", "fips")
+
+    def __init__(
+        self,
+        registry: str,
+        repo: str,
+        tag: str = None,
+        digest: str = None,
+        account: str = None,
+        region: str = None,
+        fips: bool = False,
+    ):
+        # pylint: disable=too-many-arguments
+        # Frozen: assign through object.__setattr__, as dataclasses do.
+        init = object.__setattr__
+        init(self, "registry", registry)
+        init(self, "repo", repo)
+        init(self, "tag", tag)
+        init(self, "digest", digest)
+        init(self, "account", account)
+        init(self, "region", region)
+        init(self, "fips", fips)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _key(self) -> tuple:
+        return (self.registry, self.repo, self.tag, self.digest)
+
+    def __eq__(self, other):
+        if not isinstance(other, ImageRef):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"ImageRef({self.uri!r})"
+
+    def __str__(self):
+        return self.uri
+
+    @property
+    def public(self) -> bool:
+        """Whether the image is in ECR Public rather than a private registry."""
+        return self.registry == PUBLIC_REGISTRY
+
+    @property
+    def uri(self) -> str:
+        """The reference as a container image URI."""
+        uri = f"{self.registry}/{self.repo}"
+        if self.tag:
+            uri += f":{self.tag}"
+        if self.digest:
+            uri += f"@{self.digest}"
+        return uri
+
+    @property
+    def image_id(self) -> dict:
+        """The ECR API ``imageIds`` element; the digest wins over the tag.
+
+        :raises ValueError: If the reference has neither tag nor digest.
+        """
+        if self.digest:
+            return {"imageDigest": self.digest}
+        if self.tag:
+            return {"imageTag": self.tag}
+        raise ValueError(f"No tag or digest found for {self.uri}")
+
+    def with_tag(self, tag: str) -> str:
+        """Return the URI of this image's repository with another tag.
+
+        :param tag: The tag.
+        """
+        return f"{self.registry}/{self.repo}:{tag}"
+
+    def with_digest(self, digest: str) -> str:
+        """Return the URI of another image of this repository, by digest.
+
+        :param digest: The digest, ``sha256:...``.
+        """
+        return f"{self.registry}/{self.repo}@{digest}"
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_image(uri: str) -> ImageRef | None:
+    """Parse a container image URI from an ECR registry.
+
+    :param uri: Image URI as written in a container definition.
+    :return: The parsed reference, or ``None`` if the image is not in ECR
+        (Docker Hub, GHCR, ...) or the URI is malformed.
+    """
+    match = _REFERENCE.match(uri)
+    if match is None:
+        return None
+
+    registry = match.group("registry")
+    if registry == PUBLIC_REGISTRY:
+        # ECR Public repositories are always ALIAS/NAME.
+        if "/" not in match.group("repo"):
+            return None
+        return ImageRef(
+            registry, match.group("repo"), match.group("tag"), match.group("digest")
+        )
+
+    private = _PRIVATE_REGISTRY.match(registry)
+    if private is None:
+        return None
+    return ImageRef(
+        registry,
+        match.group("repo"),
+        match.group("tag"),
+        match.group("digest"),
+        account=private.group("account"),
+        region=private.group("region"),
+        fips=private.group("fips") is not None,
+    )
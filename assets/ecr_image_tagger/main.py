@@ -5,33 +5,61 @@ Triggered by EventBridge SERVICE_STEADY_STATE events. For each container
 image in the active task definition that comes from ECR, it adds a
 ``deployed-at-<timestamp>`` tag. This lets ECR lifecycle policies retain
 recently deployed images as rollback candidates.
+
+Module import is kept to the standard library so a cold start pays only for
+what an invocation uses: boto3/botocore are imported when the first AWS client
+is created (see :mod:`clients`), and nothing outside the Lambda runtime is
+required at all.
+
+The other public functions are also the API :mod:`backfill` uses to tag
+images outside the Lambda; the rest is private to the handler.
 """
 
 import logging
 import os
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from typing import Callable
 
-from infrahouse_core.aws import ECRRepository, ECSService, ECSTaskDefinition
-from infrahouse_core.logging import setup_logging
+import image_cache
+import metrics
+import retry
+from clients import get_client
+from dedup import StoredKey, TaskDefinitionCache, digest_key
+from image_ref import ImageRef, parse_image
 
 LOG = logging.getLogger(__name__)
-setup_logging(LOG, debug=os.environ.get("LOG_LEVEL", "INFO").upper() == "DEBUG")
 
-# Pattern: ACCOUNT.dkr.ecr.REGION.amazonaws.com/REPO:TAG
-# or:      ACCOUNT.dkr.ecr.REGION.amazonaws.com/REPO@sha256:DIGEST
-ECR_IMAGE_PATTERN = re.compile(
-    r"^(?P<account>\d+)\.dkr\.ecr\.(?P<region>[a-z0-9-]+)"
-    r"\.amazonaws\.com/(?P<repo>[^:@]+)"
-    r"(?::(?P<tag>[^@]+)|@(?P<digest>sha256:[a-f0-9]+))$"
-)
+# Upper bound on repositories processed concurrently when
+# TAGGER_MAX_WORKERS is not set.
+DEFAULT_MAX_WORKERS = 4
+
+# Task definitions already tagged by this (warm) Lambda container.
+TASK_DEFINITION_CACHE = TaskDefinitionCache()
+
+
+def setup_logging(debug: bool) -> None:
+    """Set log levels for the handler and the modules it uses.
+
+    The Lambda runtime already attaches a handler to the root logger, so
+    only levels need setting. Like ``infrahouse_core.logging.setup_logging``,
+    botocore is kept quiet unless debugging.
+
+    :param debug: Log at DEBUG instead of INFO.
+    """
+    logging.getLogger().setLevel(logging.DEBUG if debug else logging.INFO)
+    logging.getLogger("botocore").setLevel(logging.WARNING if debug else logging.ERROR)
+
+
+setup_logging(debug=os.environ.get("LOG_LEVEL", "INFO").upper() == "DEBUG")
 
 
 def lambda_handler(event: dict, context) -> dict:
     """Handle EventBridge ECS Service Action events.
 
     :param event: EventBridge event payload.
-    :param context: Lambda context (unused).
+    :param context: Lambda context; its remaining time bounds ECR retries.
     :return: Summary of tagged images.
     """
     LOG.debug("Received event: %s", event)
@@ -39,6 +67,15 @@ def lambda_handler(event: dict, context) -> dict:
     cluster_name = os.environ["ECS_CLUSTER_NAME"]
     service_name = os.environ["ECS_SERVICE_NAME"]
     tag_prefix = os.environ["DEPLOYED_TAG_PREFIX"]
+    dedup_parameter = os.environ.get("DEDUP_SSM_PARAMETER") or None
+    # Read once, however many keys this invocation checks.
+    stored_key = StoredKey(dedup_parameter) if dedup_parameter else None
+    max_workers = int(os.environ.get("TAGGER_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+    max_attempts = int(
+        os.environ.get("TAGGER_RETRY_MAX_ATTEMPTS", retry.DEFAULT_MAX_ATTEMPTS)
+    )
+    metrics_namespace = os.environ.get("METRICS_NAMESPACE", metrics.DEFAULT_NAMESPACE)
+    image_cache_dir = os.environ.get("IMAGE_CACHE_DIR") or None
 
     # Verify this event is for our cluster
     event_cluster_arn = event["detail"]["clusterArn"]
@@ -50,85 +87,444 @@ def lambda_handler(event: dict, context) -> dict:
         )
         return {"tagged": []}
 
-    service = ECSService(cluster_name, service_name)
-    task_def_arn = service.task_definition_arn
-    LOG.info("Active task definition: %s", task_def_arn)
+    timer = metrics.InvocationTimer()
+    retrier = retry.AdaptiveRetrier.from_context(context, max_attempts=max_attempts)
+    try:
+        task_def_arn = _event_task_definition(event)
+        if task_def_arn:
+            LOG.info("Task definition from the event: %s", task_def_arn)
+        else:
+            with timer.phase(metrics.DESCRIBE_SERVICE):
+                task_def_arn = _active_task_definition(
+                    get_client("ecs"), cluster_name, service_name
+                )
+            LOG.info("Active task definition: %s", task_def_arn)
+
+        # Only fully pinned task definitions are remembered by ARN, so a hit
+        # here is safe to skip without even reading the task definition.
+        if TASK_DEFINITION_CACHE.seen(task_def_arn, stored_key):
+            LOG.info("Task definition %s is already tagged, skipping.", task_def_arn)
+            return {"tagged": []}
 
-    task_def = ECSTaskDefinition(task_def_arn)
+        deployed_tag = deployed_tag_now(tag_prefix)
 
+        image_uris = image_cache.load(image_cache_dir, task_def_arn)
+        if image_uris is None:
+            with timer.phase(metrics.DESCRIBE_TASK_DEFINITION):
+                image_uris = _container_images(get_client("ecs"), task_def_arn)
+            image_cache.store(image_cache_dir, task_def_arn, image_uris)
+        images_by_repo = group_ecr_images(image_uris)
+
+        # A mutable tag (``app:latest``) may point to a new image under the
+        # same revision, e.g. after a forced new deployment. Such a task
+        # definition is remembered by the digests its tags resolved to.
+        dedup_key = task_def_arn if _pinned(images_by_repo) else None
+        skipped = False
+
+        def _already_tagged(digests: list[str]) -> bool:
+            nonlocal dedup_key, skipped
+            dedup_key = digest_key(digests)
+            skipped = TASK_DEFINITION_CACHE.seen(dedup_key, stored_key)
+            return skipped
+
+        tagged, errors = tag_all_repos(
+            images_by_repo,
+            deployed_tag,
+            tag_prefix,
+            max_workers,
+            timer,
+            retrier,
+            already_tagged=None if dedup_key else _already_tagged,
+        )
+        if skipped:
+            return {"tagged": []}
+        LOG.info("Tagged %d image(s): %s", len(tagged), tagged)
+
+        if errors:
+            # Fail the invocation so the Lambda error alarm fires, but only
+            # after every other image got its tag.
+            raise RuntimeError(
+                f"Failed to tag {len(errors)} image(s): {'; '.join(errors)}"
+            )
+
+        TASK_DEFINITION_CACHE.remember(dedup_key, stored_key)
+        return {"tagged": tagged}
+    finally:
+        timer.emit(metrics_namespace, {"ServiceName": service_name})
+
+
+def deployed_tag_now(tag_prefix: str) -> str:
+    """Return the tag marking an image as deployed now.
+
+    :param tag_prefix: Prefix of deployed tags, e.g. ``deployed-at-``.
+    """
     timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H-%M-%SZ")
-    deployed_tag = f"{tag_prefix}{timestamp}"
+    return f"{tag_prefix}{timestamp}"
+
+
+def _event_task_definition(event: dict) -> str | None:
+    """Return the task definition ARN carried by the event, if any.
+
+    Native SERVICE_STEADY_STATE events do not include it, but an EventBridge
+    input transformer, or a caller invoking the Lambda directly, may put it
+    in ``detail.taskDefinitionArn`` (the key ECS task events use) or
+    ``detail.taskDefinition``. Using it saves the ``DescribeServices`` call.
+
+    :param event: EventBridge event payload.
+    :return: Full task definition ARN, or ``None`` if the event has none.
+    """
+    detail = event.get("detail", {})
+    for key in ("taskDefinitionArn", "taskDefinition"):
+        value = detail.get(key)
+        if isinstance(value, str) and ":task-definition/" in value:
+            return value
+    return None
+
+
+def _active_task_definition(ecs_client, cluster_name: str, service_name: str) -> str:
+    """Return the ARN of the service's active task definition.
+
+    :param ecs_client: Boto3 ECS client.
+    :param cluster_name: ECS cluster name.
+    :param service_name: ECS service name.
+    :raises RuntimeError: If the service is not found.
+    """
+    services = ecs_client.describe_services(
+        cluster=cluster_name,
+        services=[service_name],
+    ).get("services", [])
+    if not services:
+        raise RuntimeError(
+            f"ECS service {service_name} not found in cluster {cluster_name}"
+        )
+    return services[0]["taskDefinition"]
+
+
+def _container_images(ecs_client, task_def_arn: str) -> list[str]:
+    """Return image URIs from all container definitions of a task definition.
+
+    :param ecs_client: Boto3 ECS client.
+    :param task_def_arn: Full task definition ARN.
+    """
+    response = ecs_client.describe_task_definition(taskDefinition=task_def_arn)
+    return [c["image"] for c in response["taskDefinition"]["containerDefinitions"]]
+
+
+def tag_all_repos(
+    images_by_repo: dict[tuple, list[ImageRef]],
+    deployed_tag: str,
+    tag_prefix: str,
+    max_workers: int,
+    timer: metrics.InvocationTimer,
+    retrier: retry.AdaptiveRetrier,
+    dry_run: bool = False,
+    already_tagged: Callable[[list[str]], bool] = None,
+) -> tuple[list[str], list[str]]:
+    """Tag the images of every repository on a bounded thread pool.
+
+    Repositories are independent (and may live in different regions),
+    so they are processed concurrently. First every repository resolves
+    its references to digests, then the images are tagged. A failure in
+    one repository is recorded and does not stop the others.
+
+    :param images_by_repo: Output of :func:`group_ecr_images`.
+    :param deployed_tag: Tag string to apply.
+    :param tag_prefix: Prefix to check for existing deployed tags.
+    :param max_workers: Maximum number of repositories in flight.
+    :param timer: Collects per-repository lookup and tag timings.
+    :param retrier: Retries throttled ECR calls; shared by all workers.
+    :param dry_run: Look the images up, but do not tag them.
+    :param already_tagged: Called with the sorted digests of all images
+        once every repository resolved without errors. If it returns
+        ``True``, nothing is tagged.
+    :return: Tagged image URIs and error messages, in task definition
+        order.
+    """
     tagged = []
+    errors = {key: [] for key in images_by_repo}
+    if not images_by_repo:
+        return tagged, []
 
-    for image_uri in task_def.container_images:
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(images_by_repo)))
+    ) as executor:
+        resolved = _run_per_repo(
+            executor, images_by_repo, errors, _resolve_ecr_images, retrier
+        )
+        for key, (_, repo_errors, _) in resolved.items():
+            errors[key].extend(repo_errors)
+
+        digests = sorted({d for images, _, _ in resolved.values() for d in images})
+        if (
+            already_tagged is not None
+            and not any(errors.values())
+            and already_tagged(digests)
+        ):
+            LOG.info("Images %s are already tagged, skipping.", digests)
+            for _, _, lookup_ms in resolved.values():
+                timer.record(metrics.REPO_LOOKUP, lookup_ms)
+            return tagged, []
+
+        results = _run_per_repo(
+            executor,
+            {key: images_by_repo[key] for key in resolved},
+            errors,
+            _tag_ecr_images,
+            resolved,
+            deployed_tag,
+            tag_prefix,
+            timer,
+            retrier,
+            dry_run,
+        )
+        for key in images_by_repo:
+            repo_tagged, repo_errors = results.get(key, ([], []))
+            tagged.extend(repo_tagged)
+            errors[key].extend(repo_errors)
+
+    errors = [error for repo_errors in errors.values() for error in repo_errors]
+    for error in errors:
+        LOG.error("Could not tag image %s", error)
+    return tagged, errors
+
+
+def _run_per_repo(
+    executor: ThreadPoolExecutor,
+    images_by_repo: dict[tuple, list[ImageRef]],
+    errors: dict[tuple, list[str]],
+    func: Callable,
+    *args,
+) -> dict:
+    """Call ``func(region, repo_name, refs, *args)`` for every repository.
+
+    :param executor: Runs the calls concurrently.
+    :param images_by_repo: Output of :func:`group_ecr_images`.
+    :param errors: Error messages by ``(region, repo)``; a call that raises
+        adds one for each of the repository's references. ``func`` must
+        not raise once it has tagged an image, or that image would be
+        reported as failed.
+    :param func: Function to call.
+    :return: Results of the calls that returned, keyed by ``(region, repo)``.
+    """
+    futures = {
+        key: executor.submit(func, *key, refs, *args)
+        for key, refs in images_by_repo.items()
+    }
+    results = {}
+    for key, future in futures.items():
+        try:
+            results[key] = future.result()
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            errors[key].extend(f"{ref.uri}: {err}" for ref in images_by_repo[key])
+    return results
+
+
+def _pinned(images_by_repo: dict[tuple, list[ImageRef]]) -> bool:
+    """Return ``True`` if every image is referenced by digest.
+
+    :param images_by_repo: Output of :func:`group_ecr_images`.
+    """
+    return all(ref.digest for refs in images_by_repo.values() for ref in refs)
+
+
+def group_ecr_images(image_uris: list[str]) -> dict[tuple, list[ImageRef]]:
+    """Group private ECR image URIs by the repository they live in.
+
+    Images that :func:`~image_ref.parse_image` does not recognize (Docker
+    Hub, GHCR, etc.), ECR Public images, which are not ours to tag, and
+    references without a tag or digest are logged and skipped.
+
+    :param image_uris: Container image URIs from the task definition.
+    :return: Parsed references keyed by ``(region, repo)``, in task
+        definition order.
+    """
+    images_by_repo = {}
+    for image_uri in image_uris:
         LOG.info("Processing image %s", image_uri)
 
-        match = ECR_IMAGE_PATTERN.match(image_uri)
-        if not match:
-            LOG.info("Not an ECR image, skipping: %s", image_uri)
+        ref = parse_image(image_uri)
+        if ref is None or ref.public:
+            LOG.info("Not a private ECR image, skipping: %s", image_uri)
             continue
+        if not (ref.tag or ref.digest):
+            LOG.info("No tag or digest, skipping: %s", image_uri)
+            continue
+
+        images_by_repo.setdefault((ref.region, ref.repo), []).append(ref)
 
-        result = _tag_ecr_image(match, deployed_tag, tag_prefix)
-        if result:
-            tagged.append(result)
+    return images_by_repo
 
-    LOG.info("Tagged %d image(s): %s", len(tagged), tagged)
-    return {"tagged": tagged}
 
+def _resolve_ecr_images(
+    region: str,
+    repo_name: str,
+    refs: list[ImageRef],
+    retrier: retry.AdaptiveRetrier,
+) -> tuple[dict[str, dict], list[str], float]:
+    """Resolve the references of one ECR repository to images.
 
-def _tag_ecr_image(
-    match: re.Match, deployed_tag: str, tag_prefix: str
-) -> str | None:
-    """Tag a single ECR image with the deployed tag.
+    A single ``BatchGetImage`` covers every referenced tag and digest.
 
-    Skips tagging if the image already has a tag with the given prefix —
+    :param region: AWS region of the repository.
+    :param repo_name: ECR repository name.
+    :param refs: Image references, all in this repository.
+    :param retrier: Retries throttled ECR calls.
+    :return: ``BatchGetImage`` images by digest, error messages for
+        references that were not found, and the lookup time in
+        milliseconds.
+    :raises ClientError: If the repository cannot be read.
+    """
+    image_ids = []
+    image_uris = {}
+    for ref in refs:
+        image_id = ref.image_id
+        if image_id not in image_ids:
+            image_ids.append(image_id)
+        image_uris.setdefault(tuple(image_id.items()), ref.uri)
+
+    lookup_start = time.perf_counter()
+    response = retrier.call(
+        get_client("ecr", region=region).batch_get_image,
+        repositoryName=repo_name,
+        imageIds=image_ids,
+    )
+    errors = []
+    for failure in response.get("failures", []):
+        missing = failure["imageId"]
+        errors.append(
+            f"{image_uris.get(tuple(missing.items()), repo_name)}: "
+            f"not found in {repo_name} ({failure.get('failureCode')})"
+        )
+
+    # A tag and a digest may point to the same image; tag it once.
+    images = {}
+    for image in response["images"]:
+        images.setdefault(image["imageId"]["imageDigest"], image)
+    return images, errors, (time.perf_counter() - lookup_start) * 1000
+
+
+def _tag_ecr_images(
+    region: str,
+    repo_name: str,
+    refs: list[ImageRef],
+    resolved: dict[tuple, tuple],
+    deployed_tag: str,
+    tag_prefix: str,
+    timer: metrics.InvocationTimer,
+    retrier: retry.AdaptiveRetrier,
+    dry_run: bool = False,
+) -> tuple[list[str], list[str]]:
+    """Tag all images of one ECR repository with the deployed tag.
+
+    The repository is queried once for all resolved images: a single
+    ``DescribeImages`` returns the tags they already carry. Then one
+    ``PutImage`` is issued per distinct image that needs the tag.
+
+    Skips images that already have a tag with the given prefix —
     this prevents duplicate tags from periodic SERVICE_STEADY_STATE events
-    that fire without an actual deployment.
+    that fire without an actual deployment. A failed ``PutImage``, whatever
+    the error, is reported for its image only and does not stop the rest of
+    the repository.
 
-    :param match: Regex match object with account, region, repo,
-        tag, and digest groups.
+    :param region: AWS region of the repository.
+    :param repo_name: ECR repository name.
+    :param refs: Image references, all in this repository.
+    :param resolved: :func:`_resolve_ecr_images` results by
+        ``(region, repo)``.
     :param deployed_tag: Tag string to apply.
     :param tag_prefix: Prefix to check for existing deployed tags.
-    :return: The full image URI that was tagged, or None if skipped.
-    :raises ValueError: If the image has neither tag nor digest,
-        or if the image does not exist in the repository.
+    :param timer: Records the lookup time and each ``PutImage`` time.
+    :param retrier: Retries throttled ECR calls.
+    :param dry_run: Report the images that would be tagged, without
+        calling ``PutImage``.
+    :return: Full image URIs that were tagged, and error messages for
+        images that could not be tagged.
+    :raises ClientError: If the repository cannot be read.
     """
-    account = match.group("account")
-    region = match.group("region")
-    repo_name = match.group("repo")
-    image_tag = match.group("tag")
-    image_digest = match.group("digest")
-
-    if not image_tag and not image_digest:
-        raise ValueError(
-            f"No tag or digest found for {account}/{repo_name}"
-        )
-
-    repo = ECRRepository(repo_name, region=region)
-    ecr_image = repo.get_image(tag=image_tag, digest=image_digest)
+    images, _, lookup_ms = resolved[(region, repo_name)]
+    if not images:
+        timer.record(metrics.REPO_LOOKUP, lookup_ms)
+        return [], []
 
-    if not ecr_image.exists:
-        raise ValueError(
-            f"Image not found in {repo_name}: "
-            f"{image_tag or image_digest}"
-        )
+    ecr_client = get_client("ecr", region=region)
+    describe_start = time.perf_counter()
+    details = retrier.call(
+        ecr_client.describe_images,
+        repositoryName=repo_name,
+        imageIds=[{"imageDigest": digest} for digest in images],
+    )["imageDetails"]
+    timer.record(
+        metrics.REPO_LOOKUP,
+        lookup_ms + (time.perf_counter() - describe_start) * 1000,
+    )
+    existing_tags = {
+        detail["imageDigest"]: detail.get("imageTags", []) for detail in details
+    }
 
-    # Skip if image already has a deployed-at- tag
-    for existing_tag in ecr_image.tags:
-        if existing_tag.startswith(tag_prefix):
+    tagged = []
+    errors = []
+    for digest, image in images.items():
+        # Skip if image already has a deployed-at- tag
+        deployed = [
+            tag for tag in existing_tags.get(digest, []) if tag.startswith(tag_prefix)
+        ]
+        if deployed:
             LOG.info(
-                "Image %s/%s already has tag %s, skipping.",
+                "Image %s@%s already has tag %s, skipping.",
                 repo_name,
-                image_tag or image_digest,
-                existing_tag,
+                digest,
+                deployed[0],
             )
-            return None
+            continue
+
+        tagged_uri = refs[0].with_tag(deployed_tag)
+        if dry_run:
+            LOG.info("Would tag image %s@%s: %s", repo_name, digest, tagged_uri)
+            tagged.append(tagged_uri)
+            continue
+
+        try:
+            with timer.phase(metrics.TAG_IMAGE):
+                retrier.call(_put_image_tag, ecr_client, repo_name, image, deployed_tag)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            # Only this image failed; the ones tagged before it stay tagged.
+            errors.append(f"{repo_name}@{digest}: {err}")
+            continue
+
+        LOG.info("Tagged image: %s", tagged_uri)
+        tagged.append(tagged_uri)
 
-    ecr_image.tag_image(deployed_tag)
+    return tagged, errors
 
-    tagged_uri = (
-        f"{account}.dkr.ecr.{region}.amazonaws.com"
-        f"/{repo_name}:{deployed_tag}"
+
+def _put_image_tag(ecr_client, repo_name: str, image: dict, tag: str) -> None:
+    """Re-publish an image manifest under an additional tag.
+
+    If the tag already points to the same manifest,
+    ``ImageAlreadyExistsException`` is treated as success. That also makes
+    a retry safe when an earlier, throttled-looking attempt did land.
+
+    :param ecr_client: Boto3 ECR client.
+    :param repo_name: ECR repository name.
+    :param image: ``images`` element from a ``BatchGetImage`` response.
+    :param tag: The tag to apply.
+    :raises ClientError: On AWS API errors (except
+        ``ImageAlreadyExistsException``).
+    """
+    from botocore.exceptions import (  # pylint: disable=import-outside-toplevel
+        ClientError,
     )
-    LOG.info("Tagged image: %s", tagged_uri)
-    return tagged_uri
+
+    kwargs = {
+        "repositoryName": repo_name,
+        "imageManifest": image["imageManifest"],
+        "imageTag": tag,
+    }
+    if image.get("imageManifestMediaType"):
+        kwargs["imageManifestMediaType"] = image["imageManifestMediaType"]
+    try:
+        ecr_client.put_image(**kwargs)
+    except ClientError as err:
+        if err.response["Error"]["Code"] != "ImageAlreadyExistsException":
+            raise
+        LOG.debug("Tag %s already exists for this image in %s", tag, repo_name)
@@ -0,0 +1,92 @@
+"""
+Per-invocation phase timings, emitted as CloudWatch Embedded Metric Format.
+
+An EMF record is a JSON log line that CloudWatch Logs turns into metrics
+on ingestion, so publishing timings costs no ``PutMetricData`` calls and
+no extra IAM permissions. See
+https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_NAMESPACE = "InfraHouse/ECRImageTagger"
+
+# Phase names, which are also the EMF metric names.
+DESCRIBE_SERVICE = "DescribeServiceTime"
+DESCRIBE_TASK_DEFINITION = "DescribeTaskDefinitionTime"
+REPO_LOOKUP = "RepoLookupTime"
+TAG_IMAGE = "TagImageTime"
+TOTAL = "TotalTime"
+
+
+class InvocationTimer:
+    """Collect phase durations of one invocation and emit them as EMF.
+
+    A phase may be timed more than once, e.g. one ``RepoLookupTime`` per
+    repository; every duration is kept and emitted as a value of the same
+    metric. Safe to use from the tagger's worker threads.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the body of a ``with`` block as one duration of ``name``.
+
+        The duration is recorded even if the block raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name: str, duration_ms: float) -> None:
+        """Record one duration, in milliseconds, of a phase."""
+        with self._lock:
+            self._durations.setdefault(name, []).append(round(duration_ms, 3))
+
+    def emf_record(self, namespace: str, dimensions: dict) -> dict:
+        """Build the EMF record, with the total time up to now.
+
+        :param namespace: CloudWatch metric namespace.
+        :param dimensions: Dimension names and values, e.g.
+            ``{"ServiceName": "my-api"}``.
+        :return: A dict ready to be written as one JSON log line.
+        """
+        with self._lock:
+            values = {
+                name: durations[0] if len(durations) == 1 else list(durations)
+                for name, durations in self._durations.items()
+            }
+        values[TOTAL] = round((time.perf_counter() - self._start) * 1000, 3)
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": namespace,
+                        "Dimensions": [list(dimensions)],
+                        "Metrics": [
+                            {"Name": name, "Unit": "Milliseconds"} for name in values
+                        ],
+                    }
+                ],
+            },
+            **dimensions,
+            **values,
+        }
+
+    def emit(self, namespace: str, dimensions: dict) -> None:
+        """Write the EMF record to stdout, which Lambda ships to CloudWatch Logs.
+
+        :param namespace: CloudWatch metric namespace.
+        :param dimensions: Dimension names and values.
+        """
+        print(json.dumps(self.emf_record(namespace, dimensions)), flush=True)
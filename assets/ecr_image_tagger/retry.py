@@ -0,0 +1,169 @@
+"""
+Retries of throttled and failed ECR calls, bounded by the Lambda's remaining time.
+
+Several services reaching steady state together (e.g. after a cluster-wide
+AMI roll) start several tagger Lambdas at once, and their ``PutImage``
+calls hit ECR's per-account rate limit. botocore's default retries give up
+after a few quick attempts and know nothing about the Lambda timeout.
+
+:class:`AdaptiveRetrier` owns the retries instead. It backs off
+exponentially with full jitter, and the backoff is shared by all worker
+threads of an invocation: once one repository gets throttled, every call
+slows down, and the pace recovers as calls succeed again. No retry is
+started that would end after the invocation's deadline. Since the ECR
+client has botocore's retries turned off (see :mod:`clients`), transport
+errors are retried here too.
+"""
+
+import logging
+import random
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+# Error codes worth retrying: rate limiting and transient server errors.
+RETRYABLE_ERROR_CODES = frozenset(
+    {
+        "ThrottlingException",
+        "TooManyRequestsException",
+        "RequestLimitExceeded",
+        "ServerException",
+        "ServiceUnavailableException",
+    }
+)
+
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BASE_DELAY = 0.2
+DEFAULT_MAX_DELAY = 10.0
+
+# Time kept back from the Lambda timeout to report errors and emit metrics.
+DEADLINE_MARGIN = 5.0
+
+
+class AdaptiveRetrier:
+    """Call a function, retrying throttling errors with shared backoff.
+
+    :param deadline: ``time.monotonic()`` value after which no retry may
+        end. ``None`` means no deadline.
+    :param max_attempts: Maximum attempts per call, including the first.
+    :param base_delay: Backoff ceiling after the first throttle, seconds.
+    :param max_delay: Upper bound of the backoff ceiling, seconds.
+    :param sleep: Function used to wait; replaced in tests.
+    """
+
+    def __init__(
+        self,
+        deadline: float = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        sleep=time.sleep,
+    ):
+        self._deadline = deadline
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._sleep = sleep
+        self._ceiling = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_context(cls, context, **kwargs) -> "AdaptiveRetrier":
+        """Create a retrier whose deadline is the Lambda's remaining time.
+
+        :param context: Lambda context, or ``None`` outside Lambda.
+        :param kwargs: Other :class:`AdaptiveRetrier` arguments.
+        """
+        deadline = None
+        if context is not None:
+            remaining = context.get_remaining_time_in_millis() / 1000
+            deadline = time.monotonic() + remaining - DEADLINE_MARGIN
+        return cls(deadline=deadline, **kwargs)
+
+    def call(self, func, *args, **kwargs):
+        """Call ``func(*args, **kwargs)``, retrying retryable errors.
+
+        Retryable are a ``ClientError`` with a code in
+        ``RETRYABLE_ERROR_CODES``, and the transport errors botocore's own
+        retries used to cover: a failed connection, or one that closed or
+        timed out mid-request.
+
+        :return: Whatever ``func`` returns.
+        :raises ClientError: If the error is not retryable, the attempts
+            are exhausted, or the next retry would miss the deadline.
+        :raises BotoCoreError: If a transport error persists past the
+            attempts or the deadline.
+        """
+        # pylint: disable=import-outside-toplevel
+        from botocore.exceptions import (
+            ClientError,
+            ConnectionError as BotoConnectionError,
+            HTTPClientError,
+        )
+
+        # Pace new calls while the shared backoff is up.
+        self._wait(self._jitter(self._ceiling / 2))
+        attempt = 1
+        while True:
+            try:
+                result = func(*args, **kwargs)
+            except (ClientError, BotoConnectionError, HTTPClientError) as err:
+                if isinstance(err, ClientError):
+                    reason = err.response["Error"]["Code"]
+                    if reason not in RETRYABLE_ERROR_CODES:
+                        raise
+                else:
+                    reason = type(err).__name__
+                if attempt >= self._max_attempts:
+                    LOG.warning("%s: giving up after %d attempts.", reason, attempt)
+                    raise
+                delay = self._jitter(self._throttled())
+                if not self._wait(delay):
+                    LOG.warning(
+                        "%s: no time left for attempt %d, giving up.",
+                        reason,
+                        attempt + 1,
+                    )
+                    raise
+                LOG.info(
+                    "%s: attempt %d of %d after %.2f s.",
+                    reason,
+                    attempt + 1,
+                    self._max_attempts,
+                    delay,
+                )
+                attempt += 1
+            else:
+                self._succeeded()
+                return result
+
+    def _throttled(self) -> float:
+        """Double the shared backoff ceiling and return it."""
+        with self._lock:
+            self._ceiling = min(
+                self._max_delay, max(self._base_delay, self._ceiling * 2)
+            )
+            return self._ceiling
+
+    def _succeeded(self) -> None:
+        """Halve the shared backoff ceiling; drop it once below the base."""
+        with self._lock:
+            self._ceiling /= 2
+            if self._ceiling < self._base_delay:
+                self._ceiling = 0.0
+
+    @staticmethod
+    def _jitter(ceiling: float) -> float:
+        return random.uniform(0, ceiling) if ceiling > 0 else 0.0
+
+    def _wait(self, delay: float) -> bool:
+        """Sleep for ``delay`` seconds unless that would pass the deadline.
+
+        :return: ``False`` if the deadline does not leave time to wait.
+        """
+        if self._deadline is not None and time.monotonic() + delay > self._deadline:
+            return False
+        if delay > 0:
+            self._sleep(delay)
+        return True
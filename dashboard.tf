@@ -3,7 +3,15 @@
 # available, but a persistent "GPU idle / CPU busy" signature means the fleet is
 # buying GPUs for CPU headroom and a CPU-richer instance type may be cheaper.
 # Gated on gpu_count > 0, so non-GPU consumers get nothing new.
+#
+# With enable_model_fetch_dashboard, a "Model fetch" row plots the EMF records
+# docker/vllm/fetch_model.sh writes to the ECS log group (enable_cloudwatch_logs)
+# when the task sets FETCH_METRICS_SERVICE to the service name: how long each task
+# waited for its model, cache hits vs misses, download throughput, and bytes from
+# the origin vs from peers. Off by default, so GPU services that fetch their models
+# some other way get no empty widgets.
 locals {
+  model_fetch_metrics_namespace = "InfraHouse/ModelFetch"
   gpu_dashboard_widgets = concat(
     [
       {
@@ -103,6 +111,92 @@ locals {
           ]
         }
       }
+    ] : [],
+    # Only stacks that run docker/vllm/fetch_model.sh publish these metrics.
+    var.enable_model_fetch_dashboard ? [
+      {
+        type   = "text"
+        x      = 0
+        y      = 18
+        width  = 24
+        height = 1
+        properties = {
+          markdown = "## Model fetch"
+        }
+      },
+      {
+        type   = "metric"
+        x      = 0
+        y      = 19
+        width  = 6
+        height = 6
+        properties = {
+          title  = "Model fetch time (s)"
+          region = data.aws_region.current.name
+          view   = "timeSeries"
+          period = 300
+          metrics = [
+            [local.model_fetch_metrics_namespace, "FetchTime", "ServiceName", aws_ecs_service.ecs.name, { stat = "p50", label = "p50" }],
+            [local.model_fetch_metrics_namespace, "FetchTime", "ServiceName", aws_ecs_service.ecs.name, { stat = "Maximum", label = "max" }],
+            [local.model_fetch_metrics_namespace, "DownloadTime", "ServiceName", aws_ecs_service.ecs.name, { stat = "Maximum", label = "download max" }]
+          ]
+        }
+      },
+      {
+        type   = "metric"
+        x      = 6
+        y      = 19
+        width  = 6
+        height = 6
+        properties = {
+          title  = "Model cache hits / misses"
+          region = data.aws_region.current.name
+          view   = "timeSeries"
+          stat   = "Sum"
+          period = 300
+          metrics = [
+            [local.model_fetch_metrics_namespace, "CacheHit", "ServiceName", aws_ecs_service.ecs.name],
+            [local.model_fetch_metrics_namespace, "CacheMiss", "ServiceName", aws_ecs_service.ecs.name]
+          ]
+        }
+      },
+      {
+        type   = "metric"
+        x      = 12
+        y      = 19
+        width  = 6
+        height = 6
+        properties = {
+          title  = "Model download throughput (MiB/s)"
+          region = data.aws_region.current.name
+          view   = "timeSeries"
+          period = 300
+          metrics = [
+            [{ expression = "model / 1048576", label = "model, average", id = "e1" }],
+            [{ expression = "file / 1048576", label = "file, p10", id = "e2" }],
+            [local.model_fetch_metrics_namespace, "Throughput", "ServiceName", aws_ecs_service.ecs.name, { id = "model", stat = "Average", visible = false }],
+            [local.model_fetch_metrics_namespace, "FileThroughput", "ServiceName", aws_ecs_service.ecs.name, { id = "file", stat = "p10", visible = false }]
+          ]
+        }
+      },
+      {
+        type   = "metric"
+        x      = 18
+        y      = 19
+        width  = 6
+        height = 6
+        properties = {
+          title  = "Model bytes fetched"
+          region = data.aws_region.current.name
+          view   = "timeSeries"
+          stat   = "Sum"
+          period = 300
+          metrics = [
+            [local.model_fetch_metrics_namespace, "BytesDownloaded", "ServiceName", aws_ecs_service.ecs.name, { label = "downloaded" }],
+            [local.model_fetch_metrics_namespace, "BytesFromPeers", "ServiceName", aws_ecs_service.ecs.name, { label = "from peers" }]
+          ]
+        }
+      }
     ] : []
   )
 }
@@ -112,3 +206,43 @@ resource "aws_cloudwatch_dashboard" "gpu" {
   dashboard_name = "${var.service_name}-gpu"
   dashboard_body = jsonencode({ widgets = local.gpu_dashboard_widgets })
 }
+
+# ECR image tagger latency dashboard. The Lambda writes one CloudWatch Embedded
+# Metric Format record per invocation with the time spent in each phase, so a
+# slow tagger can be traced to ECS describes, ECR lookups, or PutImage calls.
+locals {
+  ecr_image_tagger_metrics_namespace = "InfraHouse/ECRImageTagger"
+  ecr_image_tagger_phases = [
+    "DescribeServiceTime",
+    "DescribeTaskDefinitionTime",
+    "RepoLookupTime",
+    "TagImageTime",
+    "TotalTime",
+  ]
+  ecr_image_tagger_dashboard_widgets = [
+    for index, stat in ["p50", "p99"] : {
+      type   = "metric"
+      x      = 12 * index
+      y      = 0
+      width  = 12
+      height = 6
+      properties = {
+        title  = "ECR image tagger phase time, ${stat} (ms)"
+        region = data.aws_region.current.name
+        view   = "timeSeries"
+        stat   = stat
+        period = 300
+        metrics = [
+          for phase in local.ecr_image_tagger_phases :
+          [local.ecr_image_tagger_metrics_namespace, phase, "ServiceName", aws_ecs_service.ecs.name]
+        ]
+      }
+    }
+  ]
+}
+
+resource "aws_cloudwatch_dashboard" "ecr_image_tagger" {
+  count          = var.enable_ecr_image_tagging ? 1 : 0
+  dashboard_name = "${var.service_name}-ecr-image-tagger"
+  dashboard_body = jsonencode({ widgets = local.ecr_image_tagger_dashboard_widgets })
+}
@@ -10,11 +10,27 @@ set -eu
 : "${MODEL_DIR:=/models}"
 : "${VLLM_MAX_MODEL_LEN:=8192}"
 
+# With the p2p backend this node serves the model files it has to its peers,
+# from the start of its own fetch until the container stops.
+if [ "${FETCH_BACKEND:-http}" = p2p ]; then
+  python3 /usr/local/bin/fetch_model.py --serve "$MODEL_DIR" &
+fi
+
+# Returns at once if an earlier task on this host already fetched the model.
+FETCH_START="$(date +%s)"
 fetch_model.sh "$MODEL_SRC" "$MODEL_DIR"
+echo "entrypoint: fetch phase took $(($(date +%s) - FETCH_START))s" >&2
 
 # basename of the source ref is the on-disk directory fetch_model.sh created.
 MODEL_NAME="$(basename "${MODEL_SRC#hf://}")"
 
+# FETCH_STREAM=1: read the weights into the page cache while vLLM imports and
+# initializes CUDA, so its load reads memory, not disk. A fresh fetch already
+# left them there; this matters most when the fetch was a cache hit.
+if [ "${FETCH_STREAM:-0}" = 1 ]; then
+  python3 /usr/local/bin/fetch_model.py --prefetch "$MODEL_DIR/$MODEL_NAME" &
+fi
+
 exec vllm serve "$MODEL_DIR/$MODEL_NAME" \
   --host 0.0.0.0 \
   --port 8000 \
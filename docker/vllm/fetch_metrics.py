@@ -0,0 +1,101 @@
+"""
+Model-fetch telemetry, emitted as CloudWatch Embedded Metric Format.
+
+An EMF record is a JSON line on the container's stdout. The awslogs driver
+ships it to the ECS log group, where CloudWatch Logs turns it into metrics
+on ingestion, so the fetch needs no ``PutMetricData`` calls and no extra IAM
+permissions. See
+https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+
+Records are written only if ``FETCH_METRICS_SERVICE`` is set: it is the
+``ServiceName`` dimension of the metrics, which the GPU dashboard in
+``dashboard.tf`` plots per service. Two kinds of record, told apart by their
+``Event`` property:
+
+* ``fetch`` (``model_cache.py``): the whole fetch step of a task -- cache hit
+  or miss, its time and the size of the model.
+* ``download`` (``fetch_model.py``): an ``https://`` download -- bytes, time,
+  throughput of the model and of every file, and the phases of stream mode.
+
+Standard library only.
+"""
+
+import json
+import os
+import sys
+import time
+
+NAMESPACE = "InfraHouse/ModelFetch"
+
+# Metric names, which the dashboard refers to, and their units.
+UNITS = {
+    "CacheHit": "Count",
+    "CacheMiss": "Count",
+    "FetchTime": "Seconds",
+    "ModelBytes": "Bytes",
+    "DownloadTime": "Seconds",
+    "BytesDownloaded": "Bytes",
+    "BytesFromPeers": "Bytes",
+    "BytesPresent": "Bytes",
+    "Throughput": "Bytes/Second",
+    "FileThroughput": "Bytes/Second",
+    "MetadataPhaseTime": "Seconds",
+    "ShardsPhaseTime": "Seconds",
+    "PrefetchPhaseTime": "Seconds",
+}
+
+
+def emf_record(service, metrics, properties=None, namespace=NAMESPACE) -> dict:
+    """
+    Build an EMF record.
+
+    :param service: Value of the ``ServiceName`` dimension.
+    :param metrics: ``{metric name: value or list of values}``; names must be
+        in ``UNITS``. Empty lists are left out.
+    :param properties: Extra fields, searchable in Logs Insights but not
+        metrics.
+    :return: A dict ready to be written as one JSON log line.
+    """
+    metrics = {
+        name: value
+        for name, value in metrics.items()
+        if not isinstance(value, list) or value
+    }
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": namespace,
+                    "Dimensions": [["ServiceName"]],
+                    "Metrics": [
+                        {"Name": name, "Unit": UNITS[name]} for name in metrics
+                    ],
+                }
+            ],
+        },
+        **(properties or {}),
+        "ServiceName": service,
+        **metrics,
+    }
+
+
+def emit(metrics, properties=None):
+    """
+    Write an EMF record to stdout, if ``FETCH_METRICS_SERVICE`` is set.
+
+    :param metrics: See :func:`emf_record`.
+    :param properties: See :func:`emf_record`.
+    :return: The record written, or None.
+    """
+    service = os.environ.get("FETCH_METRICS_SERVICE")
+    if not service:
+        return None
+    record = emf_record(
+        service,
+        metrics,
+        properties,
+        namespace=os.environ.get("FETCH_METRICS_NAMESPACE", NAMESPACE),
+    )
+    print(json.dumps(record), file=sys.stdout, flush=True)
+    return record
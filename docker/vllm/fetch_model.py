@@ -0,0 +1,806 @@
+"""
+Download a model from an HTTPS mirror: ``fetch_model.py <source-ref> <dest>``.
+
+``fetch_model.sh`` runs this for ``https://`` (and ``http://``) sources. The
+mirror serves a manifest of the model's files next to them, by default at
+``<source-ref>/manifest.json``::
+
+    {"files": [{"path": "config.json", "size": 663, "sha256": "..."}, ...]}
+
+The files land in ``<dest>/<basename of source-ref>``, as with ``hf://``.
+Every file is split into ``FETCH_CHUNK_MB`` chunks, and ``FETCH_CONCURRENCY``
+threads download the chunks of all files with HTTP range requests, each
+written in place into ``<path>.part``. Finished chunks are listed in
+``<path>.part.done``, so an interrupted download resumes where it stopped. A
+file is renamed into place only once its SHA-256 matches the manifest; a
+file already in place is checked the same way and kept if it matches.
+Throughput is logged per file and for the whole model.
+
+With ``FETCH_BACKEND=p2p`` the chunks come from peers first: nodes that
+already hold the model (or some of its files) and run
+``fetch_model.py --serve <dest>``, which serves the verified files under
+``<dest>`` on ``FETCH_PEER_PORT``. ``FETCH_PEERS`` lists them as
+comma-separated ``host[:port]``; a name resolving to several addresses stands
+for all of them. The chunks of a file are spread over the peers that have it.
+A chunk no peer can serve comes from the origin, and so does a file that
+fails verification after peers sent some of it. The manifest always comes
+from the origin, so peers cannot change what is accepted.
+
+``FETCH_STREAM=1`` orders the fetch for a fast start: the small files vLLM
+reads first (config, tokenizer) are fetched as a phase of their own, then
+the weight shards one after another in load order. Each shard is read into
+the page cache as soon as it is verified, while later shards still download,
+so vLLM loads it from memory rather than from disk. ``fetch_model.py
+--prefetch <model-dir>`` does the same for a model already on disk;
+``entrypoint.sh`` runs it next to ``vllm serve`` in this mode. The time of
+each phase is logged.
+
+With ``FETCH_METRICS_SERVICE`` set, a ``download`` telemetry record (see
+``fetch_metrics.py``) is written to stdout after the download.
+
+Standard library only, so it runs in the vLLM image as is.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path as osp
+
+import fetch_metrics
+
+LOG = logging.getLogger("fetch_model")
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_CHUNK_MB = 64
+DEFAULT_RETRIES = 3
+TIMEOUT_S = 60
+DEFAULT_PEER_PORT = 8001
+# A peer gets less time than the origin: a slow peer costs more than a
+# fallback does.
+PEER_TIMEOUT_S = 10
+# Files vLLM loads the weights from; everything else is fetched first in
+# stream mode.
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".pth")
+PREFETCH_WORKERS = 2
+MIB = 1 << 20
+# Read and write buffer of a chunk download.
+_BUFFER_SIZE = MIB
+
+
+class FetchError(Exception):
+    """
+    The model could not be fetched.
+    """
+
+
+def model_dir(source, dest) -> str:
+    """
+    Where a model lands: ``<dest>/<basename of source>``, as entrypoint.sh
+    expects.
+    """
+    return osp.join(dest, osp.basename(source.rstrip("/")))
+
+
+def load_manifest(url, timeout=TIMEOUT_S) -> list:
+    """
+    Read the file list of a model from the mirror.
+
+    :param url: URL of the manifest.
+    :return: The ``files`` entries: ``path``, ``size`` and ``sha256``.
+    :raises FetchError: If the manifest cannot be read or names a file
+        outside the model directory.
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            files = json.load(response)["files"]
+    except (OSError, ValueError, KeyError) as err:
+        raise FetchError(f"Cannot read manifest {url}: {err}") from err
+    for entry in files:
+        relative = osp.normpath(entry["path"])
+        if osp.isabs(relative) or relative.split(os.sep)[0] == "..":
+            raise FetchError(f"Manifest path outside the model: {entry['path']}")
+    return files
+
+
+def sha256_file(file_path) -> str:
+    """
+    Hex SHA-256 of a file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as fp:
+        for block in iter(lambda: fp.read(8 * MIB), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileDownload:
+    """
+    One file of the model, downloaded in chunks into ``<path>.part``.
+
+    :param url: URL of the file.
+    :param file_path: Final path of the file.
+    :param size: Size in bytes, from the manifest.
+    :param sha256: Hex SHA-256, from the manifest.
+    :param chunk_size: Bytes per range request.
+    :param peer_path: Path of the file on a peer, ``<model>/<path>``.
+    """
+
+    def __init__(self, url, file_path, size, sha256, chunk_size, peer_path=None):
+        self.url = url
+        self.peer_path = peer_path
+        self.path = file_path
+        self.size = size
+        self.sha256 = sha256
+        self.chunk_size = chunk_size
+        self.part_path = f"{file_path}.part"
+        self.done_path = f"{file_path}.part.done"
+        # Bytes this run downloaded, not counting resumed chunks.
+        self.downloaded = 0
+        # Part of ``downloaded`` that came from peers.
+        self.from_peers = 0
+        self.started = None
+        # Called with the final path once the file is in place.
+        self.on_finish = None
+        # From the first chunk to the file in place, if this run fetched all
+        # of it that was missing.
+        self.seconds = None
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pending = set()
+
+    def chunks(self) -> list:
+        """
+        Open ``<path>.part`` and list the chunks still to download.
+
+        :return: ``(start, end)`` byte ranges, ``end`` inclusive.
+        """
+        os.makedirs(osp.dirname(self.path), exist_ok=True)
+        done = set()
+        if osp.exists(self.part_path) and osp.exists(self.done_path):
+            with open(self.done_path) as fp:
+                done = {int(line) for line in fp if line.strip()}
+        else:
+            for stale in (self.part_path, self.done_path):
+                if osp.exists(stale):
+                    os.remove(stale)
+        self._fd = os.open(self.part_path, os.O_WRONLY | os.O_CREAT, 0o644)
+        # Sparse until written; chunks land at their offsets in any order.
+        os.ftruncate(self._fd, self.size)
+        ranges = [
+            (start, min(start + self.chunk_size, self.size) - 1)
+            for start in range(0, self.size, self.chunk_size)
+        ]
+        self._pending = {start for start, _ in ranges if start not in done}
+        if done:
+            LOG.info(
+                "Resuming %s: %d of %d chunks already downloaded",
+                self.path,
+                len(ranges) - len(self._pending),
+                len(ranges),
+            )
+        return [(start, end) for start, end in ranges if start in self._pending]
+
+    def write(self, offset, data):
+        os.pwrite(self._fd, data, offset)
+
+    def chunk_done(self, start, length, from_peer=False) -> bool:
+        """
+        Record a finished chunk.
+
+        :return: True if it was the file's last one.
+        """
+        with self._lock:
+            self.downloaded += length
+            if from_peer:
+                self.from_peers += length
+            self._pending.discard(start)
+            with open(self.done_path, "a") as fp:
+                fp.write(f"{start}\n")
+            return not self._pending
+
+    def finish(self):
+        """
+        Verify the downloaded file and move it into place.
+
+        :raises FetchError: If the checksum does not match. The partial file
+            is removed, so the next attempt starts over.
+        """
+        os.close(self._fd)
+        self._fd = None
+        actual = sha256_file(self.part_path)
+        if actual != self.sha256:
+            for partial in (self.part_path, self.done_path):
+                os.remove(partial)
+            raise FetchError(
+                f"Checksum mismatch for {self.path}: "
+                f"expected {self.sha256}, got {actual}"
+            )
+        os.replace(self.part_path, self.path)
+        os.remove(self.done_path)
+        if self.on_finish:
+            self.on_finish(self.path)
+
+
+def is_weight_file(path) -> bool:
+    """
+    Whether ``path`` holds model weights (as opposed to config, tokenizer
+    and the like).
+    """
+    return path.endswith(WEIGHT_SUFFIXES)
+
+
+def prefetch_file(file_path) -> int:
+    """
+    Read a file into the page cache.
+
+    :return: Its size in bytes.
+    """
+    with open(file_path, "rb", buffering=0) as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if hasattr(os, "posix_fadvise"):
+            # Starts readahead of the whole file; the reads below then mostly
+            # wait on I/O already in flight.
+            os.posix_fadvise(fp.fileno(), 0, size, os.POSIX_FADV_WILLNEED)
+        buffer = bytearray(8 * MIB)
+        while fp.readinto(buffer):
+            pass
+    return size
+
+
+class Prefetcher:
+    """
+    Reads files into the page cache in the background.
+
+    :param workers: Files read at the same time.
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="prefetch"
+        )
+        self._futures = []
+        self.started = time.monotonic()
+
+    def submit(self, file_path):
+        self._futures.append(self._executor.submit(prefetch_file, file_path))
+
+    def wait(self) -> int:
+        """
+        Wait for every submitted file and log the phase.
+
+        :return: Bytes prefetched.
+        """
+        self._executor.shutdown(wait=True)
+        total = sum(future.result() for future in self._futures)
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        LOG.info(
+            "Phase prefetch: %d files, %.1f MiB into the page cache in %.1fs "
+            "(%.1f MiB/s)",
+            len(self._futures),
+            total / MIB,
+            elapsed,
+            total / MIB / elapsed,
+        )
+        return total
+
+
+def prefetch_model(path, workers=PREFETCH_WORKERS) -> int:
+    """
+    Read the weight files of a model directory into the page cache, in load
+    order.
+
+    :return: Bytes prefetched.
+    """
+    prefetcher = Prefetcher(workers)
+    for dirpath, _, filenames in sorted(os.walk(path)):
+        for filename in sorted(filenames):
+            if is_weight_file(filename):
+                prefetcher.submit(osp.join(dirpath, filename))
+    return prefetcher.wait()
+
+
+def _get_range(download, start, end, timeout, url=None):
+    """
+    Download bytes ``start``-``end`` of a file into its ``.part`` file.
+
+    :param url: Where to get them (default: the file's origin URL).
+    """
+    url = url or download.url
+    whole_file = start == 0 and end == download.size - 1
+    request = urllib.request.Request(url, headers={"Range": f"bytes={start}-{end}"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if response.status != 206 and not (whole_file and response.status == 200):
+            raise FetchError(f"{url}: expected a range response, got {response.status}")
+        offset = start
+        while offset <= end:
+            data = response.read(min(_BUFFER_SIZE, end + 1 - offset))
+            if not data:
+                raise FetchError(
+                    f"{url}: connection closed at byte {offset}, expected up to {end}"
+                )
+            download.write(offset, data)
+            offset += len(data)
+
+
+class Peers:
+    """
+    The peers to try before the origin, and what this run learned about them.
+
+    A peer that answers 404 for a file is not asked for that file again; a
+    peer that fails otherwise (refused, timed out, cut off) is not asked
+    again at all. Either way the chunk moves on to the next peer, then to the
+    origin.
+
+    :param urls: Base URLs of the peers' ``--serve`` servers.
+    """
+
+    def __init__(self, urls):
+        self.urls = list(urls)
+        self._lock = threading.Lock()
+        self._down = set()
+        self._missing = set()
+
+    def candidates(self, peer_path, index) -> list:
+        """
+        Peer URLs of a chunk, in the order to try them.
+
+        :param peer_path: ``<model>/<path>`` of the file.
+        :param index: Chunk number; rotates the order, so the chunks of a
+            file are spread over the peers that have it.
+        """
+        with self._lock:
+            live = [
+                url
+                for url in self.urls
+                if url not in self._down and (url, peer_path) not in self._missing
+            ]
+        if not live:
+            return []
+        index %= len(live)
+        quoted = urllib.parse.quote(peer_path)
+        return [f"{url}/{quoted}" for url in live[index:] + live[:index]]
+
+    def failed(self, file_url, err):
+        """
+        Record that a peer could not serve a chunk.
+
+        :param file_url: The URL that failed, from :meth:`candidates`.
+        """
+        parts = urllib.parse.urlsplit(file_url)
+        url = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if isinstance(err, urllib.error.HTTPError) and err.code == 404:
+                self._missing.add((url, urllib.parse.unquote(parts.path[1:])))
+            else:
+                if url not in self._down:
+                    LOG.warning("Peer %s failed (%s), not using it again", url, err)
+                self._down.add(url)
+
+
+def resolve_peers(spec, port=DEFAULT_PEER_PORT) -> list:
+    """
+    Peer base URLs from a ``FETCH_PEERS`` value.
+
+    :param spec: Comma-separated ``host[:port]``. A host name stands for
+        every IPv4 address it resolves to, so one DNS name with a record per
+        node covers the fleet. Names that do not resolve are skipped.
+    :param port: Port of entries without one.
+    """
+    urls = []
+    for entry in filter(None, (entry.strip() for entry in spec.split(","))):
+        host, _, entry_port = entry.partition(":")
+        try:
+            addresses = socket.getaddrinfo(
+                host, int(entry_port or port), socket.AF_INET, socket.SOCK_STREAM
+            )
+        except socket.gaierror as err:
+            LOG.warning("Cannot resolve peer %s: %s", host, err)
+            continue
+        for *_, (address, address_port) in addresses:
+            url = f"http://{address}:{address_port}"
+            if url not in urls:
+                urls.append(url)
+    return urls
+
+
+def _fetch_from_peers(download, start, end, peers) -> bool:
+    """
+    Try to download a chunk from the peers that may have it.
+
+    :return: True if one of them served it.
+    """
+    for url in peers.candidates(download.peer_path, start // download.chunk_size):
+        try:
+            _get_range(download, start, end, PEER_TIMEOUT_S, url=url)
+            return True
+        except (OSError, FetchError) as err:
+            peers.failed(url, err)
+    return False
+
+
+def _fetch_chunk(download, start, end, retries, timeout, peers=None) -> list:
+    """
+    Download one chunk, retrying transient failures; finish the file after
+    its last chunk.
+
+    :param peers: :class:`Peers` to try before the origin.
+    :return: ``(start, end)`` chunks to download again from the origin,
+        because the file failed verification after peers served some of it.
+    """
+    if download.started is None:
+        download.started = time.monotonic()
+    from_peer = peers is not None and _fetch_from_peers(download, start, end, peers)
+    for attempt in range(0 if from_peer else retries + 1):
+        try:
+            _get_range(download, start, end, timeout)
+            break
+        except (OSError, FetchError) as err:
+            if isinstance(err, urllib.error.HTTPError) and err.code < 500:
+                raise FetchError(f"{download.url}: {err}") from err
+            if attempt == retries:
+                raise FetchError(
+                    f"{download.url} bytes {start}-{end}: {err} "
+                    f"(after {retries + 1} attempts)"
+                ) from err
+            LOG.warning(
+                "%s bytes %d-%d failed (%s), retrying", download.url, start, end, err
+            )
+            time.sleep(min(2**attempt, 10))
+    if download.chunk_done(start, end + 1 - start, from_peer):
+        try:
+            download.finish()
+        except FetchError as err:
+            if not download.from_peers:
+                raise
+            # A peer sent bad bytes; the origin has the last word. Start the
+            # file's counts over, so its bytes are not counted twice.
+            LOG.warning("%s, fetching it again from the origin", err)
+            download.downloaded = 0
+            download.from_peers = 0
+            download.started = None
+            return download.chunks()
+        elapsed = max(time.monotonic() - download.started, 1e-6)
+        download.seconds = elapsed
+        LOG.info(
+            "Fetched %s: %.1f MiB in %.1fs (%.1f MiB/s)",
+            download.path,
+            download.downloaded / MIB,
+            elapsed,
+            download.downloaded / MIB / elapsed,
+        )
+    return []
+
+
+def fetch_https(
+    source,
+    dest,
+    manifest_url=None,
+    concurrency=DEFAULT_CONCURRENCY,
+    chunk_size=DEFAULT_CHUNK_MB * MIB,
+    retries=DEFAULT_RETRIES,
+    timeout=TIMEOUT_S,
+    peers=None,
+    stream=False,
+) -> dict:
+    """
+    Download a model from an HTTPS mirror with parallel range requests.
+
+    :param source: Base URL of the model on the mirror.
+    :param dest: Directory to put the model directory in.
+    :param manifest_url: URL of the manifest (default:
+        ``<source>/manifest.json``).
+    :param concurrency: Range requests in flight, across all files.
+    :param chunk_size: Bytes per range request.
+    :param retries: Retries of a failed range request.
+    :param timeout: Socket timeout of a request, in seconds.
+    :param peers: Base URLs of peers to download chunks from before the
+        origin.
+    :param stream: Fetch the small files first, then the weight shards in
+        order, prefetching each into the page cache once it is in place.
+    :return: Counts: ``files``, ``bytes_downloaded``, ``bytes_present``,
+        ``bytes_from_peers`` and ``seconds``; in stream mode also
+        ``bytes_prefetched`` and ``phases``, the seconds of each phase.
+    :raises FetchError: If a file cannot be downloaded or verified.
+    """
+    started_at = time.time()
+    start = time.monotonic()
+    base_url = source.rstrip("/")
+    target = model_dir(source, dest)
+    peer_set = Peers(peers) if peers else None
+    files = load_manifest(manifest_url or f"{base_url}/manifest.json", timeout)
+    phases = {"manifest": time.monotonic() - start}
+    prefetcher = None
+    if stream:
+        files = sorted(
+            files, key=lambda entry: (is_weight_file(entry["path"]), entry["path"])
+        )
+        prefetcher = Prefetcher()
+
+    downloads = []
+    present = 0
+    for entry in files:
+        file_path = osp.join(target, osp.normpath(entry["path"]))
+        if (
+            osp.exists(file_path)
+            and osp.getsize(file_path) == entry["size"]
+            and sha256_file(file_path) == entry["sha256"]
+        ):
+            present += entry["size"]
+            if prefetcher and is_weight_file(file_path):
+                prefetcher.submit(file_path)
+            continue
+        download = FileDownload(
+            f"{base_url}/{entry['path']}",
+            file_path,
+            entry["size"],
+            entry["sha256"],
+            chunk_size,
+            peer_path=f"{osp.basename(target)}/{entry['path']}",
+        )
+        if prefetcher and is_weight_file(file_path):
+            download.on_finish = prefetcher.submit
+        downloads.append(download)
+
+    if stream:
+        batches = [
+            ("metadata", [d for d in downloads if not is_weight_file(d.path)]),
+            ("shards", [d for d in downloads if is_weight_file(d.path)]),
+        ]
+    else:
+        batches = [("download", downloads)]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for phase, batch in batches:
+            phase_start = time.monotonic()
+            _download_all(executor, batch, retries, timeout, peer_set)
+            phases[phase] = time.monotonic() - phase_start
+            if stream:
+                LOG.info(
+                    "Phase %s: %d files, %.1f MiB in %.1fs",
+                    phase,
+                    len(batch),
+                    sum(download.downloaded for download in batch) / MIB,
+                    phases[phase],
+                )
+    if prefetcher:
+        # Only the shards finished last should still be in flight.
+        prefetch_start = time.monotonic()
+        prefetched = prefetcher.wait()
+        phases["prefetch"] = time.monotonic() - prefetch_start
+
+    elapsed = max(time.monotonic() - start, 1e-6)
+    downloaded = sum(download.downloaded for download in downloads)
+    from_peers = sum(download.from_peers for download in downloads)
+    LOG.info(
+        "Fetched %s: %d files, %.1f MiB downloaded (%.1f MiB from peers), "
+        "%.1f MiB already present, in %.1fs (%.1f MiB/s)",
+        target,
+        len(files),
+        downloaded / MIB,
+        from_peers / MIB,
+        present / MIB,
+        elapsed,
+        downloaded / MIB / elapsed,
+    )
+    stats = {
+        "files": len(files),
+        "bytes_downloaded": downloaded,
+        "bytes_present": present,
+        "bytes_from_peers": from_peers,
+        "seconds": elapsed,
+    }
+    if stream:
+        stats.update(bytes_prefetched=prefetched, phases=phases)
+    _emit_download(source, started_at, stats, downloads)
+    return stats
+
+
+def _emit_download(source, started_at, stats, downloads):
+    """
+    Write the ``download`` telemetry record of a fetch.
+    """
+    timed = [download for download in downloads if download.seconds]
+    metrics = {
+        "DownloadTime": round(stats["seconds"], 3),
+        "BytesDownloaded": stats["bytes_downloaded"],
+        "BytesFromPeers": stats["bytes_from_peers"],
+        "BytesPresent": stats["bytes_present"],
+        "Throughput": round(stats["bytes_downloaded"] / stats["seconds"]),
+        "FileThroughput": [
+            round(download.downloaded / download.seconds) for download in timed
+        ],
+    }
+    for phase, seconds in stats.get("phases", {}).items():
+        if phase != "manifest":
+            metrics[f"{phase.capitalize()}PhaseTime"] = round(seconds, 3)
+    fetch_metrics.emit(
+        metrics,
+        {
+            "Event": "download",
+            "Source": source,
+            "StartTime": int(started_at * 1000),
+            "EndTime": int(time.time() * 1000),
+            "Files": [
+                {
+                    "Path": download.peer_path.split("/", 1)[1],
+                    "Bytes": download.downloaded,
+                    "BytesFromPeers": download.from_peers,
+                    "Seconds": round(download.seconds, 3),
+                }
+                for download in timed
+            ],
+        },
+    )
+
+
+def _download_all(executor, downloads, retries, timeout, peers):
+    """
+    Download the chunks of ``downloads``, in order, on ``executor``.
+
+    A file that peers served bad bytes of goes back to the executor, to be
+    downloaded again from the origin.
+    """
+    futures = []
+
+    def _submit(download, chunk_start, chunk_end, chunk_peers):
+        future = executor.submit(
+            _fetch_chunk,
+            download,
+            chunk_start,
+            chunk_end,
+            retries,
+            timeout,
+            chunk_peers,
+        )
+        futures.append((download, future))
+
+    for download in downloads:
+        ranges = download.chunks()
+        if not ranges:
+            # Every chunk was downloaded before an interruption.
+            download.finish()
+        for chunk_start, chunk_end in ranges:
+            _submit(download, chunk_start, chunk_end, peers)
+    try:
+        # Grows while it is walked, by the chunks to fetch from the origin.
+        for download, future in futures:
+            for chunk_start, chunk_end in future.result():
+                _submit(download, chunk_start, chunk_end, None)
+    except BaseException:
+        for _, future in futures:
+            future.cancel()
+        raise
+
+
+class _PeerHandler(BaseHTTPRequestHandler):
+    """
+    Serves the verified model files under ``root`` to peers, with single
+    ``Range`` support.
+    """
+
+    protocol_version = "HTTP/1.1"
+    root = None
+
+    def do_GET(self):
+        file_path = self._file_path()
+        if file_path is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        with open(file_path, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            start, end, status = 0, size - 1, 200
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2) or end), end)
+                status = 206
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(status)
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Length", str(end + 1 - start))
+            self.end_headers()
+            self.connection.sendfile(fp, start, end + 1 - start)
+
+    def _file_path(self):
+        """
+        The file a request names, or None if it is not one to serve: outside
+        ``root``, hidden (the completion marker, the Hugging Face cache) or
+        a download in progress.
+        """
+        relative = osp.normpath(urllib.parse.unquote(self.path.split("?")[0]))
+        parts = relative.lstrip("/").split("/")
+        if any(part.startswith(".") for part in parts) or relative.endswith(
+            (".part", ".part.done", ".lock")
+        ):
+            return None
+        file_path = osp.join(self.root, *parts)
+        return file_path if osp.isfile(file_path) else None
+
+    def log_message(self, format, *args):
+        LOG.debug("Peer %s: " + format, self.client_address[0], *args)
+
+
+def serve_peers(dest, port=DEFAULT_PEER_PORT) -> ThreadingHTTPServer:
+    """
+    A server of the models under ``dest`` for ``FETCH_BACKEND=p2p`` peers.
+
+    A file is in place only once it has been verified, so whatever it
+    serves is complete, even while this node is still fetching the rest.
+
+    :param port: Port to listen on; 0 picks a free one.
+    """
+    handler = type("PeerHandler", (_PeerHandler,), {"root": osp.abspath(dest)})
+    return ThreadingHTTPServer(("0.0.0.0", port), handler)
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print(
+            "usage: fetch_model.py <source-ref> <dest>\n"
+            "       fetch_model.py --serve <dest>\n"
+            "       fetch_model.py --prefetch <model-dir>",
+            file=sys.stderr,
+        )
+        return 2
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s fetch_model %(levelname)s %(message)s",
+        stream=sys.stderr,
+    )
+    if argv[0] == "--serve":
+        server = serve_peers(
+            argv[1], int(os.environ.get("FETCH_PEER_PORT", DEFAULT_PEER_PORT))
+        )
+        LOG.info("Serving %s to peers on port %d", argv[1], server.server_address[1])
+        server.serve_forever()
+        return 0
+    if argv[0] == "--prefetch":
+        prefetch_model(argv[1])
+        return 0
+    source, dest = argv
+    peers = None
+    if os.environ.get("FETCH_BACKEND") == "p2p":
+        peers = resolve_peers(
+            os.environ.get("FETCH_PEERS", ""),
+            int(os.environ.get("FETCH_PEER_PORT", DEFAULT_PEER_PORT)),
+        )
+        if not peers:
+            LOG.warning("No peers in FETCH_PEERS, fetching from the origin")
+    try:
+        fetch_https(
+            source,
+            dest,
+            manifest_url=os.environ.get("FETCH_MANIFEST"),
+            concurrency=int(os.environ.get("FETCH_CONCURRENCY", DEFAULT_CONCURRENCY)),
+            chunk_size=int(os.environ.get("FETCH_CHUNK_MB", DEFAULT_CHUNK_MB)) * MIB,
+            retries=int(os.environ.get("FETCH_RETRIES", DEFAULT_RETRIES)),
+            peers=peers,
+            stream=os.environ.get("FETCH_STREAM") == "1",
+        )
+    except FetchError as err:
+        LOG.error("%s", err)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,15 +6,36 @@
 # at serve time. The source of the weights (HF today; a mirror, P2P swarm, or
 # Lustre later) can change without touching the serving command or image.
 #
-# Experiment 2 implements only FETCH_BACKEND=http with an hf:// source. The
-# https://, p2p, and lustre paths are intentionally stubs so the interface
-# (<source-ref>, <dest>, FETCH_BACKEND) stays stable for later specs.
+# FETCH_BACKEND=http takes an hf:// source (Hugging Face) or an https://
+# source: a model on our internal mirror, with a manifest.json listing its
+# files, downloaded by fetch_model.py with parallel, resumable range requests
+# (tuned with FETCH_CONCURRENCY, FETCH_CHUNK_MB, FETCH_RETRIES; the manifest
+# URL can be overridden with FETCH_MANIFEST). FETCH_STREAM=1 fetches config
+# and tokenizer files first, then the shards in order, reading each into the
+# page cache once verified, and logs the time of each phase.
+# FETCH_METRICS_SERVICE=<service name> writes fetch telemetry (cache hit or
+# miss, times, bytes, throughput) to stdout as CloudWatch EMF records.
+#
+# FETCH_BACKEND=p2p takes an https:// source too, but fetches each chunk from
+# the peers in FETCH_PEERS (host[:port], comma-separated; port FETCH_PEER_PORT
+# by default) before falling back to the mirror. A peer is a node running
+# `fetch_model.py --serve <dest>`, which entrypoint.sh starts for this backend.
+# The lustre backend is intentionally a stub so the interface (<source-ref>,
+# <dest>, FETCH_BACKEND) stays stable for a later spec.
 set -eu
 
 SRC="$1"
 DEST="$2"
 : "${FETCH_BACKEND:=http}"
 
+# Fetch once per host. $DEST is a host_path volume: unless the model directory
+# already holds a complete copy (model_cache.py checks its completion marker),
+# run this script again, as the fetch below, under a host-wide lock.
+if [ -z "${FETCH_MODEL_CACHED:-}" ]; then
+  FETCH_MODEL_CACHED=1 exec python3 "$(dirname "$0")/model_cache.py" \
+    "$SRC" "$DEST/$(basename "${SRC%/}")" -- sh "$0" "$SRC" "$DEST"
+fi
+
 case "$FETCH_BACKEND" in
   http)
     case "$SRC" in
@@ -28,8 +49,7 @@ case "$FETCH_BACKEND" in
           --local-dir "$DEST/$(basename "$REPO")"
         ;;
       https://*|http://*)
-        echo "https source deferred to Experiment 1" >&2
-        exit 2
+        python3 "$(dirname "$0")/fetch_model.py" "$SRC" "$DEST"
         ;;
       *)
         echo "unsupported source ref: $SRC" >&2
@@ -37,7 +57,18 @@ case "$FETCH_BACKEND" in
         ;;
     esac
     ;;
-  p2p|lustre)
+  p2p)
+    case "$SRC" in
+      https://*|http://*)
+        python3 "$(dirname "$0")/fetch_model.py" "$SRC" "$DEST"
+        ;;
+      *)
+        echo "FETCH_BACKEND=p2p needs an https:// source, got: $SRC" >&2
+        exit 2
+        ;;
+    esac
+    ;;
+  lustre)
     echo "backend $FETCH_BACKEND deferred to fetch spec" >&2
     exit 2
     ;;
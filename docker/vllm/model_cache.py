@@ -0,0 +1,178 @@
+"""
+Fetch a model once per host.
+
+Usage: ``model_cache.py <source-ref> <model-dir> -- <fetch command>``.
+
+The model directory is on the instance (the ``/var/models`` host_path volume
+of ``test_data/experiment2``), so it outlives the task that fetched it. After
+a fetch succeeds, a completion marker (``MARKER_NAME``) in the directory
+records the source and the path and size of every file. A later task on the
+same host runs the fetch command only if the marker is missing, names another
+source, or no longer matches the files on disk -- a restart on a warm node
+goes straight to serving.
+
+The check and the fetch run under an exclusive lock on ``<model-dir>.lock``,
+so tasks sharing a multi-GPU host do not download the same weights at the
+same time: the first fetches, the others wait and then find the marker. The
+kernel releases the lock if its holder dies.
+
+Every run writes a ``fetch`` telemetry record (see ``fetch_metrics.py``):
+cache hit or miss, time and model size.
+
+``fetch_model.sh`` runs its own fetch through this. Standard library only.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from os import path as osp
+
+import fetch_metrics
+
+LOG = logging.getLogger("fetch_model")
+
+MARKER_NAME = ".fetch-complete.json"
+# Leftovers of an interrupted fetch_model.py download.
+_PARTIAL_SUFFIXES = (".part", ".part.done")
+
+
+def tree_manifest(model_dir) -> dict:
+    """
+    The files of a model directory, without the marker and partial downloads.
+
+    :return: ``{relative path: size}``.
+    """
+    files = {}
+    for dirpath, _, filenames in os.walk(model_dir):
+        for filename in filenames:
+            if filename == MARKER_NAME or filename.endswith(_PARTIAL_SUFFIXES):
+                continue
+            file_path = osp.join(dirpath, filename)
+            files[osp.relpath(file_path, model_dir)] = osp.getsize(file_path)
+    return files
+
+
+def is_complete(source, model_dir) -> bool:
+    """
+    Whether the marker says ``model_dir`` holds all of ``source``.
+
+    Files are compared by size, not content: reading every shard on each
+    start would cost most of what the cache saves.
+    """
+    try:
+        with open(osp.join(model_dir, MARKER_NAME)) as fp:
+            marker = json.load(fp)
+    except (OSError, ValueError):
+        return False
+    if marker.get("source") != source or not marker.get("files"):
+        return False
+    for relative, size in marker["files"].items():
+        file_path = osp.join(model_dir, relative)
+        if not osp.isfile(file_path) or osp.getsize(file_path) != size:
+            LOG.info("Cached %s is incomplete: %s changed", model_dir, relative)
+            return False
+    return True
+
+
+def mark_complete(source, model_dir):
+    """
+    Write the completion marker of a fetched model.
+    """
+    marker = {
+        "source": source,
+        "created": time.time(),
+        "files": tree_manifest(model_dir),
+    }
+    marker_path = osp.join(model_dir, MARKER_NAME)
+    with open(f"{marker_path}.tmp", "w") as fp:
+        json.dump(marker, fp, indent=2, sort_keys=True)
+    os.replace(f"{marker_path}.tmp", marker_path)
+
+
+@contextmanager
+def locked(model_dir):
+    """
+    Hold the host-wide lock of a model directory.
+    """
+    os.makedirs(osp.dirname(osp.abspath(model_dir)), exist_ok=True)
+    with open(f"{model_dir}.lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            LOG.info("Another task is fetching %s, waiting for it", model_dir)
+            start = time.monotonic()
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            LOG.info("Waited %.1fs for %s", time.monotonic() - start, model_dir)
+        yield
+
+
+def ensure(source, model_dir, fetch) -> bool:
+    """
+    Run ``fetch`` unless ``model_dir`` already holds a complete ``source``.
+
+    :param source: Source ref of the model.
+    :param model_dir: Where the fetch puts the model.
+    :param fetch: Callable that fetches the model into ``model_dir``.
+    :return: True if the cached copy was used.
+    """
+    started_at = time.time()
+    start = time.monotonic()
+    with locked(model_dir):
+        hit = is_complete(source, model_dir)
+        if hit:
+            LOG.info("Model cache hit: %s already holds %s", model_dir, source)
+        else:
+            LOG.info("Model cache miss: fetching %s into %s", source, model_dir)
+            marker_path = osp.join(model_dir, MARKER_NAME)
+            if osp.exists(marker_path):
+                # The fetch may stop halfway; never leave a stale marker behind.
+                os.remove(marker_path)
+            fetch()
+            mark_complete(source, model_dir)
+    fetch_metrics.emit(
+        {
+            "CacheHit": int(hit),
+            "CacheMiss": int(not hit),
+            "FetchTime": round(time.monotonic() - start, 3),
+            "ModelBytes": sum(tree_manifest(model_dir).values()),
+        },
+        {
+            "Event": "fetch",
+            "Source": source,
+            "ModelDir": model_dir,
+            "Backend": os.environ.get("FETCH_BACKEND", "http"),
+            "StartTime": int(started_at * 1000),
+            "EndTime": int(time.time() * 1000),
+        },
+    )
+    return hit
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 4 or argv[2] != "--":
+        print(
+            "usage: model_cache.py <source-ref> <model-dir> -- <fetch command>",
+            file=sys.stderr,
+        )
+        return 2
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s fetch_model %(levelname)s %(message)s",
+        stream=sys.stderr,
+    )
+    source, model_dir, command = argv[0], argv[1], argv[3:]
+    try:
+        ensure(source, model_dir, lambda: subprocess.run(command, check=True))
+    except subprocess.CalledProcessError as err:
+        return err.returncode
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,10 +11,15 @@ module "ecr_image_tagger" {
   timeout           = 120
 
   environment_variables = {
-    ECS_CLUSTER_NAME    = aws_ecs_cluster.ecs.name
-    ECS_SERVICE_NAME    = aws_ecs_service.ecs.name
-    DEPLOYED_TAG_PREFIX = var.deployed_image_tag_prefix
-    LOG_LEVEL           = var.ecr_image_tagger_log_level
+    ECS_CLUSTER_NAME          = aws_ecs_cluster.ecs.name
+    ECS_SERVICE_NAME          = aws_ecs_service.ecs.name
+    DEPLOYED_TAG_PREFIX       = var.deployed_image_tag_prefix
+    LOG_LEVEL                 = var.ecr_image_tagger_log_level
+    DEDUP_SSM_PARAMETER       = var.ecr_image_tagger_persistent_dedup ? aws_ssm_parameter.ecr_image_tagger_last_tagged[0].name : ""
+    TAGGER_MAX_WORKERS        = tostring(var.ecr_image_tagger_max_concurrency)
+    METRICS_NAMESPACE         = local.ecr_image_tagger_metrics_namespace
+    IMAGE_CACHE_DIR           = var.ecr_image_tagger_image_cache ? "/tmp/ecr-image-tagger" : ""
+    TAGGER_RETRY_MAX_ATTEMPTS = tostring(var.ecr_image_tagger_retry_max_attempts)
   }
 
   additional_iam_policy_arns = [
@@ -75,6 +80,38 @@ data "aws_iam_policy_document" "ecr_image_tagger" {
       local.ecr_image_repo_arn
     ]
   }
+
+  dynamic "statement" {
+    for_each = var.ecr_image_tagger_persistent_dedup ? [1] : []
+    content {
+      sid = "DedupParameter"
+      actions = [
+        "ssm:GetParameter",
+        "ssm:PutParameter",
+      ]
+      resources = [
+        aws_ssm_parameter.ecr_image_tagger_last_tagged[0].arn
+      ]
+    }
+  }
+}
+
+# Last task definition the Lambda tagged: its ARN if every ECR image is pinned
+# by digest, otherwise the digests its tags resolved to. Lets a cold-started
+# Lambda skip periodic SERVICE_STEADY_STATE events for unchanged images with
+# one read. The Lambda owns the value after creation.
+resource "aws_ssm_parameter" "ecr_image_tagger_last_tagged" {
+  #checkov:skip=CKV2_AWS_34: holds a task definition ARN or image digests, not a secret
+  count       = var.enable_ecr_image_tagging && var.ecr_image_tagger_persistent_dedup ? 1 : 0
+  name        = "/ecs/${aws_ecs_cluster.ecs.name}/${var.service_name}/ecr-image-tagger/last-tagged-task-definition"
+  description = "Last task definition of ${var.service_name} whose ECR images were tagged"
+  type        = "String"
+  value       = "none"
+  tags        = local.default_module_tags
+
+  lifecycle {
+    ignore_changes = [value]
+  }
 }
 
 resource "aws_iam_policy" "ecr_image_tagger" {
@@ -71,12 +71,16 @@ module "vllm" {
     { name = "MODEL_DIR", value = "/models" },
     { name = "VLLM_MAX_MODEL_LEN", value = tostring(var.max_model_len) },
     { name = "FETCH_BACKEND", value = "http" },
+    { name = "FETCH_STREAM", value = "1" },
+    # Model-fetch EMF records for the "Model fetch" row of the GPU dashboard.
+    { name = "FETCH_METRICS_SERVICE", value = var.service_name },
     { name = "HF_XET_HIGH_PERFORMANCE", value = "1" },
   ]
 
-  enable_cloudwatch_logs   = true
-  access_log_force_destroy = true
-  replication_region       = local.replication_region
+  enable_cloudwatch_logs       = true
+  enable_model_fetch_dashboard = true
+  access_log_force_destroy     = true
+  replication_region           = local.replication_region
 }
 
 locals {
@@ -1,21 +1,37 @@
+import asyncio
+import functools
+import os
+import random
 import shutil
 import time
 import logging
 from os import path as osp, remove
 from textwrap import dedent
 
+import aiohttp
 import pytest
 from boto3 import Session
-from botocore.exceptions import ClientError
+from botocore.config import Config
 from infrahouse_core.logging import setup_logging
-from infrahouse_core.timeout import timeout
-from requests import get
+from pytest_infrahouse import terraform as infrahouse_terraform
+import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 
+from tests import provider_cache, timing
+from tests.parallel import SharedResource, worker_id
+from tests.task_definitions import purge_task_definitions
+from tests.vpc_purge import purge_injected_vpc_resources
+from tests.waiter import Schedule, WaitTimeoutError, wait_for
+
 DEFAULT_PROGRESS_INTERVAL = 10
+HTTPD_HEALTHY_BODY = "<html><body><h1>It works!</h1></body></html>\n"
 
 LOG = logging.getLogger(__name__)
 TERRAFORM_ROOT_DIR = "test_data"
+_PROVIDER_CACHE_ROOT = os.environ.get(
+    "TERRAFORM_CACHE_ROOT", provider_cache.DEFAULT_CACHE_ROOT
+)
 
 setup_logging(LOG, debug=True)
 # setup_logging only attaches handlers to the logger it is given, so pytest-infrahouse
@@ -24,65 +40,323 @@ setup_logging(LOG, debug=True)
 setup_logging(logging.getLogger("pytest_infrahouse"), debug=True)
 
 
-def wait_for_success(url, wait_time=300, request_timeout=10):
+def body_equals(expected):
+    """
+    Body matcher: the response body is exactly ``expected``.
+    """
+    return lambda body: body == expected
+
+
+def body_contains(fragment):
+    """
+    Body matcher: the response body contains ``fragment``.
+    """
+    return lambda body: fragment in body
+
+
+def any_body(body):
+    """
+    Body matcher: any body will do, only the status code counts.
+    """
+    return True
+
+
+HTTPD_IS_HEALTHY = body_equals(HTTPD_HEALTHY_BODY)
+HEALTHY = "healthy"
+
+
+class LatencyHistogram:
+    """
+    Latencies of HTTP attempts, bucketed for a one-line report.
+
+    :param name: What was measured, for the report.
+    """
+
+    BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies_ms = []
+
+    def record(self, seconds):
+        self.latencies_ms.append(seconds * 1000)
+
+    def counts(self):
+        """
+        Number of attempts per bucket, keyed by the bucket's upper bound in ms;
+        ``inf`` collects everything slower than the last bucket.
+        """
+        counts = dict.fromkeys(self.BUCKETS_MS + (float("inf"),), 0)
+        for latency in self.latencies_ms:
+            bound = next(bound for bound in counts if latency <= bound)
+            counts[bound] += 1
+        return counts
+
+    def report(self):
+        if not self.latencies_ms:
+            LOG.info("%s: no attempts", self.name)
+            return
+        ordered = sorted(self.latencies_ms)
+        LOG.info(
+            "%s: %d attempts, p50 %.0f ms, p90 %.0f ms, max %.0f ms; %s",
+            self.name,
+            len(ordered),
+            ordered[len(ordered) // 2],
+            ordered[int(len(ordered) * 0.9)],
+            ordered[-1],
+            ", ".join(
+                f"<={bound:g}ms: {count}"
+                for bound, count in self.counts().items()
+                if count
+            ),
+        )
+
+
+_HTTP_SESSION = None
+
+
+def http_session():
+    """
+    Return the process-wide ``requests`` session the health pollers share.
+
+    Reusing it keeps connections to the ALB alive between attempts, so an
+    attempt costs one request instead of a DNS lookup, a TCP connection and
+    a TLS handshake, and the measured latency is the service's.
+    """
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        _HTTP_SESSION = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        _HTTP_SESSION.mount("http://", adapter)
+        _HTTP_SESSION.mount("https://", adapter)
+    return _HTTP_SESSION
+
+
+def wait_for_success(
+    url,
+    wait_time=300,
+    request_timeout=10,
+    matcher=HTTPD_IS_HEALTHY,
+    interval=1,
+    progress_interval=30,
+    schedule=None,
+):
     """
     Wait for a URL to return a successful response.
 
+    Attempts go through :func:`http_session`. Their latencies are reported as a
+    histogram when the wait ends, successful or not.
+
     :param url: URL to poll
     :param wait_time: Maximum time to wait in seconds (default: 300)
     :param request_timeout: Timeout for each HTTP request in seconds (default: 10)
+    :param matcher: Called with the body of a 200 response; returns True if it is
+        the expected one (default: the httpd welcome page, see
+        :func:`body_equals`, :func:`body_contains` and :func:`any_body`)
+    :param interval: Seconds between attempts (default: 1)
+    :param schedule: :class:`~tests.waiter.Schedule` of the attempts; overrides
+        ``interval``
+    :param progress_interval: Seconds between progress log lines (default: 30)
+    :return: Seconds it took the URL to become healthy.
+    :raises RuntimeError: If the URL is not healthy within ``wait_time``.
     """
-    end_of_wait = time.time() + wait_time
-    attempt = 0
-    LOG.info("Waiting for %s to become healthy (timeout: %ds)", url, wait_time)
+    histogram = LatencyHistogram(f"Attempts on {url}")
 
-    while time.time() < end_of_wait:
-        attempt += 1
-        remaining = int(end_of_wait - time.time())
+    def _attempt():
+        attempt_start = time.perf_counter()
         try:
-            response = get(url, timeout=request_timeout)
-            assert (
-                response.status_code == 200
-            ), f"Expected 200, got {response.status_code}"
-            assert (
-                response.text == "<html><body><h1>It works!</h1></body></html>\n"
-            ), f"Unexpected response body"
-            LOG.info("URL %s is healthy after %d attempts", url, attempt)
-            return
-
+            response = http_session().get(url, timeout=request_timeout)
         except RequestException as err:
             # Connection errors, timeouts, etc. - retry
-            LOG.debug(
-                "Attempt %d: Connection error: %s (%ds remaining)",
-                attempt,
-                type(err).__name__,
-                remaining,
-            )
-            time.sleep(1)
-
-        except AssertionError as err:
-            # Got a response but not the expected one - retry
-            LOG.debug("Attempt %d: %s (%ds remaining)", attempt, err, remaining)
-            time.sleep(1)
-
-        # Log progress every 30 seconds
-        if attempt % 30 == 0:
-            LOG.info(
-                "Still waiting for %s (%ds remaining, %d attempts)",
-                url,
-                remaining,
-                attempt,
+            return f"Connection error: {type(err).__name__}"
+        finally:
+            histogram.record(time.perf_counter() - attempt_start)
+        if response.status_code != 200:
+            return f"Expected 200, got {response.status_code}"
+        if not matcher(response.text):
+            return "Unexpected response body"
+        return HEALTHY
+
+    start = time.monotonic()
+    try:
+        wait_for(
+            _attempt,
+            f"{url} to become healthy",
+            timeout_s=wait_time,
+            until=lambda state: state == HEALTHY,
+            schedule=schedule or Schedule.fixed(interval),
+            phase="http health",
+            progress_interval=progress_interval,
+        )
+    except WaitTimeoutError as err:
+        raise RuntimeError(
+            f"{url} didn't become healthy after {wait_time} seconds "
+            f"({err.attempts} attempts, last: {err.last})"
+        ) from err
+    finally:
+        histogram.report()
+    return time.monotonic() - start
+
+
+class _UrlHealth:
+    """
+    Polling state of one URL in :func:`wait_for_all_success`.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.attempts = 0
+        self.healthy_after = None
+        self.last_error = "not polled yet"
+
+
+async def _poll_until_healthy(
+    session, state, deadline, matcher, min_delay, max_delay, histogram
+):
+    """
+    Poll one URL until it returns 200 with the expected body or the deadline
+    passes. The delay between attempts doubles up to ``max_delay``, with
+    jitter so that many URLs do not poll in lockstep.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    delay = min_delay
+    while loop.time() < deadline:
+        state.attempts += 1
+        attempt_start = loop.time()
+        try:
+            async with session.get(state.url) as response:
+                body = await response.text()
+            histogram.record(loop.time() - attempt_start)
+            if response.status != 200:
+                state.last_error = f"Expected 200, got {response.status}"
+            elif not matcher(body):
+                state.last_error = "Unexpected response body"
+            else:
+                state.healthy_after = loop.time() - start
+                LOG.info(
+                    "URL %s is healthy after %d attempts (%.1fs)",
+                    state.url,
+                    state.attempts,
+                    state.healthy_after,
+                )
+                return
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            histogram.record(loop.time() - attempt_start)
+            state.last_error = f"{type(err).__name__}: {err}"
+
+        LOG.debug("Attempt %d on %s: %s", state.attempts, state.url, state.last_error)
+        pause = min(delay * random.uniform(0.5, 1.0), deadline - loop.time())
+        if pause > 0:
+            await asyncio.sleep(pause)
+        delay = min(delay * 2, max_delay)
+
+
+async def _report_progress(states, deadline, interval):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        pending = [state for state in states if state.healthy_after is None]
+        LOG.info(
+            "Still waiting for %d of %d URL(s) (%ds remaining): %s",
+            len(pending),
+            len(states),
+            max(0, int(deadline - loop.time())),
+            ", ".join(f"{state.url} ({state.last_error})" for state in pending),
+        )
+
+
+async def _poll_all(urls, wait_time, request_timeout, matcher, min_delay, max_delay):
+    states = [_UrlHealth(url) for url in urls]
+    histogram = LatencyHistogram(f"Attempts on {len(urls)} URL(s)")
+    deadline = asyncio.get_running_loop().time() + wait_time
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=len(urls)),
+        timeout=aiohttp.ClientTimeout(total=request_timeout),
+    ) as session:
+        progress = asyncio.create_task(
+            _report_progress(states, deadline, DEFAULT_PROGRESS_INTERVAL)
+        )
+        try:
+            await asyncio.gather(
+                *(
+                    _poll_until_healthy(
+                        session,
+                        state,
+                        deadline,
+                        matcher,
+                        min_delay,
+                        max_delay,
+                        histogram,
+                    )
+                    for state in states
+                )
             )
+        finally:
+            progress.cancel()
+            histogram.report()
+    return states
+
+
+def wait_for_all_success(
+    urls,
+    wait_time=300,
+    request_timeout=10,
+    matcher=HTTPD_IS_HEALTHY,
+    min_delay=1,
+    max_delay=10,
+):
+    """
+    Wait for several URLs at once to return a successful response.
+
+    All URLs are polled concurrently over one connection pool, each with its
+    own exponential backoff, so the wait takes as long as the slowest URL
+    rather than the sum of all of them.
 
-    raise RuntimeError(
-        f"{url} didn't become healthy after {wait_time} seconds ({attempt} attempts)"
+    :param urls: URLs to poll.
+    :param wait_time: Maximum time to wait for all URLs, in seconds (default: 300)
+    :param request_timeout: Timeout for each HTTP request in seconds (default: 10)
+    :param matcher: Called with the body of a 200 response; returns True if it is
+        the expected one (default: the httpd welcome page, as in
+        :func:`wait_for_success`)
+    :param min_delay: Delay after the first failed attempt, in seconds (default: 1)
+    :param max_delay: Upper bound of the delay between attempts (default: 10)
+    :return: Seconds each URL took to become healthy, keyed by URL.
+    :raises RuntimeError: If any URL is not healthy by the deadline.
+    """
+    LOG.info(
+        "Waiting for %d URL(s) to become healthy (timeout: %ds): %s",
+        len(urls),
+        wait_time,
+        ", ".join(urls),
     )
+    with timing.phase("wait http health (all)"):
+        states = asyncio.run(
+            _poll_all(urls, wait_time, request_timeout, matcher, min_delay, max_delay)
+        )
+    unhealthy = [state for state in states if state.healthy_after is None]
+    if unhealthy:
+        raise RuntimeError(
+            f"{len(unhealthy)} URL(s) didn't become healthy after {wait_time} seconds: "
+            + "; ".join(
+                f"{state.url} ({state.attempts} attempts, last: {state.last_error})"
+                for state in unhealthy
+            )
+        )
+    return {state.url: state.healthy_after for state in states}
 
 
 def update_terraform_tf(terraform_module_dir, aws_provider_version):
+    """
+    Pin the AWS provider version of a stack in its ``terraform.tf``.
+
+    The file is left alone if it already pins that version, so its mtime and
+    Terraform's view of the configuration do not change between runs.
+
+    :return: True if the file was (re)written.
+    """
     terraform_tf_path = osp.join(terraform_module_dir, "terraform.tf")
-    with open(terraform_tf_path, "w") as fp:
-        fp.write(dedent(f"""
+    content = dedent(f"""
                 terraform {{
                   required_providers {{
                     aws = {{
@@ -91,7 +365,52 @@ def update_terraform_tf(terraform_module_dir, aws_provider_version):
                     }}
                   }}
                 }}
-                """))
+                """)
+    try:
+        with open(terraform_tf_path) as fp:
+            if fp.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(terraform_tf_path, "w") as fp:
+        fp.write(content)
+    return True
+
+
+# (stack directory, seconds) of every ``terraform init`` in the session.
+_INIT_TIMES = []
+
+
+def time_terraform_init(run):
+    """
+    Wrap ``pytest_infrahouse``'s command runner to time ``terraform init``.
+
+    ``terraform_apply`` runs the init of every stack; with the provider cache
+    configured (see the ``terraform_provider_cache`` fixture) a warm init only
+    links the cached providers. After each init newly cached providers are
+    added to the offline mirror. Other commands pass through unchanged.
+
+    :param run: ``pytest_infrahouse.terraform.run_with_retries``.
+    :return: A runner with the same signature.
+    """
+
+    @functools.wraps(run)
+    def _run(cmd, *args, **kwargs):
+        if cmd[:2] != ["terraform", "init"]:
+            return run(cmd, *args, **kwargs)
+
+        terraform_module_dir = kwargs.get("cwd")
+        start = time.monotonic()
+        result = run(cmd, *args, **kwargs)
+        elapsed = time.monotonic() - start
+        _INIT_TIMES.append((terraform_module_dir, elapsed))
+        LOG.info("terraform init in %s took %.1fs", terraform_module_dir, elapsed)
+        if "TF_PLUGIN_CACHE_DIR" in os.environ:
+            for package in provider_cache.harvest(_PROVIDER_CACHE_ROOT):
+                LOG.info("Added %s to the provider mirror", package)
+        return result
+
+    return _run
 
 
 def cleanup_dot_terraform(terraform_module_dir):
@@ -111,25 +430,130 @@ def cleanup_dot_terraform(terraform_module_dir):
             pass
 
 
-# Tag that the service_network fixture (and all InfraHouse fixtures) stamp on
-# every resource they create, via provider default_tags. Resources lacking it
-# were injected by AWS (e.g. GuardDuty), not by Terraform.
-FIXTURE_TAG_KEY = "created_by_fixture"
+def pytest_addoption(parser):
+    parser.addoption(
+        "--terraform-offline",
+        action="store_true",
+        default=False,
+        help="Install Terraform providers from the local provider mirror only.",
+    )
+    timing.add_options(parser)
+
 
+def pytest_configure(config):
+    timing.configure(config)
 
-def _is_aws_injected(resource: dict) -> bool:
+
+def pytest_terminal_summary(terminalreporter):
+    if not _INIT_TIMES:
+        return
+    terminalreporter.section("terraform init")
+    for terraform_module_dir, elapsed in _INIT_TIMES:
+        terminalreporter.write_line(f"{elapsed:7.1f}s  {terraform_module_dir}")
+    terminalreporter.write_line(
+        f"{sum(elapsed for _, elapsed in _INIT_TIMES):7.1f}s  total"
+    )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def terraform_provider_cache(request):
     """
-    Return True if an AWS resource was created by AWS rather than the fixture.
+    Share downloaded Terraform providers across stacks and test runs.
+
+    Configures the environment every ``terraform`` command inherits: a plugin
+    cache under ``$TERRAFORM_CACHE_ROOT`` (default ``~/.cache/terraform``), or
+    with ``--terraform-offline`` the filesystem mirror built from it. The init
+    ``terraform_apply`` runs is timed and fills the mirror (see
+    :func:`time_terraform_init`).
+    """
+    offline = request.config.getoption("--terraform-offline")
+    config_path = provider_cache.configure(
+        os.environ, _PROVIDER_CACHE_ROOT, offline=offline
+    )
+    LOG.info(
+        "Terraform providers from the %s (%s)",
+        "local mirror" if offline else "plugin cache",
+        config_path,
+    )
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(
+            infrahouse_terraform,
+            "run_with_retries",
+            time_terraform_init(infrahouse_terraform.run_with_retries),
+        )
+        yield
+
+
+# Session resources shared across pytest-xdist workers, by fixture name.
+_SHARED_RESOURCES = {}
 
-    Fixture-created resources carry the ``created_by_fixture`` tag (set via the
-    provider's default_tags). AWS-injected resources (e.g. GuardDuty runtime
-    monitoring) do not.
 
-    :param resource: A describe_* entry that has a ``Tags`` list (VPC endpoint,
-        security group, ...).
-    :return: True if the resource is not fixture-owned.
+def _share_across_workers(request, tmp_path_factory, name):
     """
-    return not any(tag["Key"] == FIXTURE_TAG_KEY for tag in resource.get("Tags", []))
+    Yield the pytest_infrahouse session fixture ``name``, created once for all
+    pytest-xdist workers rather than once per worker.
+
+    The worker that creates it keeps the plugin fixture, so the plugin's own
+    teardown destroys it -- after this waits for the other workers to finish.
+    """
+    if worker_id() is None:
+        yield request.getfixturevalue(name)
+        return
+
+    shared = SharedResource(name, tmp_path_factory.getbasetemp().parent)
+    _SHARED_RESOURCES[name] = shared
+    value = shared.acquire(lambda: request.getfixturevalue(name))
+    if shared.owner:
+        # Cleanups run after all fixture teardowns, i.e. after the destroy.
+        request.config.add_cleanup(shared.remove)
+        LOG.info("Created %s for all workers", name)
+    yield value
+    if shared.owner:
+        shared.wait_for_last_user()
+    else:
+        shared.release()
+
+
+@pytest.fixture(scope="session")
+def service_network(request, tmp_path_factory, terraform_provider_cache):
+    """
+    The pytest_infrahouse ``service_network``, shared by all pytest-xdist workers.
+    """
+    yield from _share_across_workers(request, tmp_path_factory, "service_network")
+
+
+@pytest.fixture(scope="session")
+def subzone(request, tmp_path_factory, terraform_provider_cache):
+    """
+    The pytest_infrahouse ``subzone``, shared by all pytest-xdist workers.
+    """
+    yield from _share_across_workers(request, tmp_path_factory, "subzone")
+
+
+@pytest.fixture(scope="session")
+def cleanup_ecs_task_definitions(boto3_session, aws_region, keep_after):
+    """
+    Track the ECS task definition families a test registers and delete all
+    their revisions at the end of the session.
+
+    Replaces the pytest_infrahouse fixture of the same name, which deregistered
+    and deleted one revision at a time. See :mod:`tests.task_definitions`.
+
+    :return: A function that registers a family for cleanup.
+    """
+    task_families = set()
+    yield task_families.add
+
+    if task_families and not keep_after:
+        purge_task_definitions(
+            boto3_session.client(
+                "ecs",
+                region_name=aws_region,
+                # Back off on throttling across the parallel deregistrations.
+                config=Config(retries={"mode": "adaptive", "max_attempts": 10}),
+            ),
+            task_families,
+        )
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -153,10 +577,11 @@ def purge_aws_injected_vpc_resources(
 
     These are identified by the absence of the ``created_by_fixture`` tag the
     fixture stamps on everything it creates. This fixture depends on
-    ``service_network``, so its finalizer runs *before* that destroy. It removes
-    the endpoint first (waiting for its ENIs to clear), then the security group
-    (which the ENIs referenced). It is a no-op in accounts where no such
-    resources exist (e.g. the CI account).
+    ``service_network``, so its finalizer runs *before* that destroy. It deletes
+    the endpoints, then each security group as soon as no ENI references it
+    (see :mod:`tests.vpc_purge`). It is a no-op in accounts where no such
+    resources exist (e.g. the CI account). Under pytest-xdist, only the worker
+    that owns the VPC purges it, once every worker is done with it.
 
     :param service_network: Fixture providing the test VPC outputs.
     :param boto3_session: Boto3 session for AWS API calls.
@@ -168,60 +593,13 @@ def purge_aws_injected_vpc_resources(
     if keep_after:
         return
 
-    vpc_id = service_network["vpc_id"]["value"]
-    ec2_client = boto3_session.client("ec2", region_name=aws_region)
-    vpc_filter = [{"Name": "vpc-id", "Values": [vpc_id]}]
-
-    # 1. Endpoints. Their ENIs must clear before the security group can go.
-    injected_endpoints = [
-        endpoint["VpcEndpointId"]
-        for endpoint in ec2_client.describe_vpc_endpoints(Filters=vpc_filter)[
-            "VpcEndpoints"
-        ]
-        if _is_aws_injected(endpoint)
-    ]
-    if injected_endpoints:
-        LOG.info("Deleting AWS-injected VPC endpoints: %s", injected_endpoints)
-        ec2_client.delete_vpc_endpoints(VpcEndpointIds=injected_endpoints)
-        try:
-            with timeout(300):
-                while any(
-                    _is_aws_injected(endpoint) and endpoint["State"] != "deleted"
-                    for endpoint in ec2_client.describe_vpc_endpoints(
-                        Filters=vpc_filter
-                    )["VpcEndpoints"]
-                ):
-                    time.sleep(5)
-            LOG.info("AWS-injected VPC endpoints removed")
-        except TimeoutError:
-            LOG.warning(
-                "Timed out waiting for VPC endpoints to delete: %s",
-                injected_endpoints,
-            )
+    shared = _SHARED_RESOURCES.get("service_network")
+    if shared is not None:
+        if not shared.owner:
+            return
+        shared.wait_for_last_user()
 
-    # 2. Non-default security groups (e.g. GuardDutyManagedSecurityGroup). A
-    #    leftover non-default SG makes DeleteVpc fail with DependencyViolation.
-    injected_sgs = [
-        group["GroupId"]
-        for group in ec2_client.describe_security_groups(Filters=vpc_filter)[
-            "SecurityGroups"
-        ]
-        if group["GroupName"] != "default" and _is_aws_injected(group)
-    ]
-    for group_id in injected_sgs:
-        LOG.info("Deleting AWS-injected security group: %s", group_id)
-        try:
-            with timeout(120):
-                while True:
-                    try:
-                        ec2_client.delete_security_group(GroupId=group_id)
-                        break
-                    except ClientError as err:
-                        # ENIs from the just-deleted endpoint may still be
-                        # detaching and referencing this group; retry until gone.
-                        if err.response["Error"]["Code"] == "DependencyViolation":
-                            time.sleep(5)
-                            continue
-                        raise
-        except TimeoutError:
-            LOG.warning("Timed out deleting security group: %s", group_id)
+    purge_injected_vpc_resources(
+        boto3_session.client("ec2", region_name=aws_region),
+        service_network["vpc_id"]["value"],
+    )
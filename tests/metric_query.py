@@ -0,0 +1,178 @@
+"""
+Read several CloudWatch metrics at once, as time series on a shared time axis.
+
+:func:`query_metrics` fetches every requested metric in one paginated
+``GetMetricData`` request, where ``GetMetricStatistics`` needs a request per
+metric, and returns a :class:`MetricSeries`: one sorted timestamp axis and,
+per metric, a list of values aligned to it, ``nan`` where the metric has no
+datapoint. Tests poll it to see which metrics have appeared, and use it
+after the fact to analyze how the service responded to them.
+"""
+
+import math
+import time
+from datetime import datetime, timezone
+
+# GetMetricData accepts up to 500 queries per request.
+MAX_QUERIES = 500
+
+
+class MetricSeries:
+    """
+    Time series of several metrics, aligned on one timestamp axis.
+
+    :param timestamps: Sorted datapoint timestamps of all metrics together.
+    :param values: Metric name to values, one per timestamp; ``nan`` where
+        the metric has no datapoint at that timestamp.
+    """
+
+    def __init__(self, timestamps, values):
+        self.timestamps = timestamps
+        self.values = values
+
+    def __repr__(self):
+        return (
+            f"MetricSeries({len(self.timestamps)} timestamps, "
+            f"metrics={sorted(self.values)})"
+        )
+
+    def present(self) -> list:
+        """
+        Names of the metrics that have at least one datapoint.
+        """
+        return sorted(
+            name
+            for name, values in self.values.items()
+            if any(not math.isnan(value) for value in values)
+        )
+
+    def missing(self) -> list:
+        """
+        Names of the metrics that have no datapoints.
+        """
+        return sorted(set(self.values) - set(self.present()))
+
+    def count(self, name) -> int:
+        """
+        Number of datapoints of a metric.
+
+        :param name: Metric name.
+        """
+        return sum(1 for value in self.values[name] if not math.isnan(value))
+
+    def latest(self, name):
+        """
+        The latest datapoint of a metric.
+
+        :param name: Metric name.
+        :return: ``(timestamp, value)``, or ``None`` if it has no datapoints.
+        """
+        for timestamp, value in zip(
+            reversed(self.timestamps), reversed(self.values[name])
+        ):
+            if not math.isnan(value):
+                return timestamp, value
+        return None
+
+    def first_time(self, name, predicate, since=None):
+        """
+        Timestamp of the first datapoint of a metric that satisfies a predicate.
+
+        :param name: Metric name.
+        :param predicate: Called with each value in time order.
+        :param since: Ignore datapoints before this timestamp.
+        :return: The timestamp, or ``None`` if no datapoint satisfies it.
+        """
+        for timestamp, value in zip(self.timestamps, self.values[name]):
+            if since and timestamp < since:
+                continue
+            if not math.isnan(value) and predicate(value):
+                return timestamp
+        return None
+
+
+def query_metrics(
+    cloudwatch_client,
+    namespace,
+    metric_names,
+    dimensions,
+    start=None,
+    end=None,
+    period=60,
+    stat="Average",
+) -> MetricSeries:
+    """
+    Fetch several metrics that share a namespace and dimensions.
+
+    :param cloudwatch_client: Boto3 CloudWatch client.
+    :param namespace: Metric namespace, e.g. ``"CWAgent"``.
+    :param metric_names: Metric names.
+    :param dimensions: Dimension name to value, e.g.
+        ``{"AutoScalingGroupName": asg_name}``.
+    :param start: Start of the window, a datetime or a Unix timestamp
+        (default: 15 minutes before ``end``).
+    :param end: End of the window (default: now).
+    :param period: Granularity, in seconds.
+    :param stat: Statistic, e.g. ``"Average"`` or ``"p99"``.
+    :return: The aligned series; metrics without datapoints are all ``nan``.
+    """
+    metric_names = list(metric_names)
+    if len(metric_names) > MAX_QUERIES:
+        raise ValueError(
+            f"GetMetricData takes at most {MAX_QUERIES} queries, "
+            f"got {len(metric_names)}"
+        )
+    end = _as_datetime(end if end is not None else time.time())
+    start = _as_datetime(start if start is not None else end.timestamp() - 900)
+
+    # Query ids must start with a lowercase letter; metric names need not.
+    queries = [
+        {
+            "Id": f"m{index}",
+            "Label": name,
+            "MetricStat": {
+                "Metric": {
+                    "Namespace": namespace,
+                    "MetricName": name,
+                    "Dimensions": [
+                        {"Name": key, "Value": value}
+                        for key, value in dimensions.items()
+                    ],
+                },
+                "Period": period,
+                "Stat": stat,
+            },
+            "ReturnData": True,
+        }
+        for index, name in enumerate(metric_names)
+    ]
+    names = {query["Id"]: query["Label"] for query in queries}
+
+    datapoints = {name: {} for name in metric_names}
+    paginator = cloudwatch_client.get_paginator("get_metric_data")
+    for page in paginator.paginate(
+        MetricDataQueries=queries,
+        StartTime=start,
+        EndTime=end,
+        ScanBy="TimestampAscending",
+    ):
+        # A metric's datapoints may continue on the next page.
+        for result in page["MetricDataResults"]:
+            datapoints[names[result["Id"]]].update(
+                zip(result["Timestamps"], result["Values"])
+            )
+
+    timestamps = sorted(set().union(*(points.keys() for points in datapoints.values())))
+    return MetricSeries(
+        timestamps,
+        {
+            name: [points.get(timestamp, math.nan) for timestamp in timestamps]
+            for name, points in datapoints.items()
+        },
+    )
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromtimestamp(value, tz=timezone.utc)
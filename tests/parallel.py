@@ -0,0 +1,222 @@
+"""
+Run the Terraform stack tests in parallel pytest-xdist workers.
+
+Each test applies its own ``test_data/<name>`` stack, so the stacks are
+independent. What they share is in the way of running them in parallel:
+
+* A stack directory holds the Terraform working state (``.terraform``, the
+  lock file, ``terraform.tfvars``, the local state file), which
+  :func:`tests.conftest.cleanup_dot_terraform` deletes before every run.
+  Under xdist, :func:`stack_dir` gives every worker its own copy of the
+  directory instead.
+* The session fixtures ``service_network`` and ``subzone`` apply a module
+  shipped inside ``pytest_infrahouse``, in one directory for all workers.
+  :class:`SharedResource` lets the first worker create the resource and
+  hands its outputs to the others through a file, so the session still has
+  one network and one zone; the creating worker destroys it after the last
+  worker is done with it.
+
+Without xdist both are pass-throughs.
+"""
+
+import json
+import logging
+import os
+import shutil
+from os import path as osp
+
+from filelock import FileLock
+
+from tests.waiter import Schedule, wait_for
+
+# The suite's logger; tests/conftest.py attaches its handlers.
+LOG = logging.getLogger("tests.conftest")
+
+# Files that belong to a worker's copy of a stack directory, not to the source.
+WORKING_FILES = {".terraform", ".terraform.lock.hcl", "terraform.tfvars"}
+
+
+def worker_id():
+    """
+    The pytest-xdist worker this process is, e.g. ``"gw0"``.
+
+    :return: The worker id, or ``None`` when not running under xdist.
+    """
+    return os.environ.get("PYTEST_XDIST_WORKER")
+
+
+def stack_dir(terraform_root_dir, name):
+    """
+    Directory to apply the ``name`` stack in.
+
+    Outside xdist it is the stack directory itself. Under xdist it is a
+    per-worker copy next to it, ``<name>.<worker>``, at the same depth, so
+    relative module sources such as ``../../`` still resolve to the module.
+    Every call refreshes the copied sources; Terraform state left in the copy
+    by a ``--keep-after`` run is kept.
+
+    :param terraform_root_dir: Directory with the stacks, e.g. ``test_data``.
+    :param name: Stack name, e.g. ``"httpd"``.
+    :return: Path to the directory.
+    """
+    source = osp.join(terraform_root_dir, name)
+    worker = worker_id()
+    if worker is None:
+        return source
+
+    destination = f"{source}.{worker}"
+    shutil.copytree(
+        source,
+        destination,
+        ignore=lambda _, names: [n for n in names if n in WORKING_FILES],
+        dirs_exist_ok=True,
+    )
+    return destination
+
+
+class SharedResource:
+    """
+    A session resource that one xdist worker creates and the others reuse.
+
+    The handoff file holds the resource's value, the number of workers using
+    it, the owner's PID and whether the owner is tearing it down; a file
+    lock serializes all access. A worker that arrives while the resource is being torn down
+    waits for the teardown, then creates a new one.
+
+    :param name: Resource name; names the handoff file.
+    :param handoff_dir: Directory every worker of the session sees, e.g.
+        ``tmp_path_factory.getbasetemp().parent``.
+    :param poll_interval: Seconds between checks of the handoff file.
+    """
+
+    def __init__(self, name, handoff_dir, poll_interval=5):
+        self.name = name
+        self.path = osp.join(handoff_dir, f"{name}.json")
+        self.poll_interval = poll_interval
+        self.owner = False
+        self._lock = FileLock(f"{self.path}.lock")
+        self._released = False
+
+    def acquire(self, create, timeout_s=3600):
+        """
+        Return the resource, creating it if no worker has.
+
+        A handoff left by a worker that is no longer running is stale: its
+        owner will never tear the resource down or finish tearing it down,
+        so the resource is created again.
+
+        :param create: Creates the resource and returns its JSON-serializable
+            value. Called with the lock held, so other workers wait for it
+            rather than create a second resource.
+        :param timeout_s: Seconds to wait for a teardown in progress.
+        :return: The resource's value.
+        :raises WaitTimeoutError: If the teardown does not finish in time.
+        """
+
+        def _acquire():
+            with self._lock:
+                state = self._read()
+                if state is not None and not _running(state.get("owner_pid")):
+                    LOG.warning(
+                        "Owner %s of %s is gone, creating it again.",
+                        state.get("owner_pid"),
+                        self.name,
+                    )
+                    state = None
+                if state is None:
+                    value = create()
+                    self._write(
+                        {
+                            "value": value,
+                            "users": 1,
+                            "closing": False,
+                            "owner_pid": os.getpid(),
+                        }
+                    )
+                    self.owner = True
+                    return [value]
+                if not state["closing"]:
+                    state["users"] += 1
+                    self._write(state)
+                    return [state["value"]]
+                return None
+
+        (value,) = wait_for(
+            _acquire,
+            f"{self.name} teardown by another worker",
+            timeout_s=timeout_s,
+            schedule=Schedule.fixed(self.poll_interval),
+        )
+        return value
+
+    def release(self):
+        """
+        Stop using the resource. Safe to call more than once.
+        """
+        if self._released:
+            return
+        with self._lock:
+            state = self._read()
+            state["users"] -= 1
+            self._write(state)
+        self._released = True
+
+    def wait_for_last_user(self, timeout_s=3600):
+        """
+        As the owner, wait until no worker uses the resource, then mark it
+        as being torn down so that no worker starts using it again.
+
+        :param timeout_s: Seconds to wait for the other workers.
+        """
+        self.release()
+
+        def _users():
+            with self._lock:
+                state = self._read()
+                if state["users"] == 0:
+                    state["closing"] = True
+                    self._write(state)
+                return state["users"]
+
+        wait_for(
+            _users,
+            f"other workers to release {self.name}",
+            timeout_s=timeout_s,
+            until=lambda users: users == 0,
+            schedule=Schedule.fixed(self.poll_interval),
+        )
+
+    def remove(self):
+        """
+        As the owner, after the resource is torn down, forget it.
+        """
+        with self._lock:
+            if osp.exists(self.path):
+                os.remove(self.path)
+
+    def _read(self):
+        try:
+            with open(self.path) as fp:
+                return json.load(fp)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, state):
+        with open(self.path, "w") as fp:
+            json.dump(state, fp)
+
+
+def _running(pid):
+    """
+    Whether a process with this PID is running on this host, as every xdist
+    worker of a local session is.
+    """
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,58 @@
+"""
+Plan-only tests: every ``test_data`` stack planned with mocked providers.
+
+No AWS account and no credentials are needed, only ``terraform`` >= 1.11 on
+PATH (for ``override_during = plan``). See :mod:`tests.terraform_plan`.
+"""
+
+import os
+import shutil
+from os import path as osp
+
+import pytest
+
+from tests import provider_cache
+from tests.conftest import TERRAFORM_ROOT_DIR, update_terraform_tf
+from tests.parallel import stack_dir
+from tests.terraform_plan import plan_stack, terraform_version
+
+AWS_PROVIDER_VERSION = "~> 6.0"
+MIN_TERRAFORM_VERSION = (1, 11)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def purge_aws_injected_vpc_resources():
+    """
+    Override the integration suite's session finalizer.
+
+    The parent conftest's fixture depends on ``service_network``, which would
+    create a real VPC. Plans need none.
+    """
+    yield
+
+
+@pytest.fixture(scope="session")
+def plan():
+    """
+    Plan a stack with mocked providers; cached across runs.
+
+    :return: Callable ``plan(name, **variables)`` that returns a
+        :class:`tests.terraform_plan.Plan`.
+    """
+    if shutil.which("terraform") is None:
+        pytest.skip("terraform is not on PATH")
+    version = terraform_version()
+    if tuple(int(part) for part in version.split(".")[:2]) < MIN_TERRAFORM_VERSION:
+        pytest.skip(f"terraform {version} is older than 1.11")
+
+    cache_dir = osp.join(
+        os.environ.get("TERRAFORM_CACHE_ROOT", provider_cache.DEFAULT_CACHE_ROOT),
+        "plans",
+    )
+
+    def _plan(name, **variables):
+        terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, name)
+        update_terraform_tf(terraform_module_dir, AWS_PROVIDER_VERSION)
+        return plan_stack(terraform_module_dir, variables, cache_dir=cache_dir)
+
+    return _plan
@@ -0,0 +1,142 @@
+// Plan a test_data stack with every provider call mocked: no AWS account, no
+// credentials, no cost. tests/terraform_plan.py runs this file against each
+// stack with `terraform test -test-directory=<this directory> -json -verbose`
+// and reads the plan from the "test_plan" message.
+//
+// override_during = plan (Terraform >= 1.11) makes the mocked computed values
+// known at plan time, so jsonencode()d attributes such as container
+// definitions are planned in full instead of "(known after apply)".
+
+mock_provider "aws" {
+  override_during = plan
+
+  mock_data "aws_region" {
+    defaults = {
+      name   = "us-west-2"
+      region = "us-west-2"
+    }
+  }
+
+  mock_data "aws_caller_identity" {
+    defaults = {
+      account_id = "123456789012"
+      arn        = "arn:aws:iam::123456789012:user/plan"
+    }
+  }
+
+  mock_data "aws_availability_zones" {
+    defaults = {
+      names    = ["us-west-2a", "us-west-2b", "us-west-2c"]
+      zone_ids = ["usw2-az1", "usw2-az2", "usw2-az3"]
+    }
+  }
+
+  mock_data "aws_subnet" {
+    defaults = {
+      vpc_id            = "vpc-0123456789abcdef0"
+      availability_zone = "us-west-2a"
+      cidr_block        = "10.0.1.0/24"
+    }
+  }
+
+  mock_data "aws_route53_zone" {
+    defaults = {
+      name = "plan.example.com"
+    }
+  }
+
+  mock_data "aws_ami" {
+    defaults = {
+      id           = "ami-0123456789abcdef0"
+      architecture = "x86_64"
+    }
+  }
+
+  mock_data "aws_ssm_parameter" {
+    defaults = {
+      value          = "ami-0123456789abcdef0"
+      insecure_value = "ami-0123456789abcdef0"
+    }
+  }
+
+  // Sized like an m5.xlarge, so the scaling submodule gets plausible numbers.
+  mock_data "aws_ec2_instance_type" {
+    defaults = {
+      memory_size   = 16384
+      default_vcpus = 4
+    }
+  }
+
+  // The mocked "json" is opaque; tests/terraform_plan.py reads the statements
+  // from the data source's arguments instead.
+  mock_data "aws_iam_policy_document" {
+    defaults = {
+      json = "{\"Version\":\"2012-10-17\",\"Statement\":[]}"
+    }
+  }
+
+  mock_data "aws_iam_policy" {
+    defaults = {
+      arn = "arn:aws:iam::aws:policy/service-role/AmazonECSTaskExecutionRolePolicy"
+    }
+  }
+
+  mock_data "aws_iam_instance_profile" {
+    defaults = {
+      role_name = "plan-instance-role"
+    }
+  }
+
+  // The module splits these ARNs (see autoscaling.tf), so they need real shapes.
+  mock_resource "aws_lb" {
+    defaults = {
+      arn        = "arn:aws:elasticloadbalancing:us-west-2:123456789012:loadbalancer/app/plan/0123456789abcdef"
+      arn_suffix = "app/plan/0123456789abcdef"
+    }
+  }
+
+  mock_resource "aws_lb_target_group" {
+    defaults = {
+      arn        = "arn:aws:elasticloadbalancing:us-west-2:123456789012:targetgroup/plan/0123456789abcdef"
+      arn_suffix = "targetgroup/plan/0123456789abcdef"
+    }
+  }
+
+  mock_resource "aws_cloudwatch_log_group" {
+    defaults = {
+      arn = "arn:aws:logs:us-west-2:123456789012:log-group:plan"
+    }
+  }
+
+  mock_resource "aws_iam_role" {
+    defaults = {
+      arn = "arn:aws:iam::123456789012:role/plan"
+    }
+  }
+
+  mock_resource "aws_iam_policy" {
+    defaults = {
+      arn = "arn:aws:iam::123456789012:policy/plan"
+    }
+  }
+
+  mock_resource "aws_ecr_repository" {
+    defaults = {
+      arn            = "arn:aws:ecr:us-west-2:123456789012:repository/plan"
+      repository_url = "123456789012.dkr.ecr.us-west-2.amazonaws.com/plan"
+    }
+  }
+}
+
+mock_provider "random" {
+  override_during = plan
+}
+
+mock_provider "null" {
+  override_during = plan
+}
+
+// The variables come from tests/terraform_plan.py, as -var options.
+run "plan" {
+  command = plan
+}
@@ -0,0 +1,139 @@
+import os
+import re
+from os import path as osp
+
+import pytest
+
+from tests.conftest import TERRAFORM_ROOT_DIR
+
+# The stacks, without the per-worker copies of make test-parallel.
+STACKS = sorted(
+    name
+    for name in os.listdir(TERRAFORM_ROOT_DIR)
+    if osp.isdir(osp.join(TERRAFORM_ROOT_DIR, name)) and "." not in name
+)
+# Policy documents of the module under test, not of the stack or of the
+# modules the module uses.
+MODULE_POLICY_DOCUMENT = re.compile(r"^module\.[^.]+\.data\.aws_iam_policy_document\.")
+
+
+@pytest.mark.parametrize("stack", STACKS)
+def test_container_definitions(plan, stack):
+    containers = plan(stack).container_definitions()
+
+    service = [
+        definitions
+        for address, definitions in containers.items()
+        if address.endswith(".aws_ecs_task_definition.ecs")
+    ]
+    assert len(service) == 1, sorted(containers)
+    assert service[0][0]["essential"] is True
+    assert service[0][0]["portMappings"][0]["containerPort"] > 0
+    for address, definitions in containers.items():
+        for container in definitions:
+            assert container["name"] and container["image"], address
+            assert container.get("memory") or container.get("memoryReservation"), (
+                address,
+                container["name"],
+            )
+
+
+@pytest.mark.parametrize("stack", STACKS)
+def test_module_policies_grant_no_wildcard_actions(plan, stack):
+    planned = plan(stack)
+
+    documents = [
+        address
+        for address in planned.policy_statements()
+        if MODULE_POLICY_DOCUMENT.match(address)
+    ]
+    assert documents
+    for address in documents:
+        wildcards = {
+            action
+            for action in planned.actions(address)
+            if action == "*" or action.endswith(":*")
+        }
+        assert not wildcards, address
+
+
+@pytest.mark.parametrize(
+    "autoscaling_metric, autoscaling_target",
+    [
+        ("ALBRequestCountPerTarget", 100),
+        ("ECSServiceAverageMemoryUtilization", 80),
+        ("ECSServiceAverageCPUUtilization", 70),
+    ],
+)
+def test_autoscaling_policy_tracks_the_metric(
+    plan, autoscaling_metric, autoscaling_target
+):
+    policies = plan(
+        "httpd_autoscaling",
+        autoscaling_metric=autoscaling_metric,
+        autoscaling_target=autoscaling_target,
+    ).scaling_policies()
+
+    assert set(policies) == {"auto-scaling"}
+    policy = policies["auto-scaling"]
+    metric = policy["predefined_metric_specification"][0]
+    assert metric["predefined_metric_type"] == autoscaling_metric
+    assert policy["target_value"] == autoscaling_target
+    if autoscaling_metric == "ALBRequestCountPerTarget":
+        # app/<lb name>/<lb id>/targetgroup/<tg name>/<tg id>
+        assert re.fullmatch(
+            r"app/[^/]+/[^/]+/targetgroup/[^/]+/[^/]+", metric["resource_label"]
+        )
+    else:
+        assert not metric.get("resource_label")
+
+
+def test_gpu_service(plan):
+    planned = plan("test_gpu")
+
+    (service,) = [
+        definitions[0]
+        for address, definitions in planned.container_definitions().items()
+        if address.endswith(".aws_ecs_task_definition.ecs")
+    ]
+    assert service["resourceRequirements"] == [{"type": "GPU", "value": "1"}]
+
+    gpu_policy = planned.scaling_policies()["auto-scaling-gpu"]
+    metric = gpu_policy["customized_metric_specification"][0]
+    assert metric["metric_name"] == "nvidia_smi_utilization_gpu"
+    assert metric["dimensions"][0]["name"] == "AutoScalingGroupName"
+
+    (publish,) = [
+        statement
+        for statement in planned.policy_statements()[
+            "module.httpd.data.aws_iam_policy_document.instance_policy"
+        ]
+        if statement.get("Sid") == "AllowGpuMetricPublish"
+    ]
+    assert publish["Action"] == ["cloudwatch:PutMetricData"]
+    assert publish["Condition"]["StringEquals"]["cloudwatch:namespace"] == [
+        metric["namespace"]
+    ]
+
+
+def test_non_gpu_service_has_no_gpu_wiring(plan):
+    planned = plan("httpd")
+
+    assert "auto-scaling-gpu" not in planned.scaling_policies()
+    for definitions in planned.container_definitions().values():
+        for container in definitions:
+            assert "resourceRequirements" not in container
+
+
+def test_ecr_image_tagger_puts_images_in_one_repository(plan):
+    planned = plan("httpd_ecr_tagger")
+
+    statements = {
+        statement["Sid"]: statement
+        for statement in planned.policy_statements()[
+            "module.httpd.data.aws_iam_policy_document.ecr_image_tagger[0]"
+        ]
+    }
+    assert statements["ECRTagImages"]["Action"] == ["ecr:PutImage"]
+    (repository,) = statements["ECRTagImages"]["Resource"]
+    assert re.fullmatch(r"arn:aws:ecr:[^:]+:\d{12}:repository/[^*]+", repository)
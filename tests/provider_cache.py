@@ -0,0 +1,150 @@
+"""
+Keep Terraform providers across test runs.
+
+Every test deletes its stack's ``.terraform`` and lock file, so without a
+cache each ``terraform init`` downloads the AWS provider (hundreds of MB)
+again. :func:`configure` points Terraform at a shared plugin cache through a
+CLI config file; :func:`harvest` copies what the cache holds into a
+content-addressed filesystem mirror, where every provider package is stored
+once under its ``h1:`` hash -- the hash lock files record -- and the mirror's
+``HOST/NAMESPACE/TYPE/VERSION/TARGET`` entries link to it. In offline mode
+Terraform installs providers from that mirror only and never touches the
+network.
+"""
+
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+from os import path as osp
+from textwrap import dedent
+
+DEFAULT_CACHE_ROOT = osp.join(osp.expanduser("~"), ".cache", "terraform")
+
+# Depth of HOST/NAMESPACE/TYPE/VERSION/TARGET in the cache and the mirror.
+_PACKAGE_DEPTH = 5
+
+
+def package_hash(package_dir) -> str:
+    """
+    The ``h1:`` hash of an unpacked provider package, as in lock files.
+
+    It is Go's ``dirhash.Hash1``: the SHA-256 of the sorted
+    ``"<sha256 of file>  <relative path>\\n"`` lines of every file.
+
+    :param package_dir: Directory with the unpacked package.
+    """
+    lines = []
+    for dirpath, _, filenames in os.walk(package_dir):
+        for filename in filenames:
+            file_path = osp.join(dirpath, filename)
+            digest = hashlib.sha256()
+            with open(file_path, "rb") as fp:
+                for chunk in iter(lambda: fp.read(1 << 20), b""):
+                    digest.update(chunk)
+            relative = osp.relpath(file_path, package_dir).replace(os.sep, "/")
+            lines.append(f"{digest.hexdigest()}  {relative}\n")
+    summary = hashlib.sha256("".join(sorted(lines)).encode()).digest()
+    return "h1:" + base64.b64encode(summary).decode()
+
+
+def configure(env, cache_root=DEFAULT_CACHE_ROOT, offline=False) -> str:
+    """
+    Point Terraform at the shared plugin cache, or the mirror when offline.
+
+    :param env: Environment to update, e.g. ``os.environ``.
+    :param cache_root: Directory for the cache, the mirror and the CLI config.
+    :param offline: Install providers from the mirror only.
+    :return: Path to the CLI config file.
+    """
+    cache_dir = osp.join(cache_root, "plugin-cache")
+    mirror_dir = osp.join(cache_root, "mirror")
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(mirror_dir, exist_ok=True)
+
+    if offline:
+        installation = f"""
+            provider_installation {{
+              filesystem_mirror {{
+                path = "{mirror_dir}"
+              }}
+            }}
+            """
+    else:
+        installation = f"""
+            plugin_cache_dir = "{cache_dir}"
+
+            provider_installation {{
+              direct {{}}
+            }}
+            """
+    config_path = osp.join(cache_root, "offline.tfrc" if offline else "online.tfrc")
+    with open(config_path, "w") as fp:
+        fp.write(dedent(installation).lstrip())
+
+    env["TF_CLI_CONFIG_FILE"] = config_path
+    # The stacks run without a lock file, and Terraform ignores the cache for
+    # providers the lock file has no checksums for, unless told otherwise.
+    env["TF_PLUGIN_CACHE_MAY_BREAK_DEPENDENCY_LOCK_FILE"] = "true"
+    if offline:
+        env.pop("TF_PLUGIN_CACHE_DIR", None)
+    else:
+        env["TF_PLUGIN_CACHE_DIR"] = cache_dir
+    return config_path
+
+
+def harvest(cache_root=DEFAULT_CACHE_ROOT) -> list:
+    """
+    Add the providers in the plugin cache to the mirror.
+
+    A package is copied into ``objects/<h1 hash>`` once (``/`` in the hash
+    becomes ``_``); its mirror entry is a symlink to it. Packages already in
+    the mirror are skipped.
+
+    :param cache_root: Directory with the cache and the mirror.
+    :return: ``HOST/NAMESPACE/TYPE/VERSION/TARGET`` of the packages added.
+    """
+    cache_dir = osp.join(cache_root, "plugin-cache")
+    mirror_dir = osp.join(cache_root, "mirror")
+    objects_dir = osp.join(cache_root, "objects")
+    os.makedirs(objects_dir, exist_ok=True)
+
+    added = []
+    for package_dir in _packages(cache_dir):
+        key = osp.relpath(package_dir, cache_dir)
+        entry = osp.join(mirror_dir, key)
+        if osp.lexists(entry):
+            continue
+
+        # The hash is base64, which may contain "/".
+        obj = osp.join(objects_dir, package_hash(package_dir).replace("/", "_"))
+        if not osp.isdir(obj):
+            # Copy aside, then rename: a concurrent harvest never sees half a package.
+            staging = tempfile.mkdtemp(dir=objects_dir)
+            shutil.copytree(package_dir, staging, dirs_exist_ok=True)
+            try:
+                os.rename(staging, obj)
+            except OSError:
+                shutil.rmtree(staging)
+                if not osp.isdir(obj):
+                    raise
+
+        os.makedirs(osp.dirname(entry), exist_ok=True)
+        try:
+            os.symlink(obj, entry)
+        except FileExistsError:
+            continue
+        added.append(key)
+    return added
+
+
+def _packages(root):
+    """
+    Yield the ``HOST/NAMESPACE/TYPE/VERSION/TARGET`` directories under ``root``.
+    """
+    for dirpath, dirnames, _ in os.walk(root):
+        depth = len(osp.relpath(dirpath, root).split(os.sep))
+        if dirpath != root and depth == _PACKAGE_DEPTH:
+            dirnames.clear()
+            yield dirpath
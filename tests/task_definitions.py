@@ -0,0 +1,140 @@
+"""
+Delete every revision of the ECS task definition families a test registered.
+
+Long-lived test accounts accumulate hundreds of revisions per family, and
+deregistering and deleting them one call at a time made teardown crawl.
+:func:`purge_task_definitions` lists the revisions page by page, deregisters
+the active ones in parallel (paced, since ECS throttles the API per account),
+then deletes all of them ``DELETE_BATCH_SIZE`` at a time with
+``DeleteTaskDefinitions``. A revision that fails to deregister is reported
+and left alone; the others are still deleted.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+LOG = logging.getLogger("tests.conftest")
+
+# DeleteTaskDefinitions takes at most 10 task definitions per call.
+DELETE_BATCH_SIZE = 10
+MAX_WORKERS = 8
+# Deregistrations per second, across all workers.
+DEREGISTER_RATE = 5.0
+
+
+class RateLimiter:
+    """
+    Let at most ``rate`` calls per second through, across threads.
+
+    :param rate: Calls per second.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Wait for the next free slot.
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+def _revisions(ecs_client, family, status, page_size=None):
+    """
+    ARNs of the revisions of exactly ``family`` with the given status.
+
+    ``familyPrefix`` also matches longer family names (``web`` matches
+    ``web-worker``), so those are filtered out.
+    """
+    pagination = {"PageSize": page_size} if page_size else {}
+    return [
+        arn
+        for page in ecs_client.get_paginator("list_task_definitions").paginate(
+            familyPrefix=family, status=status, PaginationConfig=pagination
+        )
+        for arn in page["taskDefinitionArns"]
+        if arn.rsplit("/", 1)[-1].rsplit(":", 1)[0] == family
+    ]
+
+
+def purge_task_definitions(
+    ecs_client,
+    families,
+    max_workers=MAX_WORKERS,
+    rate=DEREGISTER_RATE,
+    page_size=None,
+) -> dict:
+    """
+    Deregister and delete every revision of the given families.
+
+    :param ecs_client: Boto3 ECS client.
+    :param families: Task definition family names.
+    :param max_workers: Concurrent deregistrations.
+    :param rate: Deregistrations per second.
+    :param page_size: ``ListTaskDefinitions`` page size (default: the API's).
+    :return: Counts: ``deregistered``, ``deleted`` and ``failed``.
+    """
+    start = time.monotonic()
+    active = []
+    inactive = []
+    for family in sorted(families):
+        active.extend(_revisions(ecs_client, family, "ACTIVE", page_size))
+        inactive.extend(_revisions(ecs_client, family, "INACTIVE", page_size))
+
+    limiter = RateLimiter(rate)
+
+    def _deregister(arn):
+        """
+        :return: None, or the failure in ``DeleteTaskDefinitions`` form.
+        """
+        limiter.acquire()
+        try:
+            ecs_client.deregister_task_definition(taskDefinition=arn)
+        except (BotoCoreError, ClientError) as err:
+            return {"arn": arn, "reason": f"Deregister failed: {err}"}
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        outcomes = list(executor.map(_deregister, active))
+    failures = [failure for failure in outcomes if failure]
+    deregistered = [arn for arn, failure in zip(active, outcomes) if not failure]
+
+    deleted = 0
+    revisions = deregistered + inactive
+    for offset in range(0, len(revisions), DELETE_BATCH_SIZE):
+        response = ecs_client.delete_task_definitions(
+            taskDefinitions=revisions[offset : offset + DELETE_BATCH_SIZE]
+        )
+        deleted += len(response["taskDefinitions"])
+        failures.extend(response["failures"])
+    for failure in failures:
+        LOG.warning(
+            "Failed to purge task definition %s: %s",
+            failure.get("arn"),
+            failure.get("reason"),
+        )
+
+    counts = {
+        "deregistered": len(deregistered),
+        "deleted": deleted,
+        "failed": len(failures),
+    }
+    LOG.info(
+        "Task definition families %s: %d deregistered, %d deleted, %d failed in %.1fs",
+        sorted(families),
+        counts["deregistered"],
+        counts["deleted"],
+        counts["failed"],
+        time.monotonic() - start,
+    )
+    return counts
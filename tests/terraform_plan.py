@@ -0,0 +1,316 @@
+"""
+Plan the test stacks offline and look into the plans.
+
+The integration tests apply every ``test_data`` stack in a real AWS account,
+which takes most of an hour. Most of what a change to the module can break
+-- a container definition, a scaling policy, an IAM statement -- is already
+visible in the plan. :func:`plan_stack` plans a stack with the mocked
+providers of ``tests/plan/plan.tftest.hcl`` (``terraform test`` with
+``mock_provider``; no credentials, no AWS calls) and returns the plan as
+JSON; :class:`Plan` answers questions about it.
+
+Plans are cached under ``<cache root>/plans``, keyed by :func:`input_hash`
+of everything that can change them: the module, the stack, the mocks, the
+variables and the Terraform version. An unchanged stack is not planned again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from os import path as osp
+
+from tests import provider_cache
+
+LOG = logging.getLogger("tests.conftest")
+
+MODULE_DIR = osp.abspath(osp.join(osp.dirname(__file__), ".."))
+PLAN_TEST_DIR = osp.join(osp.dirname(__file__), "plan")
+DEFAULT_CACHE_DIR = osp.join(provider_cache.DEFAULT_CACHE_ROOT, "plans")
+
+# Values for the variables the stacks declare without a default, as the
+# integration tests write them into terraform.tfvars. ``terraform test``
+# ignores the ones a stack does not declare.
+PLAN_VARIABLES = {
+    "region": "us-west-2",
+    "zone_id": "Z0123456789PLANZONE",
+    "subnet_public_ids": ["subnet-0000000000000000a", "subnet-0000000000000000b"],
+    "subnet_private_ids": ["subnet-0000000000000000c", "subnet-0000000000000000d"],
+    "docker_image": "vllm/vllm-openai:latest",
+    "autoscaling_metric": "ECSServiceAverageCPUUtilization",
+    "autoscaling_target": 70,
+}
+
+# Inputs of a plan besides the stack itself, relative to MODULE_DIR.
+_MODULE_INPUTS = ["modules", "assets"]
+
+
+def _input_files(stack_dir):
+    """
+    Yield ``(label, path)`` of every file a plan of ``stack_dir`` reads.
+    """
+    for name in sorted(os.listdir(MODULE_DIR)):
+        if name.endswith(".tf"):
+            yield f"module/{name}", osp.join(MODULE_DIR, name)
+    for top in _MODULE_INPUTS:
+        for dirpath, dirnames, filenames in os.walk(osp.join(MODULE_DIR, top)):
+            dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+            for filename in sorted(filenames):
+                file_path = osp.join(dirpath, filename)
+                yield f"module/{osp.relpath(file_path, MODULE_DIR)}", file_path
+    for name in sorted(os.listdir(stack_dir)):
+        if name.endswith((".tf", ".tfvars", ".lock.hcl")):
+            yield f"stack/{name}", osp.join(stack_dir, name)
+    for name in sorted(os.listdir(PLAN_TEST_DIR)):
+        if name.endswith(".hcl"):
+            yield f"mocks/{name}", osp.join(PLAN_TEST_DIR, name)
+
+
+def input_hash(stack_dir, variables, terraform_version) -> str:
+    """
+    Hash everything that can change the plan of a stack.
+
+    File paths enter the hash relative to the module or the stack, so copies
+    of a stack (see :func:`tests.parallel.stack_dir`) share their plans.
+
+    :param stack_dir: Stack directory.
+    :param variables: Variables passed to the plan.
+    :param terraform_version: Version of the ``terraform`` binary.
+    :return: Hex SHA-256.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"terraform {terraform_version}\n".encode())
+    digest.update(json.dumps(variables, sort_keys=True).encode() + b"\n")
+    for label, file_path in _input_files(stack_dir):
+        with open(file_path, "rb") as fp:
+            content = hashlib.sha256(fp.read()).hexdigest()
+        digest.update(f"{content}  {label}\n".encode())
+    return digest.hexdigest()
+
+
+def terraform_version() -> str:
+    """
+    The version of the ``terraform`` binary on PATH, e.g. ``"1.11.4"``.
+    """
+    result = subprocess.run(
+        ["terraform", "version", "-json"], check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout)["terraform_version"]
+
+
+def _var_option(name, value):
+    # -var takes HCL; JSON is valid HCL for lists, numbers and booleans.
+    return f"-var={name}={value if isinstance(value, str) else json.dumps(value)}"
+
+
+def _run_plan(stack_dir, variables):
+    """
+    Run the mocked plan of a stack and return the plan JSON.
+
+    :raises RuntimeError: If the plan fails.
+    """
+    test_directory = f"-test-directory={osp.relpath(PLAN_TEST_DIR, stack_dir)}"
+    subprocess.run(
+        ["terraform", "init", "-input=false", "-no-color", test_directory],
+        cwd=stack_dir,
+        check=True,
+        capture_output=True,
+    )
+    result = subprocess.run(
+        ["terraform", "test", "-json", "-verbose", "-no-color", test_directory]
+        + [_var_option(name, value) for name, value in sorted(variables.items())],
+        cwd=stack_dir,
+        capture_output=True,
+        text=True,
+    )
+    plan = None
+    errors = []
+    for line in result.stdout.splitlines():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("type") == "test_plan":
+            plan = message["test_plan"]
+        elif message.get("@level") == "error":
+            errors.append(message.get("@message", line))
+    if result.returncode != 0 or plan is None:
+        raise RuntimeError(
+            f"Mocked plan of {stack_dir} failed (exit {result.returncode}): "
+            + ("; ".join(errors) or result.stderr.strip())
+        )
+    return plan
+
+
+def plan_stack(stack_dir, variables=None, cache_dir=DEFAULT_CACHE_DIR) -> "Plan":
+    """
+    Plan a stack with mocked providers, or load the cached plan.
+
+    :param stack_dir: Stack directory, e.g. ``test_data/httpd``.
+    :param variables: Variables on top of :data:`PLAN_VARIABLES`.
+    :param cache_dir: Directory of the cached plans.
+    :return: The plan.
+    :raises RuntimeError: If the plan fails.
+    """
+    variables = {**PLAN_VARIABLES, **(variables or {})}
+    key = input_hash(stack_dir, variables, terraform_version())
+    cache_path = osp.join(cache_dir, f"{key}.json")
+    try:
+        with open(cache_path) as fp:
+            LOG.info("Plan of %s unchanged, cached in %s", stack_dir, cache_path)
+            return Plan(json.load(fp))
+    except FileNotFoundError:
+        pass
+
+    start = time.monotonic()
+    document = _run_plan(stack_dir, variables)
+    LOG.info("Planned %s in %.1fs", stack_dir, time.monotonic() - start)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write, then rename: concurrent workers may plan the same stack.
+    with tempfile.NamedTemporaryFile(
+        "w", dir=cache_dir, suffix=".tmp", delete=False
+    ) as fp:
+        json.dump(document, fp)
+    os.replace(fp.name, cache_path)
+    return Plan(document)
+
+
+def _modules(module):
+    yield module
+    for child in module.get("child_modules", []):
+        yield from _modules(child)
+
+
+def _statement(block):
+    """
+    An ``aws_iam_policy_document`` statement block as an IAM JSON statement.
+    """
+    statement = {
+        "Effect": block.get("effect") or "Allow",
+        "Action": sorted(block.get("actions") or []),
+        "Resource": sorted(block.get("resources") or []),
+    }
+    if block.get("sid"):
+        statement["Sid"] = block["sid"]
+    if block.get("not_actions"):
+        statement["NotAction"] = sorted(block["not_actions"])
+    if block.get("principals"):
+        statement["Principal"] = {
+            principal["type"]: sorted(principal["identifiers"])
+            for principal in block["principals"]
+        }
+    if block.get("condition"):
+        statement["Condition"] = {}
+        for condition in block["condition"]:
+            statement["Condition"].setdefault(condition["test"], {})[
+                condition["variable"]
+            ] = sorted(condition["values"])
+    return statement
+
+
+class Plan:
+    """
+    Questions about a Terraform plan, as ``terraform show -json`` prints it.
+
+    :param document: The plan JSON.
+    """
+
+    def __init__(self, document):
+        self.document = document
+
+    def _values(self, key):
+        root = self.document.get(key, {})
+        # prior_state nests the modules under "values".
+        root = root.get("values", root).get("root_module", {})
+        for module in _modules(root):
+            yield from module.get("resources", [])
+
+    def resources(self, resource_type) -> list:
+        """
+        The planned managed resources of a type, in every module.
+
+        :param resource_type: E.g. ``"aws_ecs_task_definition"``.
+        :return: Resources with ``address`` and ``values``.
+        """
+        return [
+            resource
+            for resource in self._values("planned_values")
+            if resource["mode"] == "managed" and resource["type"] == resource_type
+        ]
+
+    def data_sources(self, data_type) -> list:
+        """
+        The data sources of a type, read during the plan or deferred to apply.
+
+        :param data_type: E.g. ``"aws_iam_policy_document"``.
+        :return: Data sources with ``address`` and ``values``.
+        """
+        found = {
+            resource["address"]: resource
+            for resource in self._values("prior_state")
+            if resource["mode"] == "data" and resource["type"] == data_type
+        }
+        for change in self.document.get("resource_changes", []):
+            if change["mode"] == "data" and change["type"] == data_type:
+                found.setdefault(
+                    change["address"],
+                    {**change, "values": change["change"].get("after") or {}},
+                )
+        return sorted(found.values(), key=lambda resource: resource["address"])
+
+    def container_definitions(self) -> dict:
+        """
+        The containers of every planned task definition.
+
+        :return: ``{task definition address: [container definition, ...]}``.
+        """
+        return {
+            resource["address"]: json.loads(resource["values"]["container_definitions"])
+            for resource in self.resources("aws_ecs_task_definition")
+        }
+
+    def scaling_policies(self) -> dict:
+        """
+        The target tracking configuration of every Application Auto Scaling
+        policy.
+
+        :return: ``{policy name: target_tracking_scaling_policy_configuration}``.
+        """
+        return {
+            resource["values"]["name"]: resource["values"][
+                "target_tracking_scaling_policy_configuration"
+            ][0]
+            for resource in self.resources("aws_appautoscaling_policy")
+        }
+
+    def policy_statements(self) -> dict:
+        """
+        The statements of every IAM policy document.
+
+        The mocked ``json`` of an ``aws_iam_policy_document`` is opaque, so
+        the statements are rebuilt from its arguments.
+
+        :return: ``{data source address: [IAM JSON statement, ...]}``.
+        """
+        return {
+            resource["address"]: [
+                _statement(block) for block in resource["values"].get("statement", [])
+            ]
+            for resource in self.data_sources("aws_iam_policy_document")
+        }
+
+    def actions(self, address) -> set:
+        """
+        Every action a policy document allows.
+
+        :param address: Address of the ``aws_iam_policy_document``.
+        """
+        return {
+            action
+            for statement in self.policy_statements()[address]
+            if statement["Effect"] == "Allow"
+            for action in statement["Action"]
+        }
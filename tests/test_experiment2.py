@@ -1,24 +1,26 @@
 import base64
 import json
 import subprocess
-import time
 from os import path as osp
 from textwrap import dedent
 from typing import Callable
 
 import pytest
-import requests
 from boto3 import Session
 from infrahouse_core.aws.ec2_instance import EC2Instance
-from requests.exceptions import RequestException
 from pytest_infrahouse import terraform_apply
 
 from tests.conftest import (
     LOG,
     TERRAFORM_ROOT_DIR,
+    any_body,
+    http_session,
     update_terraform_tf,
+    wait_for_success,
     cleanup_dot_terraform,
 )
+from tests.parallel import stack_dir
+from tests.waiter import Schedule
 
 # Must match var.model_src basename in test_data/experiment2 and the
 # --served-model-name the container passes to vLLM.
@@ -38,27 +40,19 @@ def _wait_for_vllm_health(hostname: str, timeout_s: int = 1500) -> None:
 
     :param hostname: ALB hostname serving the model.
     :param timeout_s: Maximum seconds to wait for the model to come up.
-    :raises AssertionError: If the endpoint is not healthy within the timeout.
+    :raises RuntimeError: If the endpoint is not healthy within the timeout.
     """
-    url = f"https://{hostname}/health"
-    deadline = time.time() + timeout_s
-    last = "no response"
-    LOG.info("Waiting for vLLM to load and serve at %s (timeout %ds)", url, timeout_s)
-    while time.time() < deadline:
-        try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                LOG.info("vLLM /health is 200; model is loaded and serving")
-                return
-            last = f"status {response.status_code}"
-        except RequestException as err:
-            last = type(err).__name__
-        remaining = int(deadline - time.time())
-        LOG.info("vLLM not ready yet (%s); %ds remaining", last, remaining)
-        time.sleep(15)
-    raise AssertionError(
-        f"vLLM did not become healthy at {url} within {timeout_s}s (last: {last})"
+    LOG.info("Waiting for vLLM to load and serve at %s", hostname)
+    # /health has an empty body; the status code is the signal. Nothing is up
+    # for the first minutes, so back off from 15 s to 45 s between polls.
+    wait_for_success(
+        f"https://{hostname}/health",
+        wait_time=timeout_s,
+        matcher=any_body,
+        schedule=Schedule(initial=15, maximum=45),
+        progress_interval=60,
     )
+    LOG.info("vLLM /health is 200; model is loaded and serving")
 
 
 @pytest.fixture(scope="module")
@@ -164,7 +158,7 @@ def test_experiment2_serves_model(
     subnet_private_ids = service_network["subnet_private_ids"]["value"]
     zone_id = subzone["subzone_id"]["value"]
 
-    terraform_module_dir = osp.join(TERRAFORM_ROOT_DIR, "experiment2")
+    terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, "experiment2")
     cleanup_dot_terraform(terraform_module_dir)
     update_terraform_tf(terraform_module_dir, aws_provider_version)
     with open(osp.join(terraform_module_dir, "terraform.tfvars"), "w") as fp:
@@ -244,7 +238,7 @@ def test_experiment2_serves_model(
             "max_tokens": 64,
             "temperature": 0,
         }
-        response = requests.post(completions_url, json=payload, timeout=120)
+        response = http_session().post(completions_url, json=payload, timeout=120)
         assert (
             response.status_code == 200
         ), f"completion failed: {response.status_code} {response.text}"
@@ -257,6 +251,6 @@ def test_experiment2_serves_model(
 
         # Both nodes serve: fire several requests; all must succeed.
         for i in range(6):
-            r = requests.post(completions_url, json=payload, timeout=120)
+            r = http_session().post(completions_url, json=payload, timeout=120)
             assert r.status_code == 200, f"request {i} failed: {r.status_code} {r.text}"
         LOG.info("Fleet served 6/6 follow-up requests successfully")
@@ -1,5 +1,4 @@
 import json
-import time
 from os import path as osp
 from textwrap import dedent
 from typing import Callable
@@ -7,17 +6,19 @@ from typing import Callable
 import pytest
 from boto3 import Session
 from infrahouse_core.aws.ec2_instance import EC2Instance
-from infrahouse_core.timeout import timeout
 from pytest_infrahouse import terraform_apply
 from pytest_infrahouse.utils import wait_for_instance_refresh
 
 from tests.conftest import (
     LOG,
     TERRAFORM_ROOT_DIR,
-    wait_for_success,
+    wait_for_all_success,
     update_terraform_tf,
     cleanup_dot_terraform,
 )
+from tests.metric_query import query_metrics
+from tests.parallel import stack_dir
+from tests.waiter import Schedule, WaitTimeoutError, wait_for
 
 # Namespace and metric names the host CloudWatch agent's nvidia_gpu collector emits
 # (configured in datasources.tf). The GPU scaling policy tracks
@@ -50,39 +51,36 @@ def _wait_for_gpu_metrics(
     :param timeout_s: Maximum seconds to wait for datapoints on every metric.
     :raises AssertionError: If any metric has no datapoints within the timeout.
     """
+    dimensions = {"AutoScalingGroupName": asg_name}
     pending = set(GPU_EMITTED_METRICS)
+
+    def _pending_metrics():
+        # One GetMetricData request for all metrics, not one request per metric.
+        series = query_metrics(
+            cloudwatch_client, GPU_METRICS_NAMESPACE, sorted(pending), dimensions
+        )
+        for metric_name in series.present():
+            LOG.info(
+                "GPU metric %s present (%d datapoints, latest Average=%.1f)",
+                metric_name,
+                series.count(metric_name),
+                series.latest(metric_name)[1],
+            )
+            pending.discard(metric_name)
+        return sorted(pending)
+
     try:
-        with timeout(timeout_s):
-            while True:
-                for metric_name in list(pending):
-                    stats = cloudwatch_client.get_metric_statistics(
-                        Namespace=GPU_METRICS_NAMESPACE,
-                        MetricName=metric_name,
-                        Dimensions=[
-                            {"Name": "AutoScalingGroupName", "Value": asg_name}
-                        ],
-                        StartTime=time.time() - 900,
-                        EndTime=time.time(),
-                        Period=60,
-                        Statistics=["Average"],
-                    )
-                    if stats["Datapoints"]:
-                        LOG.info(
-                            "GPU metric %s present (%d datapoints, latest Average=%.1f)",
-                            metric_name,
-                            len(stats["Datapoints"]),
-                            sorted(stats["Datapoints"], key=lambda d: d["Timestamp"])[
-                                -1
-                            ]["Average"],
-                        )
-                        pending.discard(metric_name)
-                if not pending:
-                    return
-                LOG.info(
-                    "Waiting for GPU metrics %s on ASG %s", sorted(pending), asg_name
-                )
-                time.sleep(20)
-    except TimeoutError as err:
+        # The agent publishes once a minute; polling faster than every 20s
+        # only helps right after the first datapoint lands.
+        wait_for(
+            _pending_metrics,
+            f"GPU metrics on ASG {asg_name}",
+            timeout_s=timeout_s,
+            until=lambda still_pending: not still_pending,
+            schedule=Schedule(initial=10, maximum=30),
+            phase="GPU metrics",
+        )
+    except WaitTimeoutError as err:
         raise AssertionError(
             f"GPU metrics {sorted(pending)} not published in {GPU_METRICS_NAMESPACE} "
             f"(dimension AutoScalingGroupName={asg_name}) within {timeout_s}s"
@@ -132,7 +130,7 @@ def test_gpu_smoke(
     subnet_private_ids = service_network["subnet_private_ids"]["value"]
     zone_id = subzone["subzone_id"]["value"]
 
-    terraform_module_dir = osp.join(TERRAFORM_ROOT_DIR, "test_gpu")
+    terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, "test_gpu")
     cleanup_dot_terraform(terraform_module_dir)
     update_terraform_tf(terraform_module_dir, aws_provider_version)
     with open(osp.join(terraform_module_dir, "terraform.tfvars"), "w") as fp:
@@ -171,8 +169,9 @@ def test_gpu_smoke(
 
         # End-to-end proof: the service only serves traffic if the GPU task
         # placed on the GPU instance and the nvidia-smi health check passed.
-        for hostname in tf_output["dns_hostnames"]["value"]:
-            wait_for_success(f"https://{hostname}")
+        wait_for_all_success(
+            [f"https://{hostname}" for hostname in tf_output["dns_hostnames"]["value"]]
+        )
 
         ecs_client = boto3_session.client("ecs", region_name=aws_region)
 
@@ -233,45 +232,47 @@ def test_gpu_smoke(
         # GPU host the first health-check result can lag the ALB target becoming
         # healthy, so the status is briefly UNKNOWN.
         gpu_container = None
+
+        def _gpu_container_health():
+            nonlocal gpu_container
+            running_task_arns = ecs_client.list_tasks(
+                cluster=cluster_name, desiredStatus="RUNNING"
+            )["taskArns"]
+            running_tasks = ecs_client.describe_tasks(
+                cluster=cluster_name, tasks=running_task_arns
+            )["tasks"]
+            gpu_tasks = [
+                t for t in running_tasks if t["taskDefinitionArn"] == task_def_arn
+            ]
+            assert (
+                gpu_tasks
+            ), f"No running task for {task_def_arn}; running={running_task_arns}"
+            task_containers = gpu_tasks[0]["containers"]
+            gpu_container = next(
+                (c for c in task_containers if c["name"] == service_name), None
+            )
+            assert gpu_container, (
+                f"No container named {service_name} in running task; "
+                f"got {[c['name'] for c in task_containers]}"
+            )
+            health = gpu_container.get("healthStatus")
+            assert (
+                health != "UNHEALTHY"
+            ), "Container reported UNHEALTHY (nvidia-smi health check failed)"
+            return health
+
         try:
-            with timeout(300):
-                while True:
-                    running_task_arns = ecs_client.list_tasks(
-                        cluster=cluster_name, desiredStatus="RUNNING"
-                    )["taskArns"]
-                    running_tasks = ecs_client.describe_tasks(
-                        cluster=cluster_name, tasks=running_task_arns
-                    )["tasks"]
-                    gpu_tasks = [
-                        t
-                        for t in running_tasks
-                        if t["taskDefinitionArn"] == task_def_arn
-                    ]
-                    assert (
-                        gpu_tasks
-                    ), f"No running task for {task_def_arn}; running={running_task_arns}"
-                    task_containers = gpu_tasks[0]["containers"]
-                    gpu_container = next(
-                        (c for c in task_containers if c["name"] == service_name), None
-                    )
-                    assert gpu_container, (
-                        f"No container named {service_name} in running task; "
-                        f"got {[c['name'] for c in task_containers]}"
-                    )
-                    health = gpu_container.get("healthStatus")
-                    assert (
-                        health != "UNHEALTHY"
-                    ), "Container reported UNHEALTHY (nvidia-smi health check failed)"
-                    if health == "HEALTHY":
-                        break
-                    LOG.info(
-                        "Waiting for container to become HEALTHY (now: %s)", health
-                    )
-                    time.sleep(10)
-        except TimeoutError as err:
+            wait_for(
+                _gpu_container_health,
+                "GPU container to become HEALTHY",
+                timeout_s=300,
+                until=lambda health: health == "HEALTHY",
+                schedule=Schedule(initial=5, maximum=15),
+            )
+        except WaitTimeoutError as err:
             raise AssertionError(
                 "Container did not become HEALTHY (nvidia-smi health check); "
-                f"last status: {gpu_container.get('healthStatus') if gpu_container else 'n/a'}"
+                f"last status: {err.last or 'n/a'}"
             ) from err
 
         assert gpu_container["gpuIds"], "Running task was not allocated a GPU device"
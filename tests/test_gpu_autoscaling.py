@@ -6,7 +6,6 @@ from typing import Callable
 
 import pytest
 from boto3 import Session
-from infrahouse_core.timeout import timeout
 from pytest_infrahouse import terraform_apply
 
 from tests.conftest import (
@@ -15,6 +14,9 @@ from tests.conftest import (
     update_terraform_tf,
     cleanup_dot_terraform,
 )
+from tests.metric_query import query_metrics
+from tests.parallel import stack_dir
+from tests.waiter import Schedule, WaitTimeoutError, wait_for
 
 # The aggregated series the GPU scaling policy tracks (see autoscaling.tf; the real
 # metric is produced by the host CloudWatch agent configured in datasources.tf):
@@ -67,6 +69,50 @@ def _get_desired_count(ecs_client, cluster_name: str, service_name: str) -> int:
     return services[0]["desiredCount"]
 
 
+def _log_scaling_response(
+    cloudwatch_client, asg_name: str, phase: str, inject_value: float, started, reacted
+) -> None:
+    """
+    Log how long the policy took to react once the series reached the injected value.
+
+    Reads the aggregated policy series back after the phase, so the latency is measured
+    from the first 60s period CloudWatch actually aggregated at the injected level --
+    not from the first PutMetricData call, which can land mid-period.
+
+    :param cloudwatch_client: Boto3 CloudWatch client.
+    :param asg_name: AutoScalingGroupName dimension value.
+    :param phase: Label for log messages.
+    :param inject_value: GPU utilization percentage injected during the phase.
+    :param started: When the phase started (Unix timestamp).
+    :param reacted: When desiredCount satisfied the phase (Unix timestamp).
+    """
+    series = query_metrics(
+        cloudwatch_client,
+        GPU_METRICS_NAMESPACE,
+        [GPU_UTIL_METRIC],
+        {"AutoScalingGroupName": asg_name},
+        start=started - 60,
+        end=reacted,
+    )
+    # The high-count injections dominate the host agent's idle samples, so a period
+    # averages to within a few percent of the injected value once it is all injected.
+    reached = series.first_time(
+        GPU_UTIL_METRIC, lambda value: abs(value - inject_value) < 5
+    )
+    if reached is None:
+        LOG.info("%s: no period aggregated at %.0f%% yet", phase, inject_value)
+        return
+    LOG.info(
+        "%s: series reached %.0f%% at %s; desiredCount reacted %.0fs later "
+        "(%.0fs after the phase started)",
+        phase,
+        inject_value,
+        reached.isoformat(),
+        reacted - reached.timestamp(),
+        reacted - started,
+    )
+
+
 def _drive_until_desired(
     ecs_client,
     cloudwatch_client,
@@ -95,28 +141,30 @@ def _drive_until_desired(
     :return: The desiredCount that satisfied the predicate.
     :raises AssertionError: If the predicate is not satisfied within the timeout.
     """
-    last = None
+
+    def _inject_and_read():
+        _put_gpu_util(cloudwatch_client, asg_name, inject_value)
+        return _get_desired_count(ecs_client, cluster_name, service_name)
+
     try:
-        with timeout(timeout_s):
-            while True:
-                _put_gpu_util(cloudwatch_client, asg_name, inject_value)
-                last = _get_desired_count(ecs_client, cluster_name, service_name)
-                if predicate(last):
-                    LOG.info("%s: desiredCount=%d (satisfied)", phase, last)
-                    return last
-                LOG.info(
-                    "%s: desiredCount=%d, injecting GPU util=%.0f%%",
-                    phase,
-                    last,
-                    inject_value,
-                )
-                time.sleep(30)
-    except TimeoutError as err:
+        # Polls at most every 30s: each poll injects a datapoint, and the alarm
+        # needs one in every 60s period.
+        desired = wait_for(
+            _inject_and_read,
+            f"{phase} (injecting GPU util={inject_value:.0f}%)",
+            timeout_s=timeout_s,
+            until=predicate,
+            schedule=Schedule(initial=15, maximum=30),
+            phase=phase,
+        )
+    except WaitTimeoutError as err:
         raise AssertionError(
-            f"{phase}: desiredCount stayed at {last} within {timeout_s}s "
+            f"{phase}: desiredCount stayed at {err.last} within {timeout_s}s "
             f"(injecting GPU util={inject_value}% into {GPU_METRICS_NAMESPACE}/"
             f"{GPU_UTIL_METRIC} for AutoScalingGroupName={asg_name})"
         ) from err
+    LOG.info("%s: desiredCount=%d (satisfied)", phase, desired)
+    return desired
 
 
 @pytest.mark.autoscaling
@@ -162,7 +210,7 @@ def test_gpu_autoscaling_policy(
     subnet_private_ids = service_network["subnet_private_ids"]["value"]
     zone_id = subzone["subzone_id"]["value"]
 
-    terraform_module_dir = osp.join(TERRAFORM_ROOT_DIR, "test_gpu_autoscaling")
+    terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, "test_gpu_autoscaling")
     cleanup_dot_terraform(terraform_module_dir)
     update_terraform_tf(terraform_module_dir, aws_provider_version)
     with open(osp.join(terraform_module_dir, "terraform.tfvars"), "w") as fp:
@@ -205,6 +253,7 @@ def test_gpu_autoscaling_policy(
         # plus Application Auto Scaling's reaction and the ECS apply) — observed anywhere
         # from ~3 to ~11 min in practice — so allow generous headroom to avoid flaking on
         # a timeout rather than a real failure.
+        started = time.time()
         scaled_out = _drive_until_desired(
             ecs_client,
             cloudwatch_client,
@@ -216,6 +265,9 @@ def test_gpu_autoscaling_policy(
             timeout_s=1200,
             phase="scale-out",
         )
+        _log_scaling_response(
+            cloudwatch_client, asg_name, "scale-out", 100, started, time.time()
+        )
         assert (
             scaled_out == 2
         ), f"Expected scale-out to desiredCount 2, got {scaled_out}"
@@ -226,6 +278,7 @@ def test_gpu_autoscaling_policy(
         # scale_in_cooldown), so allow substantially more time than scale-out. The loop
         # returns as soon as it scales in, so the large timeout only costs wall-clock on a
         # genuinely slow scale-in, not on a fast one.
+        started = time.time()
         scaled_in = _drive_until_desired(
             ecs_client,
             cloudwatch_client,
@@ -237,5 +290,8 @@ def test_gpu_autoscaling_policy(
             timeout_s=1800,
             phase="scale-in",
         )
+        _log_scaling_response(
+            cloudwatch_client, asg_name, "scale-in", 0, started, time.time()
+        )
         assert scaled_in == 1, f"Expected scale-in to desiredCount 1, got {scaled_in}"
         LOG.info("GPU policy scaled the service back in to desiredCount=%d", scaled_in)
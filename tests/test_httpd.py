@@ -7,11 +7,12 @@ from pytest_infrahouse import terraform_apply
 
 from tests.conftest import (
     LOG,
-    wait_for_success,
+    wait_for_all_success,
     TERRAFORM_ROOT_DIR,
     update_terraform_tf,
     cleanup_dot_terraform,
 )
+from tests.parallel import stack_dir
 
 
 @pytest.mark.parametrize("aws_provider_version", ["~> 6.0"], ids=["aws-6"])
@@ -30,7 +31,7 @@ def test_module(
     zone_id = subzone["subzone_id"]["value"]
 
     # Create ECS with httpd container
-    terraform_module_dir = osp.join(TERRAFORM_ROOT_DIR, "httpd")
+    terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, "httpd")
     cleanup_dot_terraform(terraform_module_dir)
     update_terraform_tf(terraform_module_dir, aws_provider_version)
     with open(osp.join(terraform_module_dir, "terraform.tfvars"), "w") as fp:
@@ -57,9 +58,7 @@ def test_module(
 
         # Use dns_hostnames from output instead of constructing URLs
         dns_hostnames = tf_httpd_output["dns_hostnames"]["value"]
-        for hostname in dns_hostnames:
-            url = f"https://{hostname}"
-            wait_for_success(url)
+        wait_for_all_success([f"https://{hostname}" for hostname in dns_hostnames])
 
         # Validate CloudWatch log group encryption
         LOG.info("Validating CloudWatch log group encryption...")
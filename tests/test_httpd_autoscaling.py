@@ -8,16 +8,17 @@ from pytest_infrahouse import terraform_apply
 from tests.conftest import (
     LOG,
     TERRAFORM_ROOT_DIR,
-    wait_for_success,
+    wait_for_all_success,
     update_terraform_tf,
     cleanup_dot_terraform,
 )
+from tests.parallel import stack_dir
 
 
 # Temporarily disabled to cut CI runtime: these 3 variants are ~87 min of live
 # applies that only assert the stack serves HTTP (they assert nothing about the
-# per-metric autoscaling wiring). The per-metric policy config will be covered by
-# a plan-only *.tftest.hcl in a follow-up PR, keeping at most one live variant.
+# per-metric autoscaling wiring). The per-metric policy config is covered by the
+# plan-only tier (tests/plan/test_plan.py), keeping at most one live variant.
 # See .claude/plans/ci-test-runtime-reduction.md (recommendation #1).
 @pytest.mark.skip(
     reason="Pending plan-test refactor; see ci-test-runtime-reduction.md #1"
@@ -47,7 +48,7 @@ def test_module(
     zone_id = subzone["subzone_id"]["value"]
 
     # Create ECS with httpd container
-    terraform_module_dir = osp.join(TERRAFORM_ROOT_DIR, "httpd_autoscaling")
+    terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, "httpd_autoscaling")
     cleanup_dot_terraform(terraform_module_dir)
     update_terraform_tf(terraform_module_dir, aws_provider_version)
     with open(osp.join(terraform_module_dir, "terraform.tfvars"), "w") as fp:
@@ -78,6 +79,4 @@ def test_module(
 
         # Use dns_hostnames from output instead of constructing URLs
         dns_hostnames = tf_httpd_output["dns_hostnames"]["value"]
-        for hostname in dns_hostnames:
-            url = f"https://{hostname}"
-            wait_for_success(url)
+        wait_for_all_success([f"https://{hostname}" for hostname in dns_hostnames])
@@ -1,20 +1,20 @@
 import json
-import time
 from os import path as osp
 from textwrap import dedent
 
 import pytest
 from infrahouse_core.aws import ECRRepository
-from infrahouse_core.timeout import timeout
 from pytest_infrahouse import terraform_apply
 
 from tests.conftest import (
     LOG,
-    wait_for_success,
+    wait_for_all_success,
     TERRAFORM_ROOT_DIR,
     update_terraform_tf,
     cleanup_dot_terraform,
 )
+from tests.parallel import stack_dir
+from tests.waiter import Schedule, WaitTimeoutError, wait_for, wait_for_boto3
 
 
 @pytest.mark.parametrize("aws_provider_version", ["~> 6.0"], ids=["aws-6"])
@@ -32,7 +32,7 @@ def test_ecr_image_tagging(
     subnet_private_ids = service_network["subnet_private_ids"]["value"]
     zone_id = subzone["subzone_id"]["value"]
 
-    terraform_module_dir = osp.join(TERRAFORM_ROOT_DIR, "httpd_ecr_tagger")
+    terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, "httpd_ecr_tagger")
     cleanup_dot_terraform(terraform_module_dir)
     update_terraform_tf(terraform_module_dir, aws_provider_version)
     with open(osp.join(terraform_module_dir, "terraform.tfvars"), "w") as fp:
@@ -58,9 +58,7 @@ def test_ecr_image_tagging(
 
         # Wait for ECS service to become healthy
         dns_hostnames = tf_output["dns_hostnames"]["value"]
-        for hostname in dns_hostnames:
-            url = f"https://{hostname}"
-            wait_for_success(url)
+        wait_for_all_success([f"https://{hostname}" for hostname in dns_hostnames])
 
         # Force a new deployment so EventBridge fires SERVICE_STEADY_STATE
         # *after* the rule and Lambda exist. The initial steady state event
@@ -76,14 +74,14 @@ def test_ecr_image_tagging(
         )
 
         # Wait for the new deployment to reach steady state
-        LOG.info("Waiting for new deployment to stabilize...")
-        waiter = ecs_client.get_waiter("services_stable")
-        waiter.wait(
+        wait_for_boto3(
+            ecs_client,
+            "services_stable",
+            f"service {service_name} to stabilize after forced deployment",
+            timeout_s=600,
             cluster=cluster_name,
             services=[service_name],
-            WaiterConfig={"Delay": 15, "MaxAttempts": 40},
         )
-        LOG.info("Service is stable after forced deployment.")
 
         # Poll ECR for the deployed-at- tag
         # EventBridge -> Lambda is async, may take a minute
@@ -100,19 +98,18 @@ def test_ecr_image_tagging(
         image = repo.get_image(tag="latest")
         assert image.exists, "Image latest does not exist in ECR repo"
 
-        deployed_tag = None
-        with timeout(300):
-            while True:
-                tags = image.tags
-                LOG.info("Current image tags: %s", tags)
-                for tag in tags:
-                    if tag.startswith("deployed-at-"):
-                        deployed_tag = tag
-                        break
-                if deployed_tag:
-                    break
-                LOG.info("No deployed-at- tag yet, retrying in 10s...")
-                time.sleep(10)
+        try:
+            deployed_tag = wait_for(
+                lambda: next(
+                    (tag for tag in image.tags if tag.startswith("deployed-at-")), None
+                ),
+                f"a deployed-at- tag on {ecr_repo_name}:latest",
+                timeout_s=300,
+                schedule=Schedule.fixed(10),
+                phase="deployed-at tag",
+            )
+        except WaitTimeoutError:
+            deployed_tag = None
 
         assert deployed_tag is not None, (
             "ECR image was not tagged with deployed-at-* "
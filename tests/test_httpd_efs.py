@@ -11,6 +11,7 @@ from tests.conftest import (
     update_terraform_tf,
     cleanup_dot_terraform,
 )
+from tests.parallel import stack_dir
 
 
 @pytest.mark.parametrize("aws_provider_version", ["~> 6.0"], ids=["aws-6"])
@@ -28,7 +29,7 @@ def test_module(
     zone_id = subzone["subzone_id"]["value"]
 
     # Create ECS with httpd container
-    terraform_module_dir = osp.join(TERRAFORM_ROOT_DIR, "httpd_efs")
+    terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, "httpd_efs")
     cleanup_dot_terraform(terraform_module_dir)
     update_terraform_tf(terraform_module_dir, aws_provider_version)
     with open(osp.join(terraform_module_dir, "terraform.tfvars"), "w") as fp:
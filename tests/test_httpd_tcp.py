@@ -8,10 +8,11 @@ from pytest_infrahouse import terraform_apply
 from tests.conftest import (
     LOG,
     TERRAFORM_ROOT_DIR,
-    wait_for_success,
+    wait_for_all_success,
     update_terraform_tf,
     cleanup_dot_terraform,
 )
+from tests.parallel import stack_dir
 
 
 @pytest.mark.parametrize("aws_provider_version", ["~> 6.0"], ids=["aws-6"])
@@ -29,7 +30,7 @@ def test_module(
     zone_id = subzone["subzone_id"]["value"]
 
     # Create ECS with httpd container
-    terraform_module_dir = osp.join(TERRAFORM_ROOT_DIR, "httpd_tcp")
+    terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, "httpd_tcp")
     # Clean up any existing Terraform state to ensure clean test
     cleanup_dot_terraform(terraform_module_dir)
     update_terraform_tf(terraform_module_dir, aws_provider_version)
@@ -54,10 +55,10 @@ def test_module(
         LOG.info(json.dumps(tf_httpd_output, indent=4))
         cleanup_ecs_task_definitions(tf_httpd_output["service_name"]["value"])
         load_balancer_dns_name = tf_httpd_output["load_balancer_dns_name"]["value"]
-        wait_for_success(f"http://{load_balancer_dns_name}/")
 
         # Use dns_hostnames from output instead of constructing URLs
         dns_hostnames = tf_httpd_output["dns_hostnames"]["value"]
-        for hostname in dns_hostnames:
-            url = f"http://{hostname}/"
-            wait_for_success(url)
+        wait_for_all_success(
+            [f"http://{load_balancer_dns_name}/"]
+            + [f"http://{hostname}/" for hostname in dns_hostnames]
+        )
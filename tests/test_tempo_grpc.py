@@ -11,6 +11,7 @@ from tests.conftest import (
     update_terraform_tf,
     cleanup_dot_terraform,
 )
+from tests.parallel import stack_dir
 
 
 @pytest.mark.parametrize("aws_provider_version", ["~> 6.0"], ids=["aws-6"])
@@ -35,7 +36,7 @@ def test_tempo_grpc_target_group(
     subnet_private_ids = service_network["subnet_private_ids"]["value"]
     zone_id = subzone["subzone_id"]["value"]
 
-    terraform_module_dir = osp.join(TERRAFORM_ROOT_DIR, "tempo_grpc")
+    terraform_module_dir = stack_dir(TERRAFORM_ROOT_DIR, "tempo_grpc")
     cleanup_dot_terraform(terraform_module_dir)
     update_terraform_tf(terraform_module_dir, aws_provider_version)
     with open(osp.join(terraform_module_dir, "terraform.tfvars"), "w") as fp:
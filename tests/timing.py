@@ -0,0 +1,329 @@
+"""
+Where does the time of an integration test go?
+
+A pytest plugin that breaks every test's wall clock down into phases:
+
+* ``terraform apply [<stack>]`` and ``terraform destroy [<stack>]``, from
+  entering and leaving :func:`pytest_infrahouse.terraform_apply`;
+* ``wait <phase>``, every :mod:`tests.waiter` wait and health poll;
+* ``aws <service>.<Operation>``, every AWS API call made through the
+  ``boto3_session`` fixture, timed with botocore event hooks.
+
+``tests/conftest.py`` loads it. Enable it with ``--timing-profile=PATH``.
+At the end of the session it prints the breakdown and writes it to
+``PATH`` as JSON. With
+``--timing-baseline=PATH``, a profile from an earlier run, phases that got
+slower by more than ``--timing-threshold`` (a ratio) and by at least
+``MIN_REGRESSION_S`` seconds are listed as regressions, in the summary and
+in the artifact.
+
+Phases nest (an AWS call inside a wait inside a test), so the phases of a
+test do not add up to its duration.
+
+Under pytest-xdist (``make test-parallel``) the phases are timed where the
+tests run, in the workers. A worker hands its profile to the controller in
+``workeroutput`` instead of writing it; the controller merges the profiles
+of all workers and is the only one to write ``PATH``.
+"""
+
+import functools
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from os import path as osp
+
+import pytest
+import pytest_infrahouse
+import pytest_infrahouse.plugin
+
+# A phase must be at least this many seconds slower to count as a regression,
+# so that a 0.1 s call that took 0.3 s is not flagged.
+MIN_REGRESSION_S = 5.0
+DEFAULT_THRESHOLD = 1.5
+# The profile of the running session, if profiling is on.
+_PROFILE = None
+
+
+@contextmanager
+def phase(name):
+    """
+    Time a block as a phase of the running test. A no-op when not profiling.
+
+    :param name: Phase name. Keep it free of run-specific values (resource
+        ids, URLs), or baselines will not match it.
+    """
+    profile = _PROFILE
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(name, time.perf_counter() - start)
+
+
+def profile_terraform_apply(terraform_apply):
+    """
+    Wrap :func:`pytest_infrahouse.terraform_apply` to time apply and destroy.
+    """
+
+    @functools.wraps(terraform_apply)
+    @contextmanager
+    def _terraform_apply(path, *args, **kwargs):
+        stack = osp.basename(osp.normpath(path))
+        manager = terraform_apply(path, *args, **kwargs)
+        with phase(f"terraform apply [{stack}]"):
+            value = manager.__enter__()
+        try:
+            yield value
+        except BaseException:
+            with phase(f"terraform destroy [{stack}]"):
+                if not manager.__exit__(*sys.exc_info()):
+                    raise
+        else:
+            with phase(f"terraform destroy [{stack}]"):
+                manager.__exit__(None, None, None)
+
+    return _terraform_apply
+
+
+class TimingProfile:
+    """
+    Phase timings of the tests in a session.
+
+    :param path: Where to write the JSON artifact.
+    :param baseline_path: A profile of an earlier run to compare with.
+    :param threshold: Slowdown ratio over the baseline that is a regression.
+    """
+
+    def __init__(self, path, baseline_path=None, threshold=DEFAULT_THRESHOLD):
+        self.path = path
+        self.baseline_path = baseline_path
+        self.threshold = threshold
+        # nodeid -> {"duration_s": float, "phases": {name: {"count", "total_s"}}}
+        self.tests = {}
+        self.regressions = []
+        self._current = "session"
+        self._lock = threading.Lock()
+
+    def _test(self, nodeid):
+        return self.tests.setdefault(nodeid, {"duration_s": 0.0, "phases": {}})
+
+    def start_test(self, nodeid):
+        """
+        Attribute the phases that follow to ``nodeid``.
+        """
+        self._current = nodeid
+
+    def record(self, name, seconds):
+        """
+        Add one occurrence of a phase to the running test.
+        """
+        with self._lock:
+            phases = self._test(self._current)["phases"]
+            entry = phases.setdefault(name, {"count": 0, "total_s": 0.0})
+            entry["count"] += 1
+            entry["total_s"] += seconds
+
+    def instrument_session(self, session):
+        """
+        Time every AWS API call of the clients a boto3 session creates.
+
+        :param session: A :class:`boto3.Session`.
+        """
+        session.events.register("before-call", self._before_call)
+        session.events.register("after-call", self._after_call)
+
+    @staticmethod
+    def _before_call(context, **_):
+        context["timing_start"] = time.perf_counter()
+
+    def _after_call(self, model, context, **_):
+        start = context.pop("timing_start", None)
+        if start is not None:
+            service = model.service_model.service_name
+            self.record(f"aws {service}.{model.name}", time.perf_counter() - start)
+
+    def merge(self, tests):
+        """
+        Add the phases of another profile, e.g. of an xdist worker.
+
+        Durations are left alone: the controller already has them from the
+        test reports the workers forward.
+
+        :param tests: The ``tests`` of the other profile.
+        """
+        with self._lock:
+            for nodeid, test in tests.items():
+                phases = self._test(nodeid)["phases"]
+                for name, entry in test["phases"].items():
+                    merged = phases.setdefault(name, {"count": 0, "total_s": 0.0})
+                    merged["count"] += entry["count"]
+                    merged["total_s"] += entry["total_s"]
+
+    def compare(self, baseline):
+        """
+        Find the phases slower than in ``baseline``.
+
+        :param baseline: A profile artifact, as :meth:`write` writes it.
+        :return: The regressions, slowest first.
+        """
+        regressions = []
+        for nodeid, test in self.tests.items():
+            base_phases = baseline["tests"].get(nodeid, {}).get("phases", {})
+            for name, entry in test["phases"].items():
+                base = base_phases.get(name)
+                if base is None:
+                    continue
+                current_s, baseline_s = entry["total_s"], base["total_s"]
+                if (
+                    current_s - baseline_s >= MIN_REGRESSION_S
+                    and current_s > baseline_s * self.threshold
+                ):
+                    regressions.append(
+                        {
+                            "test": nodeid,
+                            "phase": name,
+                            "baseline_s": round(baseline_s, 3),
+                            "current_s": round(current_s, 3),
+                            "ratio": round(current_s / max(baseline_s, 1e-9), 2),
+                        }
+                    )
+        return sorted(regressions, key=lambda r: r["baseline_s"] - r["current_s"])
+
+    def write(self):
+        """
+        Compare with the baseline, if any, and write the JSON artifact.
+        """
+        if self.baseline_path:
+            with open(self.baseline_path) as fp:
+                self.regressions = self.compare(json.load(fp))
+        with open(self.path, "w") as fp:
+            json.dump(
+                {
+                    "created": time.time(),
+                    "baseline": self.baseline_path,
+                    "threshold": self.threshold,
+                    "tests": self.tests,
+                    "regressions": self.regressions,
+                },
+                fp,
+                indent=2,
+                sort_keys=True,
+            )
+
+    def summary_lines(self, top=10):
+        """
+        The per-test breakdown and the regressions, for the terminal.
+
+        :param top: Phases listed per test, slowest first.
+        """
+        lines = []
+        for nodeid, test in self.tests.items():
+            lines.append(f"{test['duration_s']:8.1f}s  {nodeid}")
+            slowest = sorted(
+                test["phases"].items(), key=lambda item: -item[1]["total_s"]
+            )
+            for name, entry in slowest[:top]:
+                lines.append(f"{entry['total_s']:8.1f}s    {name} (x{entry['count']})")
+        for regression in self.regressions:
+            lines.append(
+                "REGRESSION {test}: {phase} took {current_s:.1f}s, "
+                "baseline {baseline_s:.1f}s ({ratio}x)".format(**regression)
+            )
+        return lines
+
+    # pytest hooks
+
+    def pytest_runtest_logstart(self, nodeid):
+        self.start_test(nodeid)
+
+    def pytest_runtest_logreport(self, report):
+        self._test(report.nodeid)["duration_s"] += report.duration
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef):
+        outcome = yield
+        if fixturedef.argname == "boto3_session" and outcome.excinfo is None:
+            self.instrument_session(outcome.get_result())
+
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(session.config, "workeroutput", None)
+        if workeroutput is not None:
+            # An xdist worker: the controller merges and writes.
+            workeroutput["timing_profile"] = json.dumps(self.tests)
+            return
+        self.write()
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):  # pylint: disable=unused-argument
+        """
+        On the xdist controller: merge the profile of a finished worker.
+        """
+        output = getattr(node, "workeroutput", {}).get("timing_profile")
+        if output:
+            self.merge(json.loads(output))
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.section("timing profile")
+        for line in self.summary_lines():
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(f"Written to {self.path}")
+
+
+def add_options(parser):
+    """
+    Add the plugin's command line options; call from ``pytest_addoption``.
+    """
+    group = parser.getgroup("timing profile")
+    group.addoption(
+        "--timing-profile",
+        default=None,
+        help="Profile the phases of every test and write the profile (JSON) here.",
+    )
+    group.addoption(
+        "--timing-baseline",
+        default=None,
+        help="A profile of an earlier run; report phases that got slower.",
+    )
+    group.addoption(
+        "--timing-threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Slowdown ratio over the baseline that counts as a regression.",
+    )
+
+
+def configure(config):
+    """
+    Start profiling if ``--timing-profile`` is set; call from ``pytest_configure``.
+    """
+    global _PROFILE  # pylint: disable=global-statement
+    path = config.getoption("--timing-profile")
+    if not path:
+        return
+    _PROFILE = TimingProfile(
+        path,
+        baseline_path=config.getoption("--timing-baseline"),
+        threshold=config.getoption("--timing-threshold"),
+    )
+    config.pluginmanager.register(_PROFILE, "timing-profile")
+    # Test modules import terraform_apply at collection, after this; the
+    # plugin's session fixtures look it up in pytest_infrahouse.plugin.
+    wrapped = profile_terraform_apply(pytest_infrahouse.terraform_apply)
+    for module in (pytest_infrahouse, pytest_infrahouse.plugin):
+        setattr(module, "terraform_apply", wrapped)
+    config.add_cleanup(_restore(wrapped.__wrapped__))
+
+
+def _restore(terraform_apply):
+    def _cleanup():
+        global _PROFILE  # pylint: disable=global-statement
+        _PROFILE = None
+        for module in (pytest_infrahouse, pytest_infrahouse.plugin):
+            setattr(module, "terraform_apply", terraform_apply)
+
+    return _cleanup
@@ -0,0 +1,467 @@
+"""
+Offline unit tests. Nothing here talks to real AWS or runs Terraform.
+
+AWS calls go to moto; the ECR image tagger Lambda is imported straight from
+``assets/ecr_image_tagger`` the same way the Lambda runtime loads it.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path as osp
+
+import boto3
+import pytest
+from botocore.client import BaseClient
+from moto import mock_aws
+
+TAGGER_SOURCE_DIR = osp.join(
+    osp.dirname(__file__), "..", "..", "assets", "ecr_image_tagger"
+)
+sys.path.insert(0, osp.abspath(TAGGER_SOURCE_DIR))
+FETCH_MODEL_DIR = osp.join(osp.dirname(__file__), "..", "..", "docker", "vllm")
+sys.path.insert(0, osp.abspath(FETCH_MODEL_DIR))
+
+TEST_REGION = "us-west-2"
+CLUSTER_NAME = "test-cluster"
+SERVICE_NAME = "test-service"
+TAG_PREFIX = "deployed-at-"
+DEDUP_PARAMETER = (
+    f"/ecs/{CLUSTER_NAME}/{SERVICE_NAME}/ecr-image-tagger/last-tagged-task-definition"
+)
+
+
+def manifest(seed: str) -> str:
+    """
+    Build a minimal Docker v2 manifest that is unique per ``seed``.
+    """
+    return json.dumps(
+        {
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+            "config": {
+                "mediaType": "application/vnd.docker.container.image.v1+json",
+                "size": 7023,
+                "digest": f"sha256:{'0' * 64}",
+            },
+            "layers": [
+                {
+                    "mediaType": "application/vnd.docker.image.rootfs.diff.tar.gzip",
+                    "size": 1024,
+                    "digest": f"sha256:{(seed * 64)[:64]}",
+                }
+            ],
+        }
+    )
+
+
+def push_image(ecr_client, repo_name: str, tag: str, seed: str) -> str:
+    """
+    Push an image to a moto ECR repo and return its digest.
+    """
+    response = ecr_client.put_image(
+        repositoryName=repo_name, imageManifest=manifest(seed), imageTag=tag
+    )
+    return response["image"]["imageId"]["imageDigest"]
+
+
+def image_tags(ecr_client, repo_name: str) -> dict:
+    """
+    Return ``{digest: sorted tags}`` for every image in a moto ECR repo.
+    """
+    return {
+        detail["imageDigest"]: sorted(detail.get("imageTags", []))
+        for detail in ecr_client.describe_images(repositoryName=repo_name)[
+            "imageDetails"
+        ]
+    }
+
+
+def deploy_service(images: list) -> None:
+    """
+    Register a task definition with the given images and run it as the service.
+    """
+    ecs_client = boto3.client("ecs", region_name=TEST_REGION)
+    ecs_client.create_cluster(clusterName=CLUSTER_NAME)
+    task_def_arn = ecs_client.register_task_definition(
+        family=SERVICE_NAME,
+        containerDefinitions=[
+            {"name": f"container-{i}", "image": image, "memory": 128}
+            for i, image in enumerate(images)
+        ],
+    )["taskDefinition"]["taskDefinitionArn"]
+    ecs_client.create_service(
+        cluster=CLUSTER_NAME,
+        serviceName=SERVICE_NAME,
+        taskDefinition=task_def_arn,
+        desiredCount=1,
+    )
+
+
+def steady_state_event() -> dict:
+    return {
+        "detail-type": "ECS Service Action",
+        "source": "aws.ecs",
+        "detail": {
+            "eventType": "INFO",
+            "eventName": "SERVICE_STEADY_STATE",
+            "clusterArn": f"arn:aws:ecs:{TEST_REGION}:123456789012:cluster/{CLUSTER_NAME}",
+        },
+    }
+
+
+def seed_sidecar_images(ecr_client) -> list:
+    """
+    Seven ECR image references spread across three repos, plus a public one.
+
+    Each repo holds one image pushed under two tags, and the task definition
+    references both tags; ``app`` is also referenced by digest. Every
+    reference to the same image must collapse into a single ``PutImage``.
+    """
+    registry = f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com"
+    images = []
+    digests = {}
+    for seed, repo_name in enumerate(["app", "agents", "proxy"], start=1):
+        ecr_client.create_repository(repositoryName=repo_name)
+        for tag in ["v1", "stable"]:
+            digests[repo_name] = push_image(ecr_client, repo_name, tag, str(seed))
+            images.append(f"{registry}/{repo_name}:{tag}")
+
+    images.append(f"{registry}/app@{digests['app']}")
+    images.append("public.ecr.aws/aws-observability/aws-for-fluent-bit:stable")
+    deploy_service(images)
+    return images
+
+
+FAKE_TERRAFORM = """\
+#!{python}
+import json, os, sys, time
+
+command = sys.argv[1]
+env = {{name: os.environ.get(name) for name in ["TF_CLI_CONFIG_FILE", "TF_PLUGIN_CACHE_DIR"]}}
+with open(os.environ["FAKE_TERRAFORM_LOG"], "a") as log:
+    log.write(
+        json.dumps({{"cwd": os.getcwd(), "command": command, "time": time.time(), "env": env}})
+        + "\\n"
+    )
+if command == "init" and env["TF_PLUGIN_CACHE_DIR"]:
+    # Download the AWS provider into the plugin cache.
+    package = os.path.join(
+        env["TF_PLUGIN_CACHE_DIR"], "registry.terraform.io/hashicorp/aws/6.0.0/linux_amd64"
+    )
+    os.makedirs(package, exist_ok=True)
+    with open(os.path.join(package, "terraform-provider-aws_v6.0.0_x5"), "w") as fp:
+        fp.write("provider")
+elif command == "apply":
+    time.sleep(0.5)
+elif command == "output":
+    print(json.dumps({{"vpc_id": {{"value": "vpc-%d" % os.getpid()}}}}))
+elif command == "version":
+    print(json.dumps({{"terraform_version": "1.11.0"}}))
+elif command == "test":
+    print(json.dumps({{"type": "test_abstract", "@level": "info"}}))
+    with open(os.environ["FAKE_TERRAFORM_PLAN"]) as fp:
+        print(json.dumps({{"type": "test_plan", "test_plan": json.load(fp)}}))
+"""
+
+
+@pytest.fixture()
+def fake_terraform(tmp_path, monkeypatch):
+    """
+    Put a fake ``terraform`` on PATH that logs every call and outputs a VPC id.
+
+    ``init`` puts an AWS provider package into ``TF_PLUGIN_CACHE_DIR`` if set;
+    ``test`` prints the plan in ``$FAKE_TERRAFORM_PLAN`` as a ``test_plan``
+    message.
+
+    :return: Callable that returns the logged calls.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    terraform = bin_dir / "terraform"
+    terraform.write_text(FAKE_TERRAFORM.format(python=sys.executable))
+    terraform.chmod(0o755)
+    log = tmp_path / "terraform.log"
+    log.touch()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_TERRAFORM_LOG", str(log))
+    return lambda: [json.loads(line) for line in log.read_text().splitlines()]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def terraform_provider_cache():
+    """
+    Override the integration suite's Terraform provider cache setup.
+
+    Unit tests run no real ``terraform``, so leave the environment alone.
+    """
+
+
+@pytest.fixture(scope="session", autouse=True)
+def purge_aws_injected_vpc_resources():
+    """
+    Override the integration suite's session finalizer.
+
+    The parent conftest's fixture depends on ``service_network``, which would
+    create a real VPC. Unit tests need neither.
+    """
+    yield
+
+
+@pytest.fixture()
+def aws_credentials(monkeypatch):
+    """
+    Point boto3 at fake credentials so a stray call can never reach real AWS.
+    """
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_SECURITY_TOKEN", "testing")
+    monkeypatch.setenv("AWS_SESSION_TOKEN", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", TEST_REGION)
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+
+
+@pytest.fixture()
+def api_calls(monkeypatch):
+    """
+    Record every AWS API call made through botocore.
+
+    :return: A list that fills with ``(service, operation)`` tuples as calls
+        are made, e.g. ``("ecr", "BatchGetImage")``.
+    """
+    calls = []
+    make_api_call = BaseClient._make_api_call
+
+    def _recording_make_api_call(client, operation_name, api_params):
+        calls.append((client.meta.service_model.service_name, operation_name))
+        return make_api_call(client, operation_name, api_params)
+
+    monkeypatch.setattr(BaseClient, "_make_api_call", _recording_make_api_call)
+    return calls
+
+
+@pytest.fixture()
+def tagger_environment(aws_credentials, monkeypatch):
+    """
+    Environment the module passes to the tagger Lambda.
+
+    Also drops the tagger's process-wide caches, so every test starts as a
+    cold Lambda container.
+    """
+    import clients
+    import main as tagger
+
+    monkeypatch.setenv("ECS_CLUSTER_NAME", CLUSTER_NAME)
+    monkeypatch.setenv("ECS_SERVICE_NAME", SERVICE_NAME)
+    monkeypatch.setenv("DEPLOYED_TAG_PREFIX", TAG_PREFIX)
+    monkeypatch.delenv("DEDUP_SSM_PARAMETER", raising=False)
+    monkeypatch.delenv("IMAGE_CACHE_DIR", raising=False)
+    tagger.TASK_DEFINITION_CACHE.clear()
+    clients.reset()
+
+
+@pytest.fixture()
+def tagger_env(tagger_environment):
+    """
+    The tagger's environment inside a moto mock; yields an ECR client.
+    """
+    with mock_aws():
+        yield boto3.client("ecr", region_name=TEST_REGION)
+
+
+@pytest.fixture()
+def sidecar_images(tagger_env) -> list:
+    return seed_sidecar_images(tagger_env)
+
+
+class StandInServer:
+    """
+    A local HTTP server standing in for an ALB in front of the service.
+
+    Each path answers from a script of ``(status, body)`` responses, one per
+    request; the last one repeats. Unscripted paths answer 404. The client
+    address of every request is kept, to count connections.
+    """
+
+    def __init__(self):
+        self.scripts = {}
+        self.hits = {}
+        self.connections = set()
+        self._lock = threading.Lock()
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so clients can reuse connections.
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.connections.add(self.client_address)
+                status, body = server._next_response(self.path)
+                payload = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def script(self, path: str, *responses) -> str:
+        """
+        Script the responses of a path; return its URL.
+        """
+        self.scripts[path] = list(responses)
+        return self.url(path)
+
+    def url(self, path: str) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}{path}"
+
+    def _next_response(self, path):
+        with self._lock:
+            self.hits[path] = self.hits.get(path, 0) + 1
+            script = self.scripts.get(path)
+            if not script:
+                return 404, "not found"
+            return script.pop(0) if len(script) > 1 else script[0]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture()
+def stand_in_server():
+    """
+    A scripted local HTTP server; see :class:`StandInServer`.
+    """
+    with StandInServer() as server:
+        yield server
+
+
+class ModelMirror:
+    """
+    A local HTTP server standing in for the internal model mirror.
+
+    Serves the files under ``root`` with single-range ``Range`` support, and
+    ``manifest.json`` files written by :meth:`add_model`. Every request is
+    kept as ``(path, range header)``. Paths in ``fail`` answer 503 that many
+    times before they work.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self.requests = []
+        self.fail = {}
+        self._lock = threading.Lock()
+        mirror = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                mirror._serve(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/{path}"
+
+    def add_model(self, name: str, files: dict) -> str:
+        """
+        Put a model on the mirror and write its manifest.
+
+        :param name: Model directory name.
+        :param files: ``{relative path: bytes, or an int size for a sparse
+            file of zeros}``.
+        :return: The model's source URL.
+        """
+        entries = []
+        for relative, content in files.items():
+            file_path = osp.join(self.root, name, relative)
+            os.makedirs(osp.dirname(file_path), exist_ok=True)
+            with open(file_path, "wb") as fp:
+                if isinstance(content, int):
+                    fp.truncate(content)
+                else:
+                    fp.write(content)
+            digest = hashlib.sha256()
+            with open(file_path, "rb") as fp:
+                for block in iter(lambda: fp.read(1 << 24), b""):
+                    digest.update(block)
+            entries.append(
+                {
+                    "path": relative,
+                    "size": osp.getsize(file_path),
+                    "sha256": digest.hexdigest(),
+                }
+            )
+        with open(osp.join(self.root, name, "manifest.json"), "w") as fp:
+            json.dump({"files": entries}, fp)
+        return self.url(name)
+
+    def _serve(self, handler):
+        path = handler.path.lstrip("/")
+        with self._lock:
+            self.requests.append((path, handler.headers.get("Range")))
+            failures = self.fail.get(path, 0)
+            if failures:
+                self.fail[path] = failures - 1
+        file_path = osp.join(self.root, path)
+        if failures or not osp.isfile(file_path):
+            handler.send_response(503 if failures else 404)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        size = osp.getsize(file_path)
+        start, end, status = 0, size - 1, 200
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", handler.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or size - 1), size - 1)
+            status = 206
+        handler.send_response(status)
+        handler.send_header("Content-Length", str(end + 1 - start))
+        if status == 206:
+            handler.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        handler.end_headers()
+        with open(file_path, "rb") as fp:
+            fp.seek(start)
+            remaining = end + 1 - start
+            while remaining:
+                data = fp.read(min(remaining, 1 << 20))
+                handler.wfile.write(data)
+                remaining -= len(data)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture()
+def model_mirror(tmp_path):
+    """
+    A local model mirror; see :class:`ModelMirror`.
+    """
+    with ModelMirror(tmp_path / "mirror") as mirror:
+        yield mirror
@@ -0,0 +1,423 @@
+import json
+import subprocess
+import sys
+from collections import Counter
+
+import boto3
+import pytest
+
+import clients
+import image_cache
+import main as tagger
+import metrics
+from dedup import TaskDefinitionCache
+from tests.unit.conftest import (
+    CLUSTER_NAME,
+    DEDUP_PARAMETER,
+    SERVICE_NAME,
+    TAG_PREFIX,
+    TAGGER_SOURCE_DIR,
+    TEST_REGION,
+    deploy_service,
+    image_tags,
+    push_image,
+    steady_state_event,
+)
+
+
+def test_batches_ecr_calls_per_repo(tagger_env, sidecar_images, api_calls):
+    ecr_client = tagger_env
+
+    result = tagger.lambda_handler(steady_state_event(), None)
+    ecr_calls = Counter(op for service, op in api_calls if service == "ecr")
+
+    # One read of each kind per repo, one write per distinct image.
+    assert ecr_calls == {"BatchGetImage": 3, "DescribeImages": 3, "PutImage": 3}
+    assert len(result["tagged"]) == 3
+    for repo_name in ["app", "agents", "proxy"]:
+        (tags,) = image_tags(ecr_client, repo_name).values()
+        assert [t for t in tags if t.startswith(TAG_PREFIX)], tags
+
+
+def test_repeated_steady_state_does_not_retag(tagger_env, sidecar_images, api_calls):
+    tagger.lambda_handler(steady_state_event(), None)
+    # A new container: the existing deployed-at- tags are the only guard.
+    tagger.TASK_DEFINITION_CACHE.clear()
+    api_calls.clear()
+
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    assert result == {"tagged": []}
+    ecr_calls = Counter(op for service, op in api_calls if service == "ecr")
+    assert ecr_calls == {"BatchGetImage": 3, "DescribeImages": 3}
+
+
+def _deploy_pinned(ecr_client) -> list:
+    """
+    Deploy one image per repo, each referenced by digest.
+    """
+    registry = f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com"
+    images = []
+    for seed, repo_name in enumerate(["app", "agents"], start=1):
+        ecr_client.create_repository(repositoryName=repo_name)
+        digest = push_image(ecr_client, repo_name, "v1", str(seed))
+        images.append(f"{registry}/{repo_name}@{digest}")
+    deploy_service(images)
+    return images
+
+
+def test_warm_container_skips_tagged_revision(tagger_env, api_calls):
+    _deploy_pinned(tagger_env)
+    tagger.lambda_handler(steady_state_event(), None)
+    api_calls.clear()
+
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    assert result == {"tagged": []}
+    assert api_calls == [("ecs", "DescribeServices")]
+
+
+def test_cold_container_skips_tagged_revision_via_ssm(
+    tagger_env, api_calls, monkeypatch
+):
+    monkeypatch.setenv("DEDUP_SSM_PARAMETER", DEDUP_PARAMETER)
+    _deploy_pinned(tagger_env)
+    tagger.lambda_handler(steady_state_event(), None)
+    task_def_arn = boto3.client("ssm", region_name=TEST_REGION).get_parameter(
+        Name=DEDUP_PARAMETER
+    )["Parameter"]["Value"]
+    assert task_def_arn.endswith(f":task-definition/{SERVICE_NAME}:1")
+
+    tagger.TASK_DEFINITION_CACHE.clear()
+    api_calls.clear()
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    assert result == {"tagged": []}
+    assert api_calls == [("ecs", "DescribeServices"), ("ssm", "GetParameter")]
+
+
+def test_mutable_tag_skips_by_digest(tagger_env, sidecar_images, api_calls):
+    tagger.lambda_handler(steady_state_event(), None)
+    api_calls.clear()
+
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    assert result == {"tagged": []}
+    # The tags are resolved, but their images are not read again.
+    ecr_calls = Counter(op for service, op in api_calls if service == "ecr")
+    assert ecr_calls == {"BatchGetImage": 3}
+
+
+def test_cold_container_reads_ssm_once_for_mutable_tags(
+    tagger_env, sidecar_images, api_calls, monkeypatch
+):
+    monkeypatch.setenv("DEDUP_SSM_PARAMETER", DEDUP_PARAMETER)
+    tagger.lambda_handler(steady_state_event(), None)
+    tagger.TASK_DEFINITION_CACHE.clear()
+    api_calls.clear()
+
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    assert result == {"tagged": []}
+    # Both the ARN and the digests are checked against one read.
+    assert [call for call in api_calls if call[0] == "ssm"] == [("ssm", "GetParameter")]
+    assert ("ecr", "DescribeImages") not in api_calls
+
+
+@pytest.mark.parametrize("cold", [False, True])
+def test_mutable_tag_pushed_again_is_tagged(tagger_env, api_calls, monkeypatch, cold):
+    monkeypatch.setenv("DEDUP_SSM_PARAMETER", DEDUP_PARAMETER)
+    ecr_client = tagger_env
+    ecr_client.create_repository(repositoryName="app")
+    push_image(ecr_client, "app", "latest", "1")
+    deploy_service([f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com/app:latest"])
+    assert len(tagger.lambda_handler(steady_state_event(), None)["tagged"]) == 1
+
+    # A new image under the same tag, rolled out by a forced new deployment:
+    # the service keeps running the same task definition revision.
+    new_digest = push_image(ecr_client, "app", "latest", "2")
+    if cold:
+        tagger.TASK_DEFINITION_CACHE.clear()
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    assert len(result["tagged"]) == 1
+    tags = image_tags(ecr_client, "app")
+    assert [t for t in tags[new_digest] if t.startswith(TAG_PREFIX)], tags
+    assert (
+        boto3.client("ssm", region_name=TEST_REGION).get_parameter(
+            Name=DEDUP_PARAMETER
+        )["Parameter"]["Value"]
+        == new_digest
+    )
+
+
+def test_new_revision_is_tagged_despite_cache(
+    tagger_env, sidecar_images, api_calls, monkeypatch
+):
+    monkeypatch.setenv("DEDUP_SSM_PARAMETER", DEDUP_PARAMETER)
+    tagger.lambda_handler(steady_state_event(), None)
+
+    # Deploy revision 2 with a freshly pushed image.
+    ecr_client = tagger_env
+    digest = push_image(ecr_client, "app", "v2", "9")
+    ecs_client = boto3.client("ecs", region_name=TEST_REGION)
+    new_arn = ecs_client.register_task_definition(
+        family=SERVICE_NAME,
+        containerDefinitions=[
+            {
+                "name": "app",
+                "image": f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com/app:v2",
+                "memory": 128,
+            }
+        ],
+    )["taskDefinition"]["taskDefinitionArn"]
+    ecs_client.update_service(
+        cluster=CLUSTER_NAME, service=SERVICE_NAME, taskDefinition=new_arn
+    )
+
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    assert len(result["tagged"]) == 1
+    assert (
+        boto3.client("ssm", region_name=TEST_REGION).get_parameter(
+            Name=DEDUP_PARAMETER
+        )["Parameter"]["Value"]
+        == digest
+    )
+
+
+def test_failed_run_is_not_cached(tagger_env, api_calls):
+    tagger_env.create_repository(repositoryName="app")
+    deploy_service([f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com/app:gone"])
+    with pytest.raises(RuntimeError):
+        tagger.lambda_handler(steady_state_event(), None)
+    api_calls.clear()
+
+    with pytest.raises(RuntimeError):
+        tagger.lambda_handler(steady_state_event(), None)
+    assert ("ecr", "BatchGetImage") in api_calls
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TaskDefinitionCache(maxsize=2)
+    cache.remember("arn:td:1")
+    cache.remember("arn:td:2")
+    assert cache.seen("arn:td:1")
+
+    cache.remember("arn:td:3")
+
+    assert cache.seen("arn:td:1")
+    assert cache.seen("arn:td:3")
+    assert not cache.seen("arn:td:2")
+
+
+def test_missing_image_raises(tagger_env):
+    tagger_env.create_repository(repositoryName="app")
+    deploy_service([f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com/app:gone"])
+
+    with pytest.raises(RuntimeError, match="app:gone: not found in app"):
+        tagger.lambda_handler(steady_state_event(), None)
+
+
+def test_missing_image_does_not_hide_others(tagger_env, sidecar_images, caplog):
+    registry = f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com"
+    deploy_service(
+        sidecar_images + [f"{registry}/app:gone", f"{registry}/no-such-repo:v1"]
+    )
+
+    with pytest.raises(RuntimeError, match="Failed to tag 2 image") as err:
+        tagger.lambda_handler(steady_state_event(), None)
+
+    assert "app:gone: not found in app" in str(err.value)
+    assert "no-such-repo:v1: " in str(err.value)
+    for repo_name in ["app", "agents", "proxy"]:
+        (tags,) = image_tags(tagger_env, repo_name).values()
+        assert [t for t in tags if t.startswith(TAG_PREFIX)], tags
+
+
+def test_failed_put_image_only_fails_its_image(tagger_env, monkeypatch):
+    tagger_env.create_repository(repositoryName="app")
+    digests = [push_image(tagger_env, "app", tag, tag) for tag in ["v1", "v2"]]
+    registry = f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com"
+    deploy_service([f"{registry}/app:v1", f"{registry}/app:v2"])
+    put_image_tag = tagger._put_image_tag
+
+    def _failing_put_image_tag(ecr_client, repo_name, image, tag):
+        if image["imageId"]["imageDigest"] == digests[1]:
+            raise ValueError("unexpected response")
+        put_image_tag(ecr_client, repo_name, image, tag)
+
+    monkeypatch.setattr(tagger, "_put_image_tag", _failing_put_image_tag)
+
+    with pytest.raises(RuntimeError, match="Failed to tag 1 image") as err:
+        tagger.lambda_handler(steady_state_event(), None)
+
+    assert f"app@{digests[1]}: unexpected response" in str(err.value)
+    tags = image_tags(tagger_env, "app")
+    assert [t for t in tags[digests[0]] if t.startswith(TAG_PREFIX)], tags
+    assert tags[digests[1]] == ["v2"]
+
+
+@pytest.mark.parametrize("max_workers, expected", [("1", 1), ("2", 2), ("16", 3)])
+def test_thread_pool_is_bounded(
+    tagger_env, sidecar_images, monkeypatch, max_workers, expected
+):
+    monkeypatch.setenv("TAGGER_MAX_WORKERS", max_workers)
+    pool_sizes = []
+    executor_class = tagger.ThreadPoolExecutor
+
+    def _recording_executor(max_workers):
+        pool_sizes.append(max_workers)
+        return executor_class(max_workers=max_workers)
+
+    monkeypatch.setattr(tagger, "ThreadPoolExecutor", _recording_executor)
+
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    # Never more workers than configured, nor than there are repos (three).
+    assert pool_sizes == [expected]
+    assert len(result["tagged"]) == 3
+
+
+TASK_DEFINITION_ARN = (
+    f"arn:aws:ecs:{TEST_REGION}:123456789012:task-definition/{SERVICE_NAME}:1"
+)
+
+
+@pytest.mark.parametrize("key", ["taskDefinitionArn", "taskDefinition"])
+def test_event_task_definition_skips_describe_services(
+    tagger_env, sidecar_images, api_calls, key
+):
+    event = steady_state_event()
+    event["detail"][key] = TASK_DEFINITION_ARN
+
+    result = tagger.lambda_handler(event, None)
+
+    assert len(result["tagged"]) == 3
+    assert ("ecs", "DescribeServices") not in api_calls
+    assert ("ecs", "DescribeTaskDefinition") in api_calls
+
+
+def test_disk_cache_skips_describe_task_definition(
+    tagger_env, sidecar_images, api_calls, monkeypatch, tmp_path
+):
+    monkeypatch.setenv("IMAGE_CACHE_DIR", str(tmp_path))
+    tagger.lambda_handler(steady_state_event(), None)
+    assert image_cache.load(str(tmp_path), TASK_DEFINITION_ARN) == sidecar_images
+    tagger.TASK_DEFINITION_CACHE.clear()
+    api_calls.clear()
+
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    assert result == {"tagged": []}
+    assert [call for call in api_calls if call[0] == "ecs"] == [
+        ("ecs", "DescribeServices")
+    ]
+
+
+def test_disk_cache_ignores_bad_entries(tmp_path):
+    cache_dir = str(tmp_path)
+    assert image_cache.load(cache_dir, TASK_DEFINITION_ARN) is None
+    assert image_cache.load(None, TASK_DEFINITION_ARN) is None
+
+    image_cache.store(cache_dir, TASK_DEFINITION_ARN, ["app:v1"])
+    (entry,) = tmp_path.iterdir()
+    entry.write_text("{not json")
+
+    assert image_cache.load(cache_dir, TASK_DEFINITION_ARN) is None
+
+
+def _emf_records(output: str) -> list:
+    return [
+        json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')
+    ]
+
+
+def test_invocation_emits_phase_timings(tagger_env, sidecar_images, capsys):
+    tagger.lambda_handler(steady_state_event(), None)
+
+    (record,) = _emf_records(capsys.readouterr().out)
+    (directive,) = record["_aws"]["CloudWatchMetrics"]
+    assert directive["Namespace"] == metrics.DEFAULT_NAMESPACE
+    assert directive["Dimensions"] == [["ServiceName"]]
+    assert record["ServiceName"] == SERVICE_NAME
+    assert {m["Name"] for m in directive["Metrics"]} == {
+        metrics.DESCRIBE_SERVICE,
+        metrics.DESCRIBE_TASK_DEFINITION,
+        metrics.REPO_LOOKUP,
+        metrics.TAG_IMAGE,
+        metrics.TOTAL,
+    }
+    # One lookup and one PutImage per repository.
+    assert len(record[metrics.REPO_LOOKUP]) == 3
+    assert len(record[metrics.TAG_IMAGE]) == 3
+    assert record[metrics.TOTAL] >= record[metrics.DESCRIBE_SERVICE]
+
+
+def test_skipped_and_failed_invocations_emit_timings(tagger_env, capsys):
+    tagger_env.create_repository(repositoryName="app")
+    deploy_service([f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com/app:gone"])
+    with pytest.raises(RuntimeError):
+        tagger.lambda_handler(steady_state_event(), None)
+    tagger.TASK_DEFINITION_CACHE.remember(
+        tagger._active_task_definition(
+            clients.get_client("ecs"), CLUSTER_NAME, SERVICE_NAME
+        )
+    )
+    tagger.lambda_handler(steady_state_event(), None)
+
+    failed, skipped = _emf_records(capsys.readouterr().out)
+    assert metrics.REPO_LOOKUP in failed
+    assert metrics.TAG_IMAGE not in failed
+    assert set(skipped) - {"_aws", "ServiceName"} == {
+        metrics.DESCRIBE_SERVICE,
+        metrics.TOTAL,
+    }
+
+
+def test_other_cluster_is_ignored(tagger_env, api_calls):
+    event = steady_state_event()
+    event["detail"]["clusterArn"] = "arn:aws:ecs:us-west-2:123456789012:cluster/other"
+
+    assert tagger.lambda_handler(event, None) == {"tagged": []}
+    assert api_calls == []
+
+
+def test_clients_are_cached_per_service_and_region(tagger_environment):
+    ecr = clients.get_client("ecr")
+
+    assert clients.get_client("ecr") is ecr
+    assert clients.get_client("ecr", region="eu-west-1") is not ecr
+    assert clients.get_client("ecs") is not ecr
+    assert ecr.meta.config.max_pool_connections == clients.MAX_POOL_CONNECTIONS
+
+
+def test_warm_invocation_reuses_clients(tagger_env, sidecar_images, monkeypatch):
+    tagger.lambda_handler(steady_state_event(), None)
+    tagger.TASK_DEFINITION_CACHE.clear()
+
+    def _no_new_session():
+        raise AssertionError("Warm invocation created a new boto3 session")
+
+    monkeypatch.setattr(boto3, "Session", _no_new_session)
+
+    assert len(tagger.lambda_handler(steady_state_event(), None)["tagged"]) == 0
+
+
+def test_cold_import_defers_heavy_packages():
+    # The structural half of the cold-start budget; the timing half is
+    # test_cold_import_stays_within_budget in the benchmarks.
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, main; "
+            "print(' '.join(m for m in ('boto3', 'botocore', 'infrahouse_core') "
+            "if m in sys.modules))",
+        ],
+        cwd=TAGGER_SOURCE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == ""
@@ -0,0 +1,262 @@
+import time
+import uuid
+from collections import Counter
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+import backfill
+import clients
+import main as tagger
+from tests.unit.conftest import (
+    CLUSTER_NAME,
+    TAG_PREFIX,
+    TEST_REGION,
+    image_tags,
+    push_image,
+    steady_state_event,
+)
+
+ACCOUNT = "123456789012"
+REGISTRY = f"{ACCOUNT}.dkr.ecr.{TEST_REGION}.amazonaws.com"
+OTHER_CLUSTER = "other-cluster"
+
+
+def _run_service(cluster: str, service: str, images: list, desired_count=1):
+    ecs_client = boto3.client("ecs", region_name=TEST_REGION)
+    ecs_client.create_cluster(clusterName=cluster)
+    task_def_arn = ecs_client.register_task_definition(
+        family=service,
+        containerDefinitions=[
+            {"name": f"container-{i}", "image": image, "memory": 128}
+            for i, image in enumerate(images)
+        ],
+    )["taskDefinition"]["taskDefinitionArn"]
+    ecs_client.create_service(
+        cluster=cluster,
+        serviceName=service,
+        taskDefinition=task_def_arn,
+        desiredCount=desired_count,
+    )
+
+
+def _task(cluster: str, group: str, containers: list) -> dict:
+    """
+    A ``DescribeTasks`` task; ``containers`` are ``(image, digest)`` pairs.
+    """
+    task_arn = f"arn:aws:ecs:{TEST_REGION}:{ACCOUNT}:task/{cluster}/{uuid.uuid4().hex}"
+    return {
+        "taskArn": task_arn,
+        "group": group,
+        "lastStatus": "RUNNING",
+        "containers": [
+            (
+                {"name": f"container-{i}", "image": image, "imageDigest": digest}
+                if digest
+                else {"name": f"container-{i}", "image": image}
+            )
+            for i, (image, digest) in enumerate(containers)
+        ],
+    }
+
+
+def _stub_cluster(stubber, cluster: str, tasks: list, page_size: int = 100):
+    """
+    Queue the ``ListTasks`` pages and the ``DescribeTasks`` call of a cluster.
+    """
+    task_arns = [task["taskArn"] for task in tasks]
+    pages = [
+        task_arns[start : start + page_size]
+        for start in range(0, len(task_arns), page_size)
+    ] or [[]]
+    for number, page in enumerate(pages):
+        params = {"cluster": cluster, "desiredStatus": "RUNNING"}
+        response = {"taskArns": page}
+        if number:
+            params["nextToken"] = f"token-{number}"
+        if number < len(pages) - 1:
+            response["nextToken"] = f"token-{number + 1}"
+        stubber.add_response("list_tasks", response, params)
+    if tasks:
+        stubber.add_response(
+            "describe_tasks", {"tasks": tasks}, {"cluster": cluster, "tasks": task_arns}
+        )
+
+
+@pytest.fixture()
+def ecs_stub(tagger_env, monkeypatch):
+    """
+    moto does not start the tasks of a service, nor report the digests
+    they run, so backfill reads the running tasks from a stubbed client.
+    """
+    ecs_client = boto3.client("ecs", region_name=TEST_REGION)
+    monkeypatch.setattr(backfill, "get_client", lambda *args, **kwargs: ecs_client)
+    with Stubber(ecs_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture()
+def fleet(tagger_env, ecs_stub):
+    """
+    Two clusters. ``web`` and ``worker`` share the ``base`` image, ``api``
+    was tagged by the Lambda already, ``job`` is not run by a service, and
+    one ``worker`` task is still pulling its image.
+    """
+    ecr_client = tagger_env
+    digests = {}
+    for seed, repo_name in enumerate(["web", "worker", "base", "api", "job"]):
+        ecr_client.create_repository(repositoryName=repo_name)
+        digests[repo_name] = push_image(ecr_client, repo_name, "v1", str(seed))
+    ecr_client.put_image(
+        repositoryName="api",
+        imageManifest=ecr_client.batch_get_image(
+            repositoryName="api", imageIds=[{"imageTag": "v1"}]
+        )["images"][0]["imageManifest"],
+        imageTag=f"{TAG_PREFIX}2020-01-01T00-00-00Z",
+    )
+
+    def _running(*repo_names):
+        return [(f"{REGISTRY}/{name}:v1", digests[name]) for name in repo_names]
+
+    _stub_cluster(
+        ecs_stub,
+        CLUSTER_NAME,
+        [
+            _task(CLUSTER_NAME, "service:web", _running("web", "base")),
+            _task(CLUSTER_NAME, "service:web", _running("web", "base")),
+            _task(CLUSTER_NAME, "service:api", _running("api")),
+            _task(CLUSTER_NAME, "family:job", _running("job")),
+        ],
+        page_size=3,
+    )
+    _stub_cluster(
+        ecs_stub,
+        OTHER_CLUSTER,
+        [
+            _task(OTHER_CLUSTER, "service:worker", _running("worker", "base")),
+            _task(OTHER_CLUSTER, "service:worker", [(f"{REGISTRY}/job:v1", None)]),
+        ],
+    )
+    return ecr_client
+
+
+def _deployed(ecr_client, repo_name) -> list:
+    (tags,) = image_tags(ecr_client, repo_name).values()
+    return [tag for tag in tags if tag.startswith(TAG_PREFIX)]
+
+
+def test_backfill_tags_running_images_across_clusters(fleet):
+    tagged, errors = backfill.backfill([CLUSTER_NAME, OTHER_CLUSTER])
+
+    assert errors == []
+    assert sorted(uri.split("/")[1].split(":")[0] for uri in tagged) == [
+        "base",
+        "web",
+        "worker",
+    ]
+    for repo_name in ["web", "worker", "base"]:
+        assert len(_deployed(fleet, repo_name)) == 1
+    assert _deployed(fleet, "api") == [f"{TAG_PREFIX}2020-01-01T00-00-00Z"]
+    assert _deployed(fleet, "job") == []
+
+
+def test_dry_run_does_not_tag(fleet, api_calls):
+    tagged, errors = backfill.backfill([CLUSTER_NAME, OTHER_CLUSTER], dry_run=True)
+
+    assert len(tagged) == 3 and errors == []
+    assert "PutImage" not in {op for _, op in api_calls}
+    for repo_name in ["web", "worker", "base"]:
+        assert _deployed(fleet, repo_name) == []
+
+
+def test_every_call_waits_for_the_rate_limiter(fleet, api_calls, monkeypatch):
+    acquired = []
+    monkeypatch.setattr(
+        backfill.RateLimiter, "acquire", lambda self: acquired.append(True)
+    )
+
+    backfill.backfill([CLUSTER_NAME, OTHER_CLUSTER])
+
+    # Both ListTasks pages of the first cluster included.
+    assert Counter(op for _, op in api_calls)["ListTasks"] == 3
+    assert len(acquired) == len(api_calls)
+
+
+def test_running_digest_is_tagged_not_the_current_tag(tagger_env, ecs_stub):
+    ecr_client = tagger_env
+    ecr_client.create_repository(repositoryName="web")
+    running = push_image(ecr_client, "web", "v1", "1")
+    push_image(ecr_client, "web", "previous", "1")
+    _stub_cluster(
+        ecs_stub,
+        CLUSTER_NAME,
+        [_task(CLUSTER_NAME, "service:web", [(f"{REGISTRY}/web:v1", running)])],
+    )
+    # v1 moved on after the task started.
+    pushed = push_image(ecr_client, "web", "v1", "2")
+
+    tagged, errors = backfill.backfill([CLUSTER_NAME])
+
+    assert len(tagged) == 1 and errors == []
+    tags = image_tags(ecr_client, "web")
+    assert [t for t in tags[running] if t.startswith(TAG_PREFIX)], tags
+    assert tags[pushed] == ["v1"]
+
+
+def test_backfill_matches_the_lambda(fleet, monkeypatch):
+    # The Lambda, on a steady-state event for "api", would skip it too.
+    _run_service(CLUSTER_NAME, "api", [f"{REGISTRY}/api:v1"])
+    monkeypatch.setenv("ECS_SERVICE_NAME", "api")
+    assert tagger.lambda_handler(steady_state_event(), None) == {"tagged": []}
+
+    tagged, _ = backfill.backfill([CLUSTER_NAME, OTHER_CLUSTER])
+    assert Counter(uri.split("/")[1].split(":")[0] for uri in tagged) == {
+        "web": 1,
+        "base": 1,
+        "worker": 1,
+    }
+
+
+def test_cli_exit_code_and_output(tagger_env, ecs_stub, capsys):
+    tagger_env.create_repository(repositoryName="web")
+    digest = push_image(tagger_env, "web", "v1", "1")
+    # The second run finds a digest that is gone from the repository.
+    for running in [digest, "sha256:" + "0" * 64]:
+        _stub_cluster(
+            ecs_stub,
+            CLUSTER_NAME,
+            [_task(CLUSTER_NAME, "service:web", [(f"{REGISTRY}/web:v1", running)])],
+        )
+
+    assert backfill.main(["--cluster", CLUSTER_NAME, "--dry-run"]) == 0
+    assert capsys.readouterr().out.count("would tag ") == 1
+    assert backfill.main(["--cluster", CLUSTER_NAME]) == 1
+
+
+def test_ecs_retries_are_left_to_the_retrier(tagger_env, monkeypatch):
+    made = []
+
+    def _get_client(*args, **kwargs):
+        made.append(clients.get_client(*args, **kwargs))
+        return made[-1]
+
+    monkeypatch.setattr(backfill, "get_client", _get_client)
+    boto3.client("ecs", region_name=TEST_REGION).create_cluster(
+        clusterName=CLUSTER_NAME
+    )
+
+    assert backfill.backfill([CLUSTER_NAME], region=TEST_REGION) == ([], [])
+    (ecs_client,) = made
+    assert ecs_client.meta.config.retries["total_max_attempts"] == 1
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = backfill.RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(11):
+        limiter.acquire()
+
+    # The first call is free, the other ten wait 20 ms each.
+    assert time.monotonic() - start >= 0.19
@@ -0,0 +1,120 @@
+"""
+Per-invocation latency of the ECR image tagger, cold vs. warm.
+
+"Cold" drops the process-wide boto3 session and clients before every
+invocation, the way a fresh Lambda container starts. "Warm" keeps them, so
+invocations reuse clients and their open HTTP connections. The Lambda talks
+to a local moto server over real HTTP, so connection setup is part of the
+measurement and no AWS account is needed. Also times the cold import of
+the handler module, which depends too much on the host to gate the default
+run; ``test_cold_import_defers_heavy_packages`` covers its cause there.
+
+Not part of the default run. Run with ``make benchmark``.
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+
+import boto3
+import pytest
+from moto.server import ThreadedMotoServer
+
+import clients
+import main as tagger
+from tests.conftest import LOG
+from tests.unit.conftest import (
+    TAGGER_SOURCE_DIR,
+    TEST_REGION,
+    seed_sidecar_images,
+    steady_state_event,
+)
+
+INVOCATIONS = 30
+# Cold import of main.py measured at ~15 ms with only the standard library
+# at module level; importing boto3 eagerly costs ~150 ms on its own.
+COLD_IMPORT_BUDGET_MS = 60
+
+
+@pytest.fixture()
+def moto_endpoint(tagger_environment, monkeypatch):
+    """
+    Start a moto server on loopback and point every boto3 client at it.
+    """
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    monkeypatch.setenv("AWS_ENDPOINT_URL", f"http://{host}:{port}")
+    yield
+    server.stop()
+
+
+def _invocation_latencies(cold: bool) -> list:
+    """
+    Run the handler ``INVOCATIONS`` times and return each duration in ms.
+    """
+    latencies = []
+    for _ in range(INVOCATIONS):
+        # Always do the full describe + ECR lookup, never the dedup shortcut.
+        tagger.TASK_DEFINITION_CACHE.clear()
+        if cold:
+            clients.reset()
+        start = time.perf_counter()
+        tagger.lambda_handler(steady_state_event(), None)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+@pytest.mark.benchmark
+def test_warm_invocations_are_faster(moto_endpoint):
+    seed_sidecar_images(boto3.client("ecr", region_name=TEST_REGION))
+    # First run tags the images; later runs do identical read-only work.
+    tagger.lambda_handler(steady_state_event(), None)
+
+    cold = _invocation_latencies(cold=True)
+    warm = _invocation_latencies(cold=False)
+
+    for name, latencies in [("cold", cold), ("warm", warm)]:
+        LOG.info(
+            "%s invocation: p50 %.1f ms, mean %.1f ms, max %.1f ms (n=%d)",
+            name,
+            statistics.median(latencies),
+            statistics.mean(latencies),
+            max(latencies),
+            len(latencies),
+        )
+    assert statistics.median(warm) < statistics.median(cold)
+
+
+def _cold_import_ms(statement: str) -> float:
+    """
+    Import the tagger in a fresh interpreter; return the ``main`` import time.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=TAGGER_SOURCE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines look like "import time:  self [us] | cumulative | imported package".
+    for line in result.stderr.splitlines():
+        if "|" not in line:
+            continue
+        _, cumulative, name = line.rsplit("|", 2)
+        if name.strip() == "main":
+            return int(cumulative) / 1000
+    raise AssertionError(f"main not found in -X importtime output:\n{result.stderr}")
+
+
+@pytest.mark.benchmark
+def test_cold_import_stays_within_budget():
+    # Best of three, to keep a noisy CI runner from failing the build.
+    import_ms = min(_cold_import_ms("import main") for _ in range(3))
+
+    LOG.info("Cold import of the tagger: %.1f ms", import_ms)
+    assert import_ms < COLD_IMPORT_BUDGET_MS, (
+        f"Cold import took {import_ms:.1f} ms, budget is {COLD_IMPORT_BUDGET_MS} ms; "
+        "a heavy import probably moved back to module level"
+    )
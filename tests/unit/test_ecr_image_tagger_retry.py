@@ -0,0 +1,182 @@
+import boto3
+import pytest
+from botocore.client import BaseClient
+from botocore.exceptions import (
+    ClientError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+from botocore.stub import Stubber
+
+import clients
+import main as tagger
+import retry
+from tests.unit.conftest import (
+    TAG_PREFIX,
+    TEST_REGION,
+    image_tags,
+    steady_state_event,
+)
+
+IMAGE = {
+    "imageId": {"imageDigest": "sha256:" + "a" * 64},
+    "imageManifest": '{"schemaVersion": 2}',
+}
+
+
+class FakeContext:
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+@pytest.fixture()
+def ecr_stub(aws_credentials):
+    ecr_client = boto3.client("ecr", region_name=TEST_REGION)
+    with Stubber(ecr_client) as stubber:
+        yield ecr_client, stubber
+        stubber.assert_no_pending_responses()
+
+
+def _throttle(stubber, code="ThrottlingException", times=1):
+    for _ in range(times):
+        stubber.add_client_error("put_image", service_error_code=code)
+
+
+def _put(retrier, ecr_client):
+    return retrier.call(tagger._put_image_tag, ecr_client, "app", IMAGE, "deployed")
+
+
+def test_throttled_put_image_is_retried(ecr_stub):
+    ecr_client, stubber = ecr_stub
+    _throttle(stubber, times=2)
+    stubber.add_response("put_image", {})
+    sleeps = []
+    retrier = retry.AdaptiveRetrier(base_delay=1.0, max_delay=4.0, sleep=sleeps.append)
+
+    _put(retrier, ecr_client)
+
+    # Full jitter below a ceiling that doubles on each throttle.
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1.0
+    assert 0 <= sleeps[1] <= 2.0
+
+
+def test_image_already_exists_after_throttle_is_success(ecr_stub):
+    ecr_client, stubber = ecr_stub
+    _throttle(stubber)
+    _throttle(stubber, code="ImageAlreadyExistsException")
+
+    _put(retry.AdaptiveRetrier(sleep=lambda _: None), ecr_client)
+
+
+def test_other_errors_are_not_retried(ecr_stub):
+    ecr_client, stubber = ecr_stub
+    _throttle(stubber, code="AccessDeniedException")
+    sleeps = []
+
+    with pytest.raises(ClientError, match="AccessDeniedException"):
+        _put(retry.AdaptiveRetrier(sleep=sleeps.append), ecr_client)
+    assert sleeps == []
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        EndpointConnectionError(endpoint_url="https://api.ecr.us-west-2.amazonaws.com"),
+        ReadTimeoutError(endpoint_url="https://api.ecr.us-west-2.amazonaws.com"),
+    ],
+)
+def test_transport_errors_are_retried(error):
+    calls = []
+
+    def _flaky():
+        calls.append(True)
+        if len(calls) == 1:
+            raise error
+        return "ok"
+
+    retrier = retry.AdaptiveRetrier(sleep=lambda _: None)
+
+    assert retrier.call(_flaky) == "ok"
+    assert len(calls) == 2
+
+
+def test_botocore_makes_a_single_ecr_attempt(aws_credentials):
+    ecr_client = clients.get_client("ecr", region=TEST_REGION)
+
+    assert ecr_client.meta.config.retries["total_max_attempts"] == 1
+
+
+def test_gives_up_after_max_attempts(ecr_stub):
+    ecr_client, stubber = ecr_stub
+    _throttle(stubber, times=3)
+    sleeps = []
+
+    with pytest.raises(ClientError, match="ThrottlingException"):
+        _put(retry.AdaptiveRetrier(max_attempts=3, sleep=sleeps.append), ecr_client)
+    assert len(sleeps) == 2
+
+
+def test_no_retry_past_the_lambda_deadline(ecr_stub):
+    ecr_client, stubber = ecr_stub
+    _throttle(stubber)
+    sleeps = []
+    # Less time left than the margin kept for reporting: no retry fits.
+    retrier = retry.AdaptiveRetrier.from_context(
+        FakeContext(remaining_ms=int(retry.DEADLINE_MARGIN * 1000) - 1),
+        sleep=sleeps.append,
+    )
+
+    with pytest.raises(ClientError, match="ThrottlingException"):
+        _put(retrier, ecr_client)
+    assert sleeps == []
+
+
+def test_backoff_is_shared_and_recovers(ecr_stub):
+    ecr_client, stubber = ecr_stub
+    _throttle(stubber, times=3)
+    for _ in range(4):
+        stubber.add_response("put_image", {})
+    sleeps = []
+    retrier = retry.AdaptiveRetrier(base_delay=1.0, max_delay=8.0, sleep=sleeps.append)
+
+    # Ceilings of 1, 2 and 4 s for the retries, halved by the success.
+    _put(retrier, ecr_client)
+    assert retrier._ceiling == 2.0
+
+    # The next call, e.g. from another worker, is paced before its first
+    # attempt; successes bring the pace back down.
+    sleeps.clear()
+    _put(retrier, ecr_client)
+    assert len(sleeps) == 1 and sleeps[0] <= 1.0
+    _put(retrier, ecr_client)
+    _put(retrier, ecr_client)
+    assert retrier._ceiling == 0.0
+
+
+def test_handler_tags_through_throttling(tagger_env, sidecar_images, monkeypatch):
+    throttles = {"left": 4}
+    make_api_call = BaseClient._make_api_call
+
+    def _throttling_api_call(self, operation_name, api_params):
+        if operation_name == "PutImage" and throttles["left"]:
+            throttles["left"] -= 1
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+                operation_name,
+            )
+        return make_api_call(self, operation_name, api_params)
+
+    monkeypatch.setattr(BaseClient, "_make_api_call", _throttling_api_call)
+    monkeypatch.setattr(retry.AdaptiveRetrier, "_wait", lambda self, delay: True)
+
+    result = tagger.lambda_handler(steady_state_event(), FakeContext(60000))
+
+    assert throttles["left"] == 0
+    assert len(result["tagged"]) == 3
+    for repo_name in ["app", "agents", "proxy"]:
+        (tags,) = image_tags(tagger_env, repo_name).values()
+        assert [t for t in tags if t.startswith(TAG_PREFIX)], tags
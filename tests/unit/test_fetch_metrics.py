@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+import sys
+from os import path as osp
+
+import fetch_metrics
+from fetch_model import MIB
+from tests.unit.conftest import FETCH_MODEL_DIR
+
+FILES = {
+    "config.json": b"{}",
+    "model-00001-of-00002.safetensors": os.urandom(MIB),
+    "model-00002-of-00002.safetensors": os.urandom(MIB + 1),
+}
+TOTAL = sum(len(content) for content in FILES.values())
+
+
+def _check_emf(record):
+    """
+    Assert ``record`` follows the EMF specification, as CloudWatch Logs
+    would need to extract its metrics.
+    """
+    directive = record["_aws"]
+    assert isinstance(directive["Timestamp"], int)
+    for metrics in directive["CloudWatchMetrics"]:
+        assert metrics["Namespace"] == fetch_metrics.NAMESPACE
+        for dimension_set in metrics["Dimensions"]:
+            for dimension in dimension_set:
+                assert isinstance(record[dimension], str)
+        assert metrics["Metrics"]
+        for metric in metrics["Metrics"]:
+            value = record[metric["Name"]]
+            values = value if isinstance(value, list) else [value]
+            assert values and len(values) <= 100
+            assert all(isinstance(v, (int, float)) for v in values), metric
+            assert metric["Unit"] == fetch_metrics.UNITS[metric["Name"]]
+
+
+def _fetch(source, dest, **env):
+    bin_dir = dest.parent / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    if not (bin_dir / "python3").exists():
+        (bin_dir / "python3").symlink_to(sys.executable)
+    result = subprocess.run(
+        ["sh", osp.join(FETCH_MODEL_DIR, "fetch_model.sh"), source, dest],
+        env={
+            **os.environ,
+            "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            "FETCH_CHUNK_MB": "1",
+            **env,
+        },
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    for record in records:
+        _check_emf(record)
+    return {record["Event"]: record for record in records}
+
+
+def test_fetch_step_emits_emf_records(model_mirror, tmp_path):
+    source = model_mirror.add_model("m", FILES)
+    dest = tmp_path / "models"
+
+    first = _fetch(
+        source,
+        dest,
+        FETCH_METRICS_SERVICE="qwen-7b",
+        FETCH_STREAM="1",
+    )
+
+    assert set(first) == {"fetch", "download"}
+    fetch = first["fetch"]
+    assert fetch["ServiceName"] == "qwen-7b"
+    assert (fetch["CacheHit"], fetch["CacheMiss"]) == (0, 1)
+    assert fetch["ModelBytes"] == TOTAL
+    assert fetch["StartTime"] <= fetch["EndTime"]
+    download = first["download"]
+    assert download["BytesDownloaded"] == TOTAL
+    assert download["BytesFromPeers"] == 0
+    assert len(download["FileThroughput"]) == len(FILES)
+    assert sorted(file["Path"] for file in download["Files"]) == sorted(FILES)
+    assert {"MetadataPhaseTime", "ShardsPhaseTime", "PrefetchPhaseTime"} <= set(
+        download
+    )
+
+    second = _fetch(source, dest, FETCH_METRICS_SERVICE="qwen-7b")
+
+    assert set(second) == {"fetch"}
+    assert (second["fetch"]["CacheHit"], second["fetch"]["CacheMiss"]) == (1, 0)
+    assert second["fetch"]["ModelBytes"] == TOTAL
+
+
+def test_nothing_is_emitted_without_a_service(model_mirror, tmp_path, monkeypatch):
+    monkeypatch.delenv("FETCH_METRICS_SERVICE", raising=False)
+    source = model_mirror.add_model("m", FILES)
+
+    assert _fetch(source, tmp_path / "models") == {}
+    assert fetch_metrics.emit({"CacheHit": 1}) is None
+
+
+def test_empty_metric_lists_are_left_out():
+    record = fetch_metrics.emf_record(
+        "svc", {"DownloadTime": 1.5, "FileThroughput": []}, {"Event": "download"}
+    )
+
+    _check_emf(record)
+    assert "FileThroughput" not in record
+    assert record["_aws"]["CloudWatchMetrics"][0]["Metrics"] == [
+        {"Name": "DownloadTime", "Unit": "Seconds"}
+    ]
@@ -0,0 +1,171 @@
+import os
+import subprocess
+import sys
+from os import path as osp
+
+import pytest
+
+import fetch_model
+from fetch_model import MIB, FetchError, fetch_https
+from tests.unit.conftest import FETCH_MODEL_DIR
+
+WEIGHTS = os.urandom(3 * MIB + 12345)
+FILES = {
+    "config.json": b'{"architectures": ["Qwen2ForCausalLM"]}',
+    "model.safetensors": WEIGHTS,
+    "tokenizer/vocab.json": b"{}",
+}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(fetch_model.time, "sleep", lambda _: None)
+
+
+def _fetch(source, dest, **kwargs):
+    return fetch_https(source, str(dest), chunk_size=MIB, concurrency=4, **kwargs)
+
+
+def _ranges(mirror, path):
+    return sorted(header for requested, header in mirror.requests if requested == path)
+
+
+def test_files_are_downloaded_with_parallel_range_requests(model_mirror, tmp_path):
+    source = model_mirror.add_model("Qwen2.5-7B-Instruct", FILES)
+
+    stats = _fetch(source, tmp_path / "models")
+
+    target = tmp_path / "models" / "Qwen2.5-7B-Instruct"
+    for relative, content in FILES.items():
+        assert (target / relative).read_bytes() == content
+    assert sorted(os.listdir(target)) == [
+        "config.json",
+        "model.safetensors",
+        "tokenizer",
+    ]
+    assert _ranges(model_mirror, "Qwen2.5-7B-Instruct/model.safetensors") == [
+        "bytes=0-1048575",
+        "bytes=1048576-2097151",
+        "bytes=2097152-3145727",
+        f"bytes=3145728-{len(WEIGHTS) - 1}",
+    ]
+    assert stats["bytes_downloaded"] == sum(len(content) for content in FILES.values())
+    assert stats["bytes_present"] == 0
+
+
+def test_interrupted_download_resumes(model_mirror, tmp_path):
+    source = model_mirror.add_model("m", {"model.safetensors": WEIGHTS})
+    # An earlier run finished the first two chunks, then died.
+    target = tmp_path / "models" / "m"
+    target.mkdir(parents=True)
+    (target / "model.safetensors.part").write_bytes(WEIGHTS[: 2 * MIB])
+    (target / "model.safetensors.part.done").write_text(f"0\n{MIB}\n")
+
+    stats = _fetch(source, tmp_path / "models")
+
+    assert (target / "model.safetensors").read_bytes() == WEIGHTS
+    assert _ranges(model_mirror, "m/model.safetensors") == [
+        "bytes=2097152-3145727",
+        f"bytes=3145728-{len(WEIGHTS) - 1}",
+    ]
+    assert stats["bytes_downloaded"] == len(WEIGHTS) - 2 * MIB
+    assert sorted(os.listdir(target)) == ["model.safetensors"]
+
+
+def test_verified_files_are_not_downloaded_again(model_mirror, tmp_path):
+    source = model_mirror.add_model("m", FILES)
+    _fetch(source, tmp_path / "models")
+    model_mirror.requests.clear()
+
+    stats = _fetch(source, tmp_path / "models")
+
+    assert model_mirror.requests == [("m/manifest.json", None)]
+    assert stats["bytes_downloaded"] == 0
+    assert stats["bytes_present"] == sum(len(content) for content in FILES.values())
+
+
+def test_transient_errors_are_retried(model_mirror, tmp_path):
+    source = model_mirror.add_model("m", {"config.json": b"{}"})
+    model_mirror.fail["m/config.json"] = 2
+
+    _fetch(source, tmp_path / "models", retries=2)
+
+    assert (tmp_path / "models" / "m" / "config.json").read_bytes() == b"{}"
+    assert len(_ranges(model_mirror, "m/config.json")) == 3
+
+
+def test_checksum_mismatch_fails_and_discards_the_download(model_mirror, tmp_path):
+    source = model_mirror.add_model("m", {"model.safetensors": WEIGHTS})
+    with open(osp.join(model_mirror.root, "m", "model.safetensors"), "r+b") as fp:
+        fp.write(b"corrupt")
+
+    with pytest.raises(FetchError, match="Checksum mismatch"):
+        _fetch(source, tmp_path / "models")
+
+    assert os.listdir(tmp_path / "models" / "m") == []
+
+
+def test_manifest_paths_stay_inside_the_model(model_mirror, tmp_path):
+    source = model_mirror.add_model("m", {"config.json": b"{}"})
+    with open(osp.join(model_mirror.root, "m", "manifest.json"), "w") as fp:
+        fp.write('{"files": [{"path": "../../etc/passwd", "size": 1, "sha256": ""}]}')
+
+    with pytest.raises(FetchError, match="outside the model"):
+        _fetch(source, tmp_path / "models")
+
+
+def test_fetch_model_sh_runs_the_https_backend(model_mirror, tmp_path):
+    source = model_mirror.add_model("Qwen2.5-7B-Instruct", FILES)
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "python3").symlink_to(sys.executable)
+
+    result = subprocess.run(
+        [
+            "sh",
+            osp.join(FETCH_MODEL_DIR, "fetch_model.sh"),
+            source,
+            tmp_path / "models",
+        ],
+        env={**os.environ, "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}"},
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "MiB/s" in result.stderr
+    target = tmp_path / "models" / "Qwen2.5-7B-Instruct"
+    assert (target / "model.safetensors").read_bytes() == WEIGHTS
+
+
+def test_stream_fetches_small_files_first_and_prefetches_shards(model_mirror, tmp_path):
+    shards = {
+        "model-00001-of-00002.safetensors": os.urandom(2 * MIB),
+        "model-00002-of-00002.safetensors": os.urandom(2 * MIB + 1),
+    }
+    small = {"config.json": b"{}", "tokenizer.json": b"{}", "vocab.txt": b"a"}
+    # Manifest order puts a shard first; stream mode must not.
+    source = model_mirror.add_model("m", {**shards, **small})
+
+    stats = _fetch(source, tmp_path / "models", stream=True)
+
+    fetched = [path for path, _ in model_mirror.requests[1:]]
+    last_small = max(fetched.index(f"m/{name}") for name in small)
+    first_shard = min(fetched.index(f"m/{name}") for name in shards)
+    assert last_small < first_shard
+    for relative, content in {**shards, **small}.items():
+        assert (tmp_path / "models" / "m" / relative).read_bytes() == content
+    assert stats["bytes_prefetched"] == sum(len(c) for c in shards.values())
+    assert set(stats["phases"]) == {"manifest", "metadata", "shards", "prefetch"}
+
+
+def test_prefetch_reads_the_weights_of_a_model(tmp_path, caplog):
+    (tmp_path / "config.json").write_text("{}")
+    (tmp_path / "model.safetensors").write_bytes(b"\1" * MIB)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "pytorch_model.bin").write_bytes(b"\1" * 10)
+
+    with caplog.at_level("INFO", logger="fetch_model"):
+        assert fetch_model.prefetch_model(str(tmp_path)) == MIB + 10
+
+    assert "Phase prefetch: 2 files" in caplog.text
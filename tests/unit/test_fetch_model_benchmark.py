@@ -0,0 +1,40 @@
+"""
+Throughput of the https fetch backend against a local mirror.
+
+The mirror serves a sparse multi-GB "weights" file (``FETCH_BENCHMARK_GB``,
+default 2), so the benchmark needs neither the bandwidth nor the disk space
+of a real model. It compares one range request at a time with the default
+concurrency.
+
+Not part of the default run. Run with ``make benchmark``.
+"""
+
+import os
+
+import pytest
+
+from fetch_model import DEFAULT_CONCURRENCY, MIB, fetch_https
+from tests.conftest import LOG
+
+SIZE = int(float(os.environ.get("FETCH_BENCHMARK_GB", "2")) * 1024 * MIB)
+
+
+@pytest.mark.benchmark
+def test_parallel_range_requests_throughput(model_mirror, tmp_path):
+    source = model_mirror.add_model("m", {"model.safetensors": SIZE})
+
+    results = {}
+    for concurrency in [1, DEFAULT_CONCURRENCY]:
+        dest = tmp_path / f"models-{concurrency}"
+        stats = fetch_https(source, str(dest), concurrency=concurrency)
+        assert stats["bytes_downloaded"] == SIZE
+        results[concurrency] = SIZE / MIB / stats["seconds"]
+        os.remove(dest / "m" / "model.safetensors")
+
+    for concurrency, throughput in results.items():
+        LOG.info(
+            "%.1f GiB, %d range requests in flight: %.0f MiB/s",
+            SIZE / 1024 / MIB,
+            concurrency,
+            throughput,
+        )
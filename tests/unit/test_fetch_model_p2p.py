@@ -0,0 +1,202 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+from os import path as osp
+
+import pytest
+
+import fetch_model
+from fetch_model import MIB, fetch_https, resolve_peers
+from tests.unit.conftest import FETCH_MODEL_DIR
+
+WEIGHTS = os.urandom(4 * MIB + 321)
+FILES = {
+    "config.json": b'{"architectures": ["Qwen2ForCausalLM"]}',
+    "model.safetensors": WEIGHTS,
+}
+TOTAL = sum(len(content) for content in FILES.values())
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(fetch_model.time, "sleep", lambda _: None)
+
+
+@pytest.fixture()
+def start_peer():
+    """
+    Start ``fetch_model.py --serve`` processes on loopback; returns a callable
+    that serves a directory and returns the peer's ``host:port``.
+    """
+    processes = []
+
+    def _start(dest):
+        dest.mkdir(parents=True, exist_ok=True)
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                osp.join(FETCH_MODEL_DIR, "fetch_model.py"),
+                "--serve",
+                dest,
+            ],
+            env={**os.environ, "FETCH_PEER_PORT": "0"},
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        processes.append(process)
+        line = process.stderr.readline()
+        assert "Serving" in line, line
+        return f"127.0.0.1:{line.split()[-1]}"
+
+    yield _start
+    for process in processes:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def _seed(mirror, name, dest, paths=None):
+    """
+    Copy a model from the mirror into a peer's directory, as a finished fetch
+    would leave it.
+    """
+    target = dest / name
+    for relative in paths or FILES:
+        os.makedirs(osp.dirname(target / relative), exist_ok=True)
+        shutil.copy(osp.join(mirror.root, name, relative), target / relative)
+
+
+def _unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _fetch(source, dest, peers):
+    return fetch_https(
+        source,
+        str(dest),
+        chunk_size=MIB,
+        concurrency=4,
+        peers=resolve_peers(",".join(peers)),
+    )
+
+
+def test_peers_serve_the_model(model_mirror, start_peer, tmp_path):
+    source = model_mirror.add_model("m", FILES)
+    _seed(model_mirror, "m", tmp_path / "peer1")
+    # Still fetching: only has the config so far.
+    _seed(model_mirror, "m", tmp_path / "peer2", ["config.json"])
+    (tmp_path / "peer2" / "m" / "model.safetensors.part").write_bytes(b"\0" * 100)
+    peers = [
+        start_peer(tmp_path / "peer1"),
+        start_peer(tmp_path / "peer2"),
+        f"127.0.0.1:{_unused_port()}",
+    ]
+
+    stats = _fetch(source, tmp_path / "models", peers)
+
+    for relative, content in FILES.items():
+        assert (tmp_path / "models" / "m" / relative).read_bytes() == content
+    assert stats["bytes_from_peers"] == TOTAL
+    assert model_mirror.requests == [("m/manifest.json", None)]
+
+
+def test_origin_serves_what_no_peer_has(model_mirror, start_peer, tmp_path):
+    source = model_mirror.add_model("m", FILES)
+    _seed(model_mirror, "m", tmp_path / "peer", ["config.json"])
+    peers = [start_peer(tmp_path / "peer"), f"127.0.0.1:{_unused_port()}"]
+
+    stats = _fetch(source, tmp_path / "models", peers)
+
+    assert (tmp_path / "models" / "m" / "model.safetensors").read_bytes() == WEIGHTS
+    assert stats["bytes_from_peers"] == len(FILES["config.json"])
+    assert stats["bytes_downloaded"] == TOTAL
+    assert {path for path, _ in model_mirror.requests} == {
+        "m/manifest.json",
+        "m/model.safetensors",
+    }
+
+
+def test_corrupt_peer_copy_is_fetched_again_from_the_origin(
+    model_mirror, start_peer, tmp_path
+):
+    source = model_mirror.add_model("m", FILES)
+    _seed(model_mirror, "m", tmp_path / "peer")
+    with open(tmp_path / "peer" / "m" / "model.safetensors", "r+b") as fp:
+        fp.seek(MIB + 7)
+        fp.write(b"corrupt")
+
+    stats = _fetch(source, tmp_path / "models", [start_peer(tmp_path / "peer")])
+
+    target = tmp_path / "models" / "m"
+    assert (target / "model.safetensors").read_bytes() == WEIGHTS
+    assert sorted(os.listdir(target)) == ["config.json", "model.safetensors"]
+    assert stats["bytes_from_peers"] == len(FILES["config.json"])
+    # The weights count once, as the origin sent them.
+    assert stats["bytes_downloaded"] == TOTAL
+
+
+def test_peers_serve_only_finished_files_inside_dest(start_peer, tmp_path):
+    dest = tmp_path / "peer"
+    (dest / "m").mkdir(parents=True)
+    (dest / "m" / "config.json").write_text("{}")
+    (dest / "m" / "model.safetensors.part").write_text("partial")
+    (dest / "m" / ".fetch-complete.json").write_text("{}")
+    (tmp_path / "secret").write_text("secret")
+    peer = start_peer(dest)
+
+    def _get(path):
+        with urllib.request.urlopen(f"http://{peer}/{path}", timeout=5) as response:
+            return response.read()
+
+    assert _get("m/config.json") == b"{}"
+    for path in [
+        "m/model.safetensors.part",
+        "m/.fetch-complete.json",
+        "../secret",
+        "m/../../secret",
+    ]:
+        with pytest.raises(urllib.error.HTTPError, match="404"):
+            _get(path)
+
+
+def test_resolve_peers():
+    assert resolve_peers("127.0.0.1:9000, localhost,,no-such-host.invalid") == [
+        "http://127.0.0.1:9000",
+        "http://127.0.0.1:8001",
+    ]
+    assert resolve_peers("") == []
+
+
+def test_fetch_model_sh_runs_the_p2p_backend(model_mirror, start_peer, tmp_path):
+    source = model_mirror.add_model("m", FILES)
+    _seed(model_mirror, "m", tmp_path / "peer")
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "python3").symlink_to(sys.executable)
+
+    result = subprocess.run(
+        [
+            "sh",
+            osp.join(FETCH_MODEL_DIR, "fetch_model.sh"),
+            source,
+            tmp_path / "models",
+        ],
+        env={
+            **os.environ,
+            "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            "FETCH_BACKEND": "p2p",
+            "FETCH_PEERS": start_peer(tmp_path / "peer"),
+        },
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "from peers" in result.stderr
+    assert (tmp_path / "models" / "m" / "model.safetensors").read_bytes() == WEIGHTS
+    assert model_mirror.requests == [("m/manifest.json", None)]
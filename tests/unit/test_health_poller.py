@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from tests.conftest import (
+    HTTPD_HEALTHY_BODY,
+    LatencyHistogram,
+    any_body,
+    body_contains,
+    wait_for_all_success,
+    wait_for_success,
+)
+
+HEALTHY = (200, HTTPD_HEALTHY_BODY)
+UNAVAILABLE = (503, "Service Unavailable")
+
+
+def test_all_urls_are_polled_concurrently(stand_in_server):
+    # Four hostnames, each healthy only on its third attempt.
+    urls = [
+        stand_in_server.script(f"/host-{i}", UNAVAILABLE, UNAVAILABLE, HEALTHY)
+        for i in range(4)
+    ]
+
+    start = time.monotonic()
+    healthy_after = wait_for_all_success(
+        urls, wait_time=30, min_delay=0.2, max_delay=0.4
+    )
+    elapsed = time.monotonic() - start
+
+    assert set(healthy_after) == set(urls)
+    assert all(hits == 3 for hits in stand_in_server.hits.values())
+    # Polled one after another this would take four times as long.
+    assert elapsed < 2 * max(healthy_after.values()) + 0.5
+
+
+def test_wrong_body_is_not_healthy(stand_in_server):
+    url = stand_in_server.script("/", (200, "Welcome to nginx!"), HEALTHY)
+
+    wait_for_all_success([url], wait_time=10, min_delay=0.1)
+
+    assert stand_in_server.hits["/"] == 2
+
+
+def test_any_body_accepted_without_expectation(stand_in_server):
+    url = stand_in_server.script("/", (200, "Welcome to nginx!"))
+
+    wait_for_all_success([url], wait_time=10, matcher=any_body)
+
+    assert stand_in_server.hits["/"] == 1
+
+
+def test_backoff_grows_per_url(stand_in_server):
+    url = stand_in_server.script("/down", UNAVAILABLE)
+
+    with pytest.raises(RuntimeError):
+        wait_for_all_success([url], wait_time=1.5, min_delay=0.1, max_delay=0.8)
+
+    # A fixed 0.1 s pause would allow ~15 attempts; doubling allows ~6.
+    assert 3 <= stand_in_server.hits["/down"] <= 7
+
+
+def test_deadline_names_unhealthy_urls(stand_in_server):
+    healthy = stand_in_server.script("/up", HEALTHY)
+    down = stand_in_server.script("/down", UNAVAILABLE)
+    unreachable = "http://127.0.0.1:9/"
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError) as err:
+        wait_for_all_success(
+            [healthy, down, unreachable],
+            wait_time=1,
+            request_timeout=0.5,
+            min_delay=0.1,
+        )
+
+    assert time.monotonic() - start < 3
+    message = str(err.value)
+    assert message.startswith("2 URL(s) didn't become healthy")
+    assert f"{down} (" in message and "Expected 200, got 503" in message
+    assert f"{unreachable} (" in message and "ClientConnectorError" in message
+    assert healthy not in message
+
+
+def test_wait_for_success_reuses_one_connection(stand_in_server):
+    url = stand_in_server.script("/", UNAVAILABLE, UNAVAILABLE, HEALTHY)
+
+    wait_for_success(url, wait_time=10, interval=0.1)
+
+    assert stand_in_server.hits["/"] == 3
+    assert len(stand_in_server.connections) == 1
+
+
+def test_wait_for_success_custom_matcher(stand_in_server):
+    url = stand_in_server.script(
+        "/health", (200, "starting"), (200, '{"status": "ready"}')
+    )
+
+    wait_for_success(url, wait_time=10, interval=0.1, matcher=body_contains('"ready"'))
+
+    assert stand_in_server.hits["/health"] == 2
+
+
+def test_wait_for_success_reports_last_error(stand_in_server):
+    url = stand_in_server.script("/", (200, "Welcome to nginx!"))
+
+    with pytest.raises(RuntimeError, match="last: Unexpected response body"):
+        wait_for_success(url, wait_time=0.5, interval=0.1)
+
+
+def test_latency_histogram_buckets():
+    histogram = LatencyHistogram("test")
+    for seconds in [0.01, 0.04, 0.3, 2, 30]:
+        histogram.record(seconds)
+
+    counts = histogram.counts()
+
+    assert counts[50] == 2
+    assert counts[500] == 1
+    assert counts[2500] == 1
+    assert counts[float("inf")] == 1
+    assert sum(counts.values()) == 5
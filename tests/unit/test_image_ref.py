@@ -0,0 +1,120 @@
+import pytest
+
+import main as tagger
+from image_ref import ImageRef, parse_image
+from tests.unit.conftest import (
+    TAG_PREFIX,
+    TEST_REGION,
+    deploy_service,
+    image_tags,
+    push_image,
+    steady_state_event,
+)
+
+DIGEST = "sha256:" + "0123456789abcdef" * 4
+REGISTRY = f"123456789012.dkr.ecr.{TEST_REGION}.amazonaws.com"
+
+
+@pytest.mark.parametrize(
+    "uri, expected",
+    [
+        (
+            f"{REGISTRY}/app:v1",
+            ImageRef(REGISTRY, "app", tag="v1"),
+        ),
+        (
+            f"{REGISTRY}/team/app@{DIGEST}",
+            ImageRef(REGISTRY, "team/app", digest=DIGEST),
+        ),
+        (
+            f"{REGISTRY}/app:v1@{DIGEST}",
+            ImageRef(REGISTRY, "app", tag="v1", digest=DIGEST),
+        ),
+        (
+            "123456789012.dkr.ecr-fips.us-east-1.amazonaws.com/app:v1",
+            ImageRef(
+                "123456789012.dkr.ecr-fips.us-east-1.amazonaws.com", "app", tag="v1"
+            ),
+        ),
+        (
+            "123456789012.dkr.ecr.cn-north-1.amazonaws.com.cn/app:v1",
+            ImageRef(
+                "123456789012.dkr.ecr.cn-north-1.amazonaws.com.cn", "app", tag="v1"
+            ),
+        ),
+        (
+            "public.ecr.aws/aws-observability/aws-for-fluent-bit:stable",
+            ImageRef(
+                "public.ecr.aws", "aws-observability/aws-for-fluent-bit", tag="stable"
+            ),
+        ),
+    ],
+)
+def test_parse_image(uri, expected):
+    ref = parse_image(uri)
+
+    assert ref == expected
+    assert ref.uri == uri
+    assert hash(ref) == hash(expected)
+
+
+def test_parse_image_fields():
+    ref = parse_image("123456789012.dkr.ecr-fips.us-east-1.amazonaws.com/app:v1")
+
+    assert (ref.account, ref.region, ref.fips, ref.public) == (
+        "123456789012",
+        "us-east-1",
+        True,
+        False,
+    )
+    assert ref.image_id == {"imageTag": "v1"}
+    assert parse_image(f"{REGISTRY}/app:v1@{DIGEST}").image_id == {
+        "imageDigest": DIGEST
+    }
+    assert ref.with_tag("deployed") == (
+        "123456789012.dkr.ecr-fips.us-east-1.amazonaws.com/app:deployed"
+    )
+    assert ref.with_digest(DIGEST) == (
+        f"123456789012.dkr.ecr-fips.us-east-1.amazonaws.com/app@{DIGEST}"
+    )
+    assert parse_image("public.ecr.aws/docker/library/nginx:1").public
+
+
+@pytest.mark.parametrize(
+    "uri",
+    [
+        "nginx:latest",
+        "docker.io/library/nginx:1.27",
+        "ghcr.io/org/app:v1",
+        "localhost:5000/app:v1",
+        "public.ecr.aws/nginx:1",
+        f"{REGISTRY}/app:v1@sha256:short",
+        f"{REGISTRY}/App:v1",
+        "123.dkr.ecr.us-west-2.amazonaws.com/app:v1",
+    ],
+)
+def test_parse_image_rejects(uri):
+    assert parse_image(uri) is None
+
+
+def test_image_ref_is_frozen_and_memoized():
+    ref = parse_image(f"{REGISTRY}/app:v1")
+
+    with pytest.raises(AttributeError):
+        ref.tag = "v2"
+    with pytest.raises(AttributeError):
+        ref.extra = 1
+    assert parse_image(f"{REGISTRY}/app:v1") is ref
+    assert {ref, ImageRef(REGISTRY, "app", tag="v1")} == {ref}
+
+
+def test_tagger_tags_tag_and_digest_references(tagger_env):
+    tagger_env.create_repository(repositoryName="app")
+    digest = push_image(tagger_env, "app", "v1", "1")
+    deploy_service([f"{REGISTRY}/app:v1@{digest}"])
+
+    result = tagger.lambda_handler(steady_state_event(), None)
+
+    assert len(result["tagged"]) == 1
+    (tags,) = image_tags(tagger_env, "app").values()
+    assert [t for t in tags if t.startswith(TAG_PREFIX)], tags
@@ -0,0 +1,84 @@
+"""
+Throughput of the memoized ``ImageRef`` parser against the regex path.
+
+The regex path is what the tagger did before :mod:`image_ref`: match every
+URI against ``ECR_IMAGE_PATTERN``, read the groups, and format the tagged
+URI. The workload mimics a task definition history, where a few hundred
+distinct URIs repeat many times.
+
+Not part of the default run. Run with ``make benchmark``.
+"""
+
+import re
+import time
+
+import pytest
+
+from image_ref import parse_image
+from tests.conftest import LOG
+
+# The pattern main.py used before image_ref.
+ECR_IMAGE_PATTERN = re.compile(
+    r"^(?P<account>\d+)\.dkr\.ecr\.(?P<region>[a-z0-9-]+)"
+    r"\.amazonaws\.com/(?P<repo>[^:@]+)"
+    r"(?::(?P<tag>[^@]+)|@(?P<digest>sha256:[a-f0-9]+))$"
+)
+
+DISTINCT_URIS = 200
+REPEATS = 500
+
+
+def _history() -> list:
+    uris = [
+        f"123456789012.dkr.ecr.us-west-2.amazonaws.com/service-{i % 20}:build-{i}"
+        for i in range(DISTINCT_URIS)
+    ]
+    return uris * REPEATS
+
+
+def _regex_path(uris: list) -> None:
+    for uri in uris:
+        match = ECR_IMAGE_PATTERN.match(uri)
+        _ = (match.group("region"), match.group("repo"), match.group("tag"))
+        _ = (
+            f"{match.group('account')}.dkr.ecr.{match.group('region')}"
+            f".amazonaws.com/{match.group('repo')}:deployed"
+        )
+
+
+def _image_ref_path(uris: list) -> None:
+    for uri in uris:
+        ref = parse_image(uri)
+        _ = (ref.region, ref.repo, ref.tag)
+        _ = ref.with_tag("deployed")
+
+
+def _throughput(path, uris: list, cold: bool = False) -> float:
+    """
+    Best of three runs, in URIs per second.
+
+    :param cold: Empty the parse cache before each run.
+    """
+    best = float("inf")
+    for _ in range(3):
+        if cold:
+            parse_image.cache_clear()
+        start = time.perf_counter()
+        path(uris)
+        best = min(best, time.perf_counter() - start)
+    return len(uris) / best
+
+
+@pytest.mark.benchmark
+def test_memoized_parser_outpaces_regex():
+    uris = _history()
+
+    cold = _throughput(_image_ref_path, uris[:DISTINCT_URIS], cold=True)
+    regex = _throughput(_regex_path, uris)
+    memoized = _throughput(_image_ref_path, uris)
+
+    LOG.info("regex path: %.0f URIs/s", regex)
+    LOG.info("ImageRef, first parse: %.0f URIs/s", cold)
+    LOG.info("ImageRef, memoized: %.0f URIs/s (%.1fx)", memoized, memoized / regex)
+    assert parse_image.cache_info().currsize == DISTINCT_URIS
+    assert memoized > regex
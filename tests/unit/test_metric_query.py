@@ -0,0 +1,128 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+from moto import mock_aws
+
+from tests.metric_query import query_metrics
+from tests.unit.conftest import TEST_REGION
+
+NAMESPACE = "CWAgent"
+DIMENSIONS = {"AutoScalingGroupName": "gpu-asg"}
+T0 = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(minutes=10)
+
+
+@pytest.fixture()
+def cloudwatch_client(aws_credentials):
+    with mock_aws():
+        yield boto3.client("cloudwatch", region_name=TEST_REGION)
+
+
+def _put(cloudwatch_client, name, minute, value):
+    cloudwatch_client.put_metric_data(
+        Namespace=NAMESPACE,
+        MetricData=[
+            {
+                "MetricName": name,
+                "Dimensions": [
+                    {"Name": key, "Value": value} for key, value in DIMENSIONS.items()
+                ],
+                "Timestamp": T0 + timedelta(minutes=minute),
+                "Value": value,
+            }
+        ],
+    )
+
+
+def test_query_metrics_aligns_series_in_one_request(cloudwatch_client, api_calls):
+    _put(cloudwatch_client, "util", 0, 10.0)
+    _put(cloudwatch_client, "util", 2, 90.0)
+    _put(cloudwatch_client, "memory_used", 1, 512.0)
+    api_calls.clear()
+
+    series = query_metrics(
+        cloudwatch_client,
+        NAMESPACE,
+        ["util", "memory_used", "memory_total"],
+        DIMENSIONS,
+        start=T0 - timedelta(minutes=1),
+        end=T0 + timedelta(minutes=5),
+    )
+
+    assert api_calls == [("cloudwatch", "GetMetricData")]
+    assert [t - T0 for t in series.timestamps] == [
+        timedelta(minutes=minute) for minute in range(3)
+    ]
+    assert series.values["util"][::2] == [10.0, 90.0]
+    assert math.isnan(series.values["util"][1])
+    assert series.present() == ["memory_used", "util"]
+    assert series.missing() == ["memory_total"]
+    assert series.latest("util") == (series.timestamps[2], 90.0)
+    assert series.latest("memory_total") is None
+    assert series.first_time("util", lambda value: value > 50) == series.timestamps[2]
+
+
+def test_query_metrics_merges_pages():
+    cloudwatch_client = boto3.client("cloudwatch", region_name=TEST_REGION)
+    times = [T0 + timedelta(minutes=minute) for minute in range(3)]
+    with Stubber(cloudwatch_client) as stubber:
+        stubber.add_response(
+            "get_metric_data",
+            {
+                "MetricDataResults": [
+                    {
+                        "Id": "m0",
+                        "Label": "util",
+                        "Timestamps": times[:2],
+                        "Values": [1.0, 2.0],
+                        "StatusCode": "PartialData",
+                    },
+                    {
+                        "Id": "m1",
+                        "Label": "memory_used",
+                        "Timestamps": [],
+                        "Values": [],
+                        "StatusCode": "PartialData",
+                    },
+                ],
+                "NextToken": "page-2",
+            },
+        )
+        stubber.add_response(
+            "get_metric_data",
+            {
+                "MetricDataResults": [
+                    {
+                        "Id": "m0",
+                        "Label": "util",
+                        "Timestamps": times[2:],
+                        "Values": [3.0],
+                        "StatusCode": "Complete",
+                    },
+                    {
+                        "Id": "m1",
+                        "Label": "memory_used",
+                        "Timestamps": times[1:],
+                        "Values": [7.0, 8.0],
+                        "StatusCode": "Complete",
+                    },
+                ],
+            },
+            {
+                "MetricDataQueries": ANY,
+                "StartTime": ANY,
+                "EndTime": ANY,
+                "ScanBy": "TimestampAscending",
+                "NextToken": "page-2",
+            },
+        )
+        series = query_metrics(
+            cloudwatch_client, NAMESPACE, ["util", "memory_used"], DIMENSIONS
+        )
+
+    assert series.timestamps == times
+    assert series.values["util"] == [1.0, 2.0, 3.0]
+    assert math.isnan(series.values["memory_used"][0])
+    assert series.values["memory_used"][1:] == [7.0, 8.0]
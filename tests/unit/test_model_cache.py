@@ -0,0 +1,126 @@
+import json
+import os
+import subprocess
+import sys
+from os import path as osp
+
+import pytest
+
+import model_cache
+from tests.unit.conftest import FETCH_MODEL_DIR
+
+SOURCE = "hf://Qwen/Qwen2.5-7B-Instruct"
+
+# Stands in for the Hugging Face CLI: logs the call, takes a while, and writes
+# a small model tree into --local-dir.
+FAKE_HF = """\
+#!{python}
+import os, sys, time
+
+with open(os.environ["FAKE_HF_LOG"], "a") as log:
+    log.write(" ".join(sys.argv[1:]) + "\\n")
+time.sleep(0.5)
+local_dir = sys.argv[sys.argv.index("--local-dir") + 1]
+os.makedirs(os.path.join(local_dir, "tokenizer"), exist_ok=True)
+for name, size in [("config.json", 100), ("model.safetensors", 4096), ("tokenizer/vocab.json", 10)]:
+    with open(os.path.join(local_dir, name), "wb") as fp:
+        fp.write(b"x" * size)
+"""
+
+
+@pytest.fixture()
+def fetch(tmp_path):
+    """
+    Run ``fetch_model.sh`` with a fake ``hf``; returns a callable that starts
+    a fetch and returns its process.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "python3").symlink_to(sys.executable)
+    hf = bin_dir / "hf"
+    hf.write_text(FAKE_HF.format(python=sys.executable))
+    hf.chmod(0o755)
+    env = {
+        **os.environ,
+        "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+        "FAKE_HF_LOG": str(tmp_path / "hf.log"),
+    }
+
+    def _start(source=SOURCE):
+        return subprocess.Popen(
+            [
+                "sh",
+                osp.join(FETCH_MODEL_DIR, "fetch_model.sh"),
+                source,
+                tmp_path / "models",
+            ],
+            env=env,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+
+    return _start
+
+
+def _run(process):
+    _, stderr = process.communicate(timeout=30)
+    assert process.returncode == 0, stderr
+    return stderr
+
+
+def _hf_calls(tmp_path):
+    log = tmp_path / "hf.log"
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def test_restart_on_a_warm_host_skips_the_fetch(fetch, tmp_path):
+    model_dir = tmp_path / "models" / "Qwen2.5-7B-Instruct"
+
+    assert "cache miss" in _run(fetch())
+    assert "cache hit" in _run(fetch())
+
+    assert len(_hf_calls(tmp_path)) == 1
+    marker = json.loads((model_dir / model_cache.MARKER_NAME).read_text())
+    assert marker["source"] == SOURCE
+    assert marker["files"] == {
+        "config.json": 100,
+        "model.safetensors": 4096,
+        osp.join("tokenizer", "vocab.json"): 10,
+    }
+
+
+def test_incomplete_cache_is_fetched_again(fetch, tmp_path):
+    model_dir = tmp_path / "models" / "Qwen2.5-7B-Instruct"
+    _run(fetch())
+
+    with open(model_dir / "model.safetensors", "r+b") as fp:
+        fp.truncate(1024)
+    assert "cache miss" in _run(fetch())
+    assert "cache hit" in _run(fetch())
+
+    assert len(_hf_calls(tmp_path)) == 2
+
+
+def test_tasks_on_one_host_fetch_once(fetch, tmp_path):
+    processes = [fetch() for _ in range(3)]
+    outputs = [_run(process) for process in processes]
+
+    assert len(_hf_calls(tmp_path)) == 1
+    assert sum("cache hit" in output for output in outputs) == 2
+
+
+def test_failed_fetch_leaves_no_marker(tmp_path):
+    model_dir = tmp_path / "m"
+
+    def _fail():
+        model_dir.mkdir()
+        (model_dir / "config.json").write_text("{}")
+        raise RuntimeError("network down")
+
+    with pytest.raises(RuntimeError):
+        model_cache.ensure("https://mirror/m", str(model_dir), _fail)
+
+    assert not model_cache.is_complete("https://mirror/m", str(model_dir))
+    assert not model_cache.ensure("https://mirror/m", str(model_dir), lambda: None)
+    assert model_cache.is_complete("https://mirror/m", str(model_dir))
+    assert not model_cache.is_complete("https://mirror/other", str(model_dir))
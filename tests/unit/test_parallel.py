@@ -0,0 +1,135 @@
+import json
+import multiprocessing
+import os
+import time
+from contextlib import ExitStack
+from os import path as osp
+from textwrap import dedent
+
+import pytest
+from pytest_infrahouse import terraform_apply
+
+from tests.conftest import cleanup_dot_terraform
+from tests.parallel import SharedResource, stack_dir
+from tests.waiter import WaitTimeoutError
+
+
+def test_stack_dir_is_per_worker(tmp_path, monkeypatch):
+    root = tmp_path / "test_data"
+    source = root / "httpd"
+    (source / ".terraform").mkdir(parents=True)
+    (source / "main.tf").write_text('module "x" { source = "../../" }\n')
+    (source / "terraform.tfvars").write_text('region = "us-west-2"\n')
+
+    monkeypatch.delenv("PYTEST_XDIST_WORKER", raising=False)
+    assert stack_dir(str(root), "httpd") == str(source)
+
+    copies = {}
+    for worker in ["gw0", "gw1"]:
+        monkeypatch.setenv("PYTEST_XDIST_WORKER", worker)
+        copies[worker] = stack_dir(str(root), "httpd")
+        assert sorted(os.listdir(copies[worker])) == ["main.tf"]
+        # Same depth, so ../../ is still the module.
+        assert osp.dirname(copies[worker]) == str(root)
+        os.mkdir(osp.join(copies[worker], ".terraform"))
+
+    # A re-run refreshes sources and keeps the worker's state.
+    (source / "main.tf").write_text("# changed\n")
+    with open(osp.join(copies["gw0"], "terraform.tfstate"), "w") as fp:
+        fp.write("{}")
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw0")
+    stack_dir(str(root), "httpd")
+    with open(osp.join(copies["gw0"], "main.tf")) as fp:
+        assert fp.read() == "# changed\n"
+    assert osp.exists(osp.join(copies["gw0"], "terraform.tfstate"))
+
+    cleanup_dot_terraform(copies["gw0"])
+    assert not osp.exists(osp.join(copies["gw0"], ".terraform"))
+    assert osp.isdir(osp.join(copies["gw1"], ".terraform"))
+    assert osp.isdir(source / ".terraform")
+
+
+def _worker_session(handoff_dir, module_dir):
+    """
+    What one xdist worker does with the shared network over its session.
+
+    :return: ``(value, owner, time the worker stopped using it)``.
+    """
+    shared = SharedResource("service_network", handoff_dir, poll_interval=0.05)
+    with ExitStack() as stack:
+        value = shared.acquire(
+            lambda: stack.enter_context(
+                terraform_apply(module_dir, max_retries=1, backoff_seconds=0)
+            )
+        )
+        # The owner runs out of tests first and must wait for the others.
+        time.sleep(0.1 if shared.owner else 1.0)
+        done = time.time()
+        if not shared.owner:
+            shared.release()
+            return value, False, done
+        shared.wait_for_last_user(timeout_s=30)
+    shared.remove()
+    return value, True, done
+
+
+def test_shared_resource_is_applied_and_destroyed_once(fake_terraform, tmp_path):
+    module_dir = tmp_path / "service-network"
+    module_dir.mkdir()
+    (module_dir / "main.tf").write_text(dedent("""
+            output "vpc_id" { value = "vpc" }
+            """))
+
+    with multiprocessing.get_context("fork").Pool(3) as pool:
+        sessions = pool.starmap(_worker_session, [(str(tmp_path), str(module_dir))] * 3)
+
+    calls = fake_terraform()
+    assert [call["command"] for call in calls] == [
+        "init",
+        "get",
+        "apply",
+        "output",
+        "destroy",
+    ]
+    assert len({json.dumps(value) for value, _, _ in sessions}) == 1
+    assert [owner for _, owner, _ in sessions].count(True) == 1
+    assert calls[-1]["time"] >= max(done for _, owner, done in sessions if not owner)
+    assert not osp.exists(tmp_path / "service_network.json")
+
+
+def _dead_pid():
+    process = multiprocessing.get_context("fork").Process(target=lambda: None)
+    process.start()
+    process.join()
+    return process.pid
+
+
+def _write_handoff(tmp_path, **state):
+    (tmp_path / "service_network.json").write_text(
+        json.dumps({"value": "old", "users": 1, **state})
+    )
+
+
+def test_handoff_of_a_dead_owner_is_stale(tmp_path):
+    # The owner died while tearing the resource down.
+    _write_handoff(tmp_path, closing=True, owner_pid=_dead_pid())
+    shared = SharedResource("service_network", str(tmp_path), poll_interval=0.01)
+
+    assert shared.acquire(lambda: "new", timeout_s=5) == "new"
+    assert shared.owner
+    state = json.loads((tmp_path / "service_network.json").read_text())
+    assert state == {
+        "value": "new",
+        "users": 1,
+        "closing": False,
+        "owner_pid": os.getpid(),
+    }
+
+
+def test_acquire_gives_up_on_a_teardown_that_does_not_finish(tmp_path):
+    _write_handoff(tmp_path, closing=True, owner_pid=os.getpid())
+    shared = SharedResource("service_network", str(tmp_path), poll_interval=0.01)
+
+    with pytest.raises(WaitTimeoutError, match="service_network teardown"):
+        shared.acquire(lambda: "new", timeout_s=0.1)
+    assert not shared.owner
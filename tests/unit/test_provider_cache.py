@@ -0,0 +1,121 @@
+import os
+from os import path as osp
+
+import pytest
+from pytest_infrahouse import terraform as infrahouse_terraform
+from pytest_infrahouse import terraform_apply
+
+from tests import conftest as harness
+from tests import provider_cache
+
+AWS_PACKAGE = "registry.terraform.io/hashicorp/aws/6.0.0/linux_amd64"
+
+
+def _package(root, key, content):
+    package_dir = osp.join(root, key)
+    os.makedirs(package_dir)
+    with open(osp.join(package_dir, "terraform-provider"), "w") as fp:
+        fp.write(content)
+    return package_dir
+
+
+def test_update_terraform_tf_skips_unchanged_constraint(tmp_path):
+    assert harness.update_terraform_tf(str(tmp_path), "~> 6.0")
+    terraform_tf = tmp_path / "terraform.tf"
+    os.utime(terraform_tf, (0, 0))
+
+    assert not harness.update_terraform_tf(str(tmp_path), "~> 6.0")
+    assert terraform_tf.stat().st_mtime == 0
+    assert harness.update_terraform_tf(str(tmp_path), "~> 5.0")
+    assert '"~> 5.0"' in terraform_tf.read_text()
+
+
+def test_package_hash_addresses_content(tmp_path):
+    first = _package(tmp_path, "a/x/y/1.0.0/linux_amd64", "binary")
+    same = _package(tmp_path, "b/x/y/2.0.0/linux_arm64", "binary")
+    other = _package(tmp_path, "c/x/y/1.0.0/linux_amd64", "other binary")
+
+    assert provider_cache.package_hash(first).startswith("h1:")
+    assert provider_cache.package_hash(first) == provider_cache.package_hash(same)
+    assert provider_cache.package_hash(first) != provider_cache.package_hash(other)
+
+
+def test_harvest_stores_each_package_once(tmp_path):
+    cache_dir = tmp_path / "plugin-cache"
+    _package(cache_dir, AWS_PACKAGE, "aws")
+    _package(cache_dir, AWS_PACKAGE.replace("6.0.0", "6.0.1"), "aws")
+    _package(
+        cache_dir, "registry.terraform.io/hashicorp/random/3.0.0/linux_amd64", "rnd"
+    )
+
+    added = provider_cache.harvest(str(tmp_path))
+
+    assert sorted(added) == sorted(
+        [
+            AWS_PACKAGE,
+            AWS_PACKAGE.replace("6.0.0", "6.0.1"),
+            "registry.terraform.io/hashicorp/random/3.0.0/linux_amd64",
+        ]
+    )
+    assert len(os.listdir(tmp_path / "objects")) == 2
+    entry = tmp_path / "mirror" / AWS_PACKAGE
+    assert entry.is_symlink()
+    assert (entry / "terraform-provider").read_text() == "aws"
+    assert provider_cache.harvest(str(tmp_path)) == []
+
+
+@pytest.mark.parametrize("offline", [False, True], ids=["online", "offline"])
+def test_configure(tmp_path, offline):
+    env = {"TF_PLUGIN_CACHE_DIR": "/elsewhere"}
+
+    config_path = provider_cache.configure(env, str(tmp_path), offline=offline)
+
+    with open(config_path) as fp:
+        config = fp.read()
+    assert env["TF_CLI_CONFIG_FILE"] == config_path
+    assert env["TF_PLUGIN_CACHE_MAY_BREAK_DEPENDENCY_LOCK_FILE"] == "true"
+    if offline:
+        assert f'path = "{tmp_path / "mirror"}"' in config
+        assert "direct" not in config
+        assert "TF_PLUGIN_CACHE_DIR" not in env
+    else:
+        assert f'plugin_cache_dir = "{tmp_path / "plugin-cache"}"' in config
+        assert env["TF_PLUGIN_CACHE_DIR"] == str(tmp_path / "plugin-cache")
+
+
+def test_warm_init_fills_the_mirror_for_offline_runs(
+    fake_terraform, tmp_path, monkeypatch
+):
+    cache_root = tmp_path / "cache"
+    stack = tmp_path / "stack"
+    stack.mkdir()
+    monkeypatch.setattr(harness, "_PROVIDER_CACHE_ROOT", str(cache_root))
+    monkeypatch.setattr(harness, "_INIT_TIMES", [])
+    monkeypatch.setattr(
+        infrahouse_terraform,
+        "run_with_retries",
+        harness.time_terraform_init(infrahouse_terraform.run_with_retries),
+    )
+
+    def apply():
+        with terraform_apply(str(stack), destroy_after=False, json_output=False):
+            pass
+
+    # Online: init downloads into the cache; the harness mirrors it.
+    provider_cache.configure(os.environ, str(cache_root))
+    apply()
+    assert (cache_root / "mirror" / AWS_PACKAGE).is_symlink()
+
+    # Offline: Terraform is pointed at the mirror and nothing is harvested.
+    provider_cache.configure(os.environ, str(cache_root), offline=True)
+    apply()
+
+    calls = fake_terraform()
+    assert [call["command"] for call in calls] == ["init", "get", "apply"] * 2
+    online, offline = [call for call in calls if call["command"] == "init"]
+    assert online["env"]["TF_PLUGIN_CACHE_DIR"] == str(cache_root / "plugin-cache")
+    assert offline["env"] == {
+        "TF_CLI_CONFIG_FILE": str(cache_root / "offline.tfrc"),
+        "TF_PLUGIN_CACHE_DIR": None,
+    }
+    assert [path for path, _ in harness._INIT_TIMES] == [str(stack)] * 2
@@ -0,0 +1,153 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from moto import mock_aws
+
+from tests.task_definitions import RateLimiter, purge_task_definitions
+from tests.unit.conftest import TEST_REGION
+
+ARN = f"arn:aws:ecs:{TEST_REGION}:123456789012:task-definition"
+
+
+@pytest.fixture()
+def ecs_client(aws_credentials):
+    with mock_aws():
+        yield boto3.client("ecs", region_name=TEST_REGION)
+
+
+def _register(ecs_client, family, count):
+    return [
+        ecs_client.register_task_definition(
+            family=family,
+            containerDefinitions=[{"name": "c", "image": "nginx", "memory": 64}],
+        )["taskDefinition"]["taskDefinitionArn"]
+        for _ in range(count)
+    ]
+
+
+def _listed(ecs_client, status):
+    return ecs_client.list_task_definitions(status=status)["taskDefinitionArns"]
+
+
+def test_purge_deletes_all_revisions_in_batches(ecs_client, api_calls):
+    web = _register(ecs_client, "web", 25)
+    worker = _register(ecs_client, "web-worker", 2)
+    for arn in web[:3]:
+        ecs_client.deregister_task_definition(taskDefinition=arn)
+    api_calls.clear()
+
+    counts = purge_task_definitions(ecs_client, {"web"}, rate=1000)
+
+    assert counts == {"deregistered": 22, "deleted": 25, "failed": 0}
+    assert Counter(op for _, op in api_calls) == {
+        "ListTaskDefinitions": 2,
+        "DeregisterTaskDefinition": 22,
+        "DeleteTaskDefinitions": 3,
+    }
+    # "web-worker" shares the "web" prefix but is not the family.
+    assert _listed(ecs_client, "ACTIVE") == worker
+    assert _listed(ecs_client, "INACTIVE") == []
+
+
+def test_purge_pages_and_reports_failures():
+    ecs_client = boto3.client("ecs", region_name=TEST_REGION)
+    with Stubber(ecs_client) as stubber:
+        stubber.add_response(
+            "list_task_definitions",
+            {"taskDefinitionArns": [f"{ARN}/web:2"], "nextToken": "t"},
+            {"familyPrefix": "web", "status": "ACTIVE", "maxResults": 1},
+        )
+        stubber.add_response(
+            "list_task_definitions",
+            {"taskDefinitionArns": [f"{ARN}/web:3", f"{ARN}/web-worker:1"]},
+            {
+                "familyPrefix": "web",
+                "status": "ACTIVE",
+                "maxResults": 1,
+                "nextToken": "t",
+            },
+        )
+        stubber.add_response(
+            "list_task_definitions",
+            {"taskDefinitionArns": [f"{ARN}/web:1"]},
+            {"familyPrefix": "web", "status": "INACTIVE", "maxResults": 1},
+        )
+        for revision in [2, 3]:
+            stubber.add_response(
+                "deregister_task_definition",
+                {},
+                {"taskDefinition": f"{ARN}/web:{revision}"},
+            )
+        stubber.add_response(
+            "delete_task_definitions",
+            {
+                "taskDefinitions": [{"taskDefinitionArn": f"{ARN}/web:2"}],
+                "failures": [
+                    {"arn": f"{ARN}/web:3", "reason": "ACTIVE"},
+                    {"arn": f"{ARN}/web:1", "reason": "ACTIVE"},
+                ],
+            },
+            {"taskDefinitions": [f"{ARN}/web:{r}" for r in [2, 3, 1]]},
+        )
+
+        counts = purge_task_definitions(
+            ecs_client, ["web"], max_workers=1, rate=1000, page_size=1
+        )
+        stubber.assert_no_pending_responses()
+
+    assert counts == {"deregistered": 2, "deleted": 1, "failed": 2}
+
+
+def test_purge_deletes_what_deregistered_when_one_deregistration_fails():
+    ecs_client = boto3.client("ecs", region_name=TEST_REGION)
+    with Stubber(ecs_client) as stubber:
+        stubber.add_response(
+            "list_task_definitions",
+            {"taskDefinitionArns": [f"{ARN}/web:{r}" for r in [2, 3, 4]]},
+            {"familyPrefix": "web", "status": "ACTIVE"},
+        )
+        stubber.add_response(
+            "list_task_definitions",
+            {"taskDefinitionArns": [f"{ARN}/web:1"]},
+            {"familyPrefix": "web", "status": "INACTIVE"},
+        )
+        stubber.add_response(
+            "deregister_task_definition", {}, {"taskDefinition": f"{ARN}/web:2"}
+        )
+        stubber.add_client_error(
+            "deregister_task_definition",
+            service_error_code="ThrottlingException",
+            expected_params={"taskDefinition": f"{ARN}/web:3"},
+        )
+        stubber.add_response(
+            "deregister_task_definition", {}, {"taskDefinition": f"{ARN}/web:4"}
+        )
+        stubber.add_response(
+            "delete_task_definitions",
+            {
+                "taskDefinitions": [
+                    {"taskDefinitionArn": f"{ARN}/web:{r}"} for r in [2, 4, 1]
+                ],
+                "failures": [],
+            },
+            {"taskDefinitions": [f"{ARN}/web:{r}" for r in [2, 4, 1]]},
+        )
+
+        counts = purge_task_definitions(ecs_client, ["web"], max_workers=1, rate=1000)
+        stubber.assert_no_pending_responses()
+
+    assert counts == {"deregistered": 2, "deleted": 3, "failed": 1}
+
+
+def test_rate_limiter_paces_threads():
+    limiter = RateLimiter(rate=50)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: limiter.acquire(), range(11)))
+
+    # The first call is free, the other ten wait 20 ms each.
+    assert time.monotonic() - start >= 0.19
@@ -0,0 +1,183 @@
+import json
+
+import pytest
+
+from tests.terraform_plan import Plan, plan_stack
+
+CONTAINERS = [
+    {
+        "name": "web",
+        "image": "httpd",
+        "essential": True,
+        "memory": 128,
+        "portMappings": [{"containerPort": 80}],
+    }
+]
+INSTANCE_POLICY = {
+    "statement": [
+        {
+            "sid": "AllowGpuMetricPublish",
+            "effect": "Allow",
+            "actions": ["cloudwatch:PutMetricData"],
+            "resources": ["*"],
+            "not_actions": [],
+            "principals": [],
+            "condition": [
+                {
+                    "test": "StringEquals",
+                    "variable": "cloudwatch:namespace",
+                    "values": ["GPU"],
+                }
+            ],
+        }
+    ]
+}
+# As terraform show -json prints it: the module's resources in a child module,
+# one data source read during the plan, one deferred to apply.
+PLAN = {
+    "planned_values": {
+        "root_module": {
+            "resources": [
+                {
+                    "address": "random_pet.hostname",
+                    "mode": "managed",
+                    "type": "random_pet",
+                    "values": {},
+                }
+            ],
+            "child_modules": [
+                {
+                    "address": "module.httpd",
+                    "resources": [
+                        {
+                            "address": "module.httpd.aws_ecs_task_definition.ecs",
+                            "mode": "managed",
+                            "type": "aws_ecs_task_definition",
+                            "values": {"container_definitions": json.dumps(CONTAINERS)},
+                        },
+                        {
+                            "address": "module.httpd.aws_appautoscaling_policy.ecs_policy",
+                            "mode": "managed",
+                            "type": "aws_appautoscaling_policy",
+                            "values": {
+                                "name": "auto-scaling",
+                                "target_tracking_scaling_policy_configuration": [
+                                    {"target_value": 70}
+                                ],
+                            },
+                        },
+                    ],
+                }
+            ],
+        }
+    },
+    "prior_state": {
+        "values": {
+            "root_module": {
+                "child_modules": [
+                    {
+                        "resources": [
+                            {
+                                "address": "module.httpd.data.aws_iam_policy_document.instance_policy",
+                                "mode": "data",
+                                "type": "aws_iam_policy_document",
+                                "values": INSTANCE_POLICY,
+                            }
+                        ]
+                    }
+                ]
+            }
+        }
+    },
+    "resource_changes": [
+        {
+            "address": "module.httpd.data.aws_iam_policy_document.assume_role_policy",
+            "mode": "data",
+            "type": "aws_iam_policy_document",
+            "change": {
+                "actions": ["read"],
+                "after": {
+                    "statement": [
+                        {
+                            "actions": ["sts:AssumeRole"],
+                            "principals": [
+                                {
+                                    "type": "Service",
+                                    "identifiers": ["ecs-tasks.amazonaws.com"],
+                                }
+                            ],
+                        }
+                    ]
+                },
+            },
+        }
+    ],
+}
+
+
+def test_plan_answers_from_every_module():
+    plan = Plan(PLAN)
+
+    assert plan.container_definitions() == {
+        "module.httpd.aws_ecs_task_definition.ecs": CONTAINERS
+    }
+    assert plan.scaling_policies() == {"auto-scaling": {"target_value": 70}}
+    assert plan.policy_statements() == {
+        "module.httpd.data.aws_iam_policy_document.assume_role_policy": [
+            {
+                "Effect": "Allow",
+                "Action": ["sts:AssumeRole"],
+                "Resource": [],
+                "Principal": {"Service": ["ecs-tasks.amazonaws.com"]},
+            }
+        ],
+        "module.httpd.data.aws_iam_policy_document.instance_policy": [
+            {
+                "Sid": "AllowGpuMetricPublish",
+                "Effect": "Allow",
+                "Action": ["cloudwatch:PutMetricData"],
+                "Resource": ["*"],
+                "Condition": {"StringEquals": {"cloudwatch:namespace": ["GPU"]}},
+            }
+        ],
+    }
+    assert plan.actions(
+        "module.httpd.data.aws_iam_policy_document.instance_policy"
+    ) == {"cloudwatch:PutMetricData"}
+
+
+@pytest.fixture()
+def stack(tmp_path, monkeypatch):
+    """
+    A stack directory, and the plan the fake ``terraform test`` prints for it.
+    """
+    stack_dir = tmp_path / "httpd"
+    stack_dir.mkdir()
+    (stack_dir / "main.tf").write_text('module "httpd" { source = "../../" }\n')
+    plan_path = tmp_path / "plan.json"
+    plan_path.write_text(json.dumps(PLAN))
+    monkeypatch.setenv("FAKE_TERRAFORM_PLAN", str(plan_path))
+    return stack_dir
+
+
+def test_unchanged_stacks_are_not_planned_again(fake_terraform, stack, tmp_path):
+    cache_dir = tmp_path / "plans"
+
+    def _tests_run():
+        return [call["command"] for call in fake_terraform()].count("test")
+
+    first = plan_stack(str(stack), cache_dir=str(cache_dir))
+    assert first.document == PLAN
+    assert _tests_run() == 1
+
+    assert plan_stack(str(stack), cache_dir=str(cache_dir)).document == PLAN
+    assert _tests_run() == 1
+
+    plan_stack(str(stack), {"autoscaling_target": 80}, cache_dir=str(cache_dir))
+    assert _tests_run() == 2
+
+    with open(stack / "main.tf", "a") as fp:
+        fp.write('output "x" { value = 1 }\n')
+    plan_stack(str(stack), cache_dir=str(cache_dir))
+    assert _tests_run() == 3
+    assert len(list(cache_dir.glob("*.json"))) == 3
@@ -0,0 +1,133 @@
+import json
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from moto import mock_aws
+from pytest_infrahouse import terraform_apply
+
+from tests import timing
+from tests.unit.conftest import TEST_REGION
+from tests.waiter import Schedule, wait_for
+
+
+@pytest.fixture()
+def profile(tmp_path, monkeypatch):
+    """
+    Profile the test as if ``--timing-profile`` were set.
+    """
+    profile = timing.TimingProfile(str(tmp_path / "profile.json"))
+    profile.start_test("test_a")
+    monkeypatch.setattr(timing, "_PROFILE", profile)
+    return profile
+
+
+def _phases(profile, nodeid="test_a"):
+    return {
+        name: entry["count"] for name, entry in profile.tests[nodeid]["phases"].items()
+    }
+
+
+def test_phases_are_recorded_only_when_profiling(profile, monkeypatch):
+    wait_for(lambda: True, "x", timeout_s=1, phase="ready")
+    wait_for(lambda: True, "x", timeout_s=1, phase="ready")
+    monkeypatch.setattr(timing, "_PROFILE", None)
+    wait_for(lambda: True, "x", timeout_s=1, schedule=Schedule.fixed(0))
+
+    assert _phases(profile) == {"wait ready": 2}
+
+
+def test_aws_calls_are_timed_per_operation(profile, aws_credentials):
+    with mock_aws():
+        session = boto3.Session(region_name=TEST_REGION)
+        profile.instrument_session(session)
+        ecs_client = session.client("ecs")
+        ecs_client.list_clusters()
+        ecs_client.list_clusters()
+        ecs_client.create_cluster(clusterName="c")
+
+    assert _phases(profile) == {"aws ecs.ListClusters": 2, "aws ecs.CreateCluster": 1}
+
+
+def test_terraform_apply_and_destroy_are_timed(profile, fake_terraform, tmp_path):
+    module_dir = tmp_path / "service-network"
+    module_dir.mkdir()
+
+    profiled_apply = timing.profile_terraform_apply(terraform_apply)
+    with profiled_apply(str(module_dir), max_retries=1, backoff_seconds=0) as output:
+        assert "vpc_id" in output
+
+    phases = profile.tests["test_a"]["phases"]
+    assert set(phases) == {
+        "terraform apply [service-network]",
+        "terraform destroy [service-network]",
+    }
+    # The fake terraform apply sleeps for 0.5 s.
+    assert phases["terraform apply [service-network]"]["total_s"] >= 0.5
+
+
+def test_regressions_need_both_ratio_and_absolute_slowdown(profile, tmp_path):
+    baseline = tmp_path / "baseline.json"
+    for name, seconds in [("slower", 20.0), ("jitter", 0.1), ("same", 100.0)]:
+        profile.record(name, seconds)
+    profile.write()
+    baseline.write_text((tmp_path / "profile.json").read_text())
+
+    rerun = timing.TimingProfile(
+        str(tmp_path / "rerun.json"), baseline_path=str(baseline)
+    )
+    rerun.start_test("test_a")
+    for name, seconds in [("slower", 40.0), ("jitter", 0.5), ("same", 110.0)]:
+        rerun.record(name, seconds)
+    rerun.record("new", 60.0)
+    rerun.write()
+
+    artifact = json.loads((tmp_path / "rerun.json").read_text())
+    assert artifact["regressions"] == [
+        {
+            "test": "test_a",
+            "phase": "slower",
+            "baseline_s": 20.0,
+            "current_s": 40.0,
+            "ratio": 2.0,
+        }
+    ]
+    assert artifact["tests"]["test_a"]["phases"]["new"] == {
+        "count": 1,
+        "total_s": 60.0,
+    }
+    assert any(line.startswith("REGRESSION test_a") for line in rerun.summary_lines())
+
+
+def test_xdist_controller_merges_worker_profiles(tmp_path):
+    path = str(tmp_path / "profile.json")
+    controller = timing.TimingProfile(path)
+    nodes = []
+    for worker_id, nodeid in [("gw0", "test_a"), ("gw1", "test_b")]:
+        worker = timing.TimingProfile(path)
+        worker.start_test(nodeid)
+        worker.record("wait ready", 2.0)
+        worker.record("aws ecs.ListClusters", 0.5)
+        config = SimpleNamespace(workerinput={"workerid": worker_id}, workeroutput={})
+        worker.pytest_sessionfinish(SimpleNamespace(config=config))
+        nodes.append(SimpleNamespace(workeroutput=config.workeroutput))
+    # Workers leave the artifact to the controller.
+    assert not (tmp_path / "profile.json").exists()
+    # The controller only has the durations, from forwarded reports.
+    for nodeid in ["test_a", "test_b"]:
+        controller.pytest_runtest_logreport(
+            SimpleNamespace(nodeid=nodeid, duration=3.0)
+        )
+
+    for node in nodes:
+        controller.pytest_testnodedown(node, None)
+    controller.pytest_sessionfinish(SimpleNamespace(config=SimpleNamespace()))
+
+    written = json.loads((tmp_path / "profile.json").read_text())["tests"]
+    assert set(written) == {"test_a", "test_b"}
+    for test in written.values():
+        assert test["duration_s"] == 3.0
+        assert test["phases"] == {
+            "wait ready": {"count": 1, "total_s": 2.0},
+            "aws ecs.ListClusters": {"count": 1, "total_s": 0.5},
+        }
@@ -0,0 +1,134 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from tests.unit.conftest import TEST_REGION
+from tests.vpc_purge import FIXTURE_TAG_KEY, purge_injected_vpc_resources
+from tests.waiter import Schedule
+
+FIXTURE_TAGS = [
+    {"ResourceType": "security-group", "Tags": [{"Key": FIXTURE_TAG_KEY, "Value": "x"}]}
+]
+
+
+@pytest.fixture()
+def ec2_client(aws_credentials):
+    with mock_aws():
+        yield boto3.client("ec2", region_name=TEST_REGION)
+
+
+@pytest.fixture()
+def vpc(ec2_client):
+    """
+    A test VPC with a fixture-owned security group.
+
+    :return: ``(vpc_id, subnet_id)``.
+    """
+    vpc_id = ec2_client.create_vpc(CidrBlock="10.0.0.0/16")["Vpc"]["VpcId"]
+    subnet_id = ec2_client.create_subnet(VpcId=vpc_id, CidrBlock="10.0.1.0/24")[
+        "Subnet"
+    ]["SubnetId"]
+    ec2_client.create_security_group(
+        GroupName="service",
+        Description="fixture-owned",
+        VpcId=vpc_id,
+        TagSpecifications=FIXTURE_TAGS,
+    )
+    return vpc_id, subnet_id
+
+
+def _calls(ec2_client):
+    """
+    Record ``(operation, params)`` of every EC2 call the client makes.
+    """
+    calls = []
+    ec2_client.meta.events.register(
+        "before-call.ec2.*",
+        lambda model, params, **_: calls.append((model.name, params["body"])),
+    )
+    return calls
+
+
+def _group_ids(ec2_client, vpc_id, name):
+    return [
+        group["GroupId"]
+        for group in ec2_client.describe_security_groups(
+            Filters=[{"Name": "vpc-id", "Values": [vpc_id]}]
+        )["SecurityGroups"]
+        if group["GroupName"] == name
+    ]
+
+
+def test_security_group_waits_for_the_endpoint_enis(ec2_client, vpc):
+    vpc_id, subnet_id = vpc
+    guardduty_sg = ec2_client.create_security_group(
+        GroupName="GuardDutyManagedSecurityGroup", Description="d", VpcId=vpc_id
+    )["GroupId"]
+    unused_sg = ec2_client.create_security_group(
+        GroupName="unused", Description="d", VpcId=vpc_id
+    )["GroupId"]
+    endpoint_id = ec2_client.create_vpc_endpoint(
+        VpcId=vpc_id,
+        ServiceName=f"com.amazonaws.{TEST_REGION}.guardduty-data",
+        VpcEndpointType="Interface",
+        SubnetIds=[subnet_id],
+    )["VpcEndpoint"]["VpcEndpointId"]
+    # The endpoint's ENI, which references the GuardDuty group and, as in AWS,
+    # outlives the endpoint for a while: here, two rounds.
+    eni_id = ec2_client.create_network_interface(
+        SubnetId=subnet_id,
+        Groups=[guardduty_sg],
+        Description=f"VPC Endpoint Interface {endpoint_id}",
+    )["NetworkInterface"]["NetworkInterfaceId"]
+    rounds = []
+
+    def _detach_after_two_rounds(**_):
+        rounds.append(None)
+        if len(rounds) == 2:
+            ec2_client.delete_network_interface(NetworkInterfaceId=eni_id)
+
+    ec2_client.meta.events.register(
+        "after-call.ec2.DescribeNetworkInterfaces", _detach_after_two_rounds
+    )
+    calls = _calls(ec2_client)
+
+    purged = purge_injected_vpc_resources(
+        ec2_client, vpc_id, timeout_s=30, schedule=Schedule.fixed(0)
+    )
+
+    assert purged == {
+        "endpoints": [endpoint_id],
+        "security_groups": [unused_sg, guardduty_sg],
+    }
+    operations = [
+        (name, body.get("GroupId"))
+        for name, body in calls
+        if name.startswith("Delete") or name == "DescribeNetworkInterfaces"
+    ]
+    # The unused group goes in the first round; the GuardDuty group only after
+    # the round that no longer sees the endpoint's ENI.
+    assert operations == [
+        ("DeleteVpcEndpoints", None),
+        ("DescribeNetworkInterfaces", None),
+        ("DeleteSecurityGroup", unused_sg),
+        ("DescribeNetworkInterfaces", None),
+        ("DeleteNetworkInterface", None),
+        ("DescribeNetworkInterfaces", None),
+        ("DeleteSecurityGroup", guardduty_sg),
+    ]
+    assert _group_ids(ec2_client, vpc_id, "service")
+    assert not _group_ids(ec2_client, vpc_id, "GuardDutyManagedSecurityGroup")
+
+
+def test_nothing_injected_makes_no_deletes(ec2_client, vpc):
+    vpc_id, _ = vpc
+    calls = _calls(ec2_client)
+
+    assert purge_injected_vpc_resources(ec2_client, vpc_id) == {
+        "endpoints": [],
+        "security_groups": [],
+    }
+    assert [name for name, _ in calls] == [
+        "DescribeVpcEndpoints",
+        "DescribeSecurityGroups",
+    ]
@@ -0,0 +1,120 @@
+import itertools
+
+import boto3
+import pytest
+from botocore.exceptions import WaiterError
+from botocore.stub import Stubber
+
+from tests import waiter
+from tests.unit.conftest import TEST_REGION
+from tests.waiter import Schedule, WaitTimeoutError, wait_for, wait_for_boto3
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    """
+    Replace the waiter's clock with one that only advances on sleep.
+
+    :return: The list of requested sleeps.
+    """
+    now = [0.0]
+    sleeps = []
+
+    def _sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(waiter.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(waiter.time, "sleep", _sleep)
+    return sleeps
+
+
+def test_schedule_grows_to_maximum():
+    delays = Schedule(initial=2, maximum=10, factor=2).delays()
+
+    assert list(itertools.islice(delays, 5)) == [2, 4, 8, 10, 10]
+    assert list(itertools.islice(Schedule.fixed(5).delays(), 3)) == [5, 5, 5]
+
+
+def test_wait_for_returns_the_satisfying_state(clock):
+    states = iter([0, 1, 2, 3])
+
+    assert wait_for(lambda: next(states), "three", 60, until=lambda s: s >= 3) == 3
+    assert clock == [2, 3.0, 4.5]
+
+
+def test_wait_for_timeout_reports_attempts_and_last_state(clock):
+    with pytest.raises(WaitTimeoutError) as exc_info:
+        wait_for(
+            lambda: "PENDING",
+            "the thing",
+            10,
+            until=lambda state: state == "DONE",
+            schedule=Schedule.fixed(4),
+        )
+
+    # Polls at 0, 4, 8 and, after a sleep clipped to the deadline, 10.
+    assert (exc_info.value.attempts, exc_info.value.last) == (4, "PENDING")
+    assert clock == [4, 4, 2]
+    assert "the thing" in str(exc_info.value)
+
+
+def test_wait_for_propagates_poll_errors(clock):
+    def _poll():
+        raise AssertionError("UNHEALTHY")
+
+    with pytest.raises(AssertionError, match="UNHEALTHY"):
+        wait_for(_poll, "health", 60)
+    assert clock == []
+
+
+def test_wait_for_boto3_maps_exhausted_attempts_to_timeout():
+    ecs_client = boto3.client("ecs", region_name=TEST_REGION)
+    pending = {
+        "services": [
+            {
+                "serviceName": "web",
+                "status": "ACTIVE",
+                "deployments": [{"id": "a"}, {"id": "b"}],
+                "runningCount": 0,
+                "desiredCount": 1,
+            }
+        ],
+        "failures": [],
+    }
+    with Stubber(ecs_client) as stubber:
+        for _ in range(2):
+            stubber.add_response("describe_services", pending)
+        with pytest.raises(WaitTimeoutError) as exc_info:
+            wait_for_boto3(
+                ecs_client,
+                "services_stable",
+                "web",
+                timeout_s=1,
+                delay=0.5,
+                cluster="c",
+                services=["web"],
+            )
+
+    assert exc_info.value.attempts == 2
+    assert exc_info.value.last["services"][0]["runningCount"] == 0
+
+
+def test_wait_for_boto3_passes_failure_states_through():
+    ecs_client = boto3.client("ecs", region_name=TEST_REGION)
+    with Stubber(ecs_client) as stubber:
+        stubber.add_response(
+            "describe_services",
+            {"services": [], "failures": [{"arn": "web", "reason": "MISSING"}]},
+        )
+        with pytest.raises(WaiterError) as exc_info:
+            wait_for_boto3(
+                ecs_client,
+                "services_stable",
+                "web",
+                timeout_s=60,
+                cluster="c",
+                services=["web"],
+            )
+
+    assert not isinstance(exc_info.value, WaitTimeoutError)
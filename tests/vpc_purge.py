@@ -0,0 +1,144 @@
+"""
+Delete the resources AWS injects into a test VPC, which Terraform cannot.
+
+AWS GuardDuty runtime monitoring instruments a VPC with an interface
+endpoint (``com.amazonaws.<region>.guardduty-data``) and a managed security
+group. Their dependencies decide the order: the endpoint's ENIs reference
+the security group, so the group can only go once those ENIs are gone, and
+the ENIs go a while after the endpoint is deleted.
+
+:func:`purge_injected_vpc_resources` deletes all injected endpoints at once,
+then works in rounds. Each round reads every ENI in the VPC with one
+``DescribeNetworkInterfaces`` request and deletes, in parallel, the
+security groups no ENI references any more. A group that still fails with
+``DependencyViolation`` (e.g. another group's rule references it) waits for
+the next round.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from tests.waiter import Schedule, WaitTimeoutError, wait_for
+
+LOG = logging.getLogger("tests.conftest")
+
+# Tag that the service_network fixture (and all InfraHouse fixtures) stamp on
+# every resource they create, via provider default_tags. Resources lacking it
+# were injected by AWS (e.g. GuardDuty), not by Terraform.
+FIXTURE_TAG_KEY = "created_by_fixture"
+
+MAX_WORKERS = 8
+
+
+def is_aws_injected(resource: dict) -> bool:
+    """
+    Return True if an AWS resource was created by AWS rather than the fixture.
+
+    Fixture-created resources carry the ``created_by_fixture`` tag (set via the
+    provider's default_tags). AWS-injected resources (e.g. GuardDuty runtime
+    monitoring) do not.
+
+    :param resource: A describe_* entry that has a ``Tags`` list (VPC endpoint,
+        security group, ...).
+    :return: True if the resource is not fixture-owned.
+    """
+    return not any(tag["Key"] == FIXTURE_TAG_KEY for tag in resource.get("Tags", []))
+
+
+def purge_injected_vpc_resources(
+    ec2_client, vpc_id, timeout_s=300, schedule=None, max_workers=MAX_WORKERS
+) -> dict:
+    """
+    Delete the AWS-injected endpoints and security groups of a VPC.
+
+    Returns when the injected security groups are deleted and no ENI of an
+    injected endpoint is left, or at the timeout.
+
+    :param ec2_client: Boto3 EC2 client.
+    :param vpc_id: The VPC.
+    :param timeout_s: Seconds to wait for the ENIs to clear.
+    :param schedule: Delays between rounds (default: 2 s growing to 10 s).
+    :param max_workers: Security groups deleted in parallel.
+    :return: ``{"endpoints": [...], "security_groups": [...]}``, the
+        resources deleted.
+    """
+    vpc_filter = [{"Name": "vpc-id", "Values": [vpc_id]}]
+    endpoints = [
+        endpoint["VpcEndpointId"]
+        for page in ec2_client.get_paginator("describe_vpc_endpoints").paginate(
+            Filters=vpc_filter
+        )
+        for endpoint in page["VpcEndpoints"]
+        if is_aws_injected(endpoint) and endpoint["State"].lower() != "deleted"
+    ]
+    groups = [
+        group["GroupId"]
+        for page in ec2_client.get_paginator("describe_security_groups").paginate(
+            Filters=vpc_filter
+        )
+        for group in page["SecurityGroups"]
+        if group["GroupName"] != "default" and is_aws_injected(group)
+    ]
+    if endpoints:
+        LOG.info("Deleting AWS-injected VPC endpoints: %s", endpoints)
+        ec2_client.delete_vpc_endpoints(VpcEndpointIds=endpoints)
+    if not endpoints and not groups:
+        return {"endpoints": [], "security_groups": []}
+
+    pending_endpoints = set(endpoints)
+    pending_groups = set(groups)
+    deleted_groups = []
+
+    def _delete_group(group_id):
+        try:
+            ec2_client.delete_security_group(GroupId=group_id)
+            return True
+        except ClientError as err:
+            if err.response["Error"]["Code"] == "DependencyViolation":
+                return False
+            raise
+
+    def _round(executor):
+        enis = [
+            eni
+            for page in ec2_client.get_paginator(
+                "describe_network_interfaces"
+            ).paginate(Filters=vpc_filter)
+            for eni in page["NetworkInterfaces"]
+        ]
+        # An endpoint's ENIs name it in their description.
+        pending_endpoints.intersection_update(
+            {
+                endpoint_id
+                for endpoint_id in pending_endpoints
+                if any(endpoint_id in eni.get("Description", "") for eni in enis)
+            }
+        )
+        referenced = {group["GroupId"] for eni in enis for group in eni["Groups"]}
+        ready = sorted(pending_groups - referenced)
+        if ready:
+            LOG.info("Deleting AWS-injected security groups: %s", ready)
+        for group_id, deleted in zip(ready, executor.map(_delete_group, ready)):
+            if deleted:
+                pending_groups.discard(group_id)
+                deleted_groups.append(group_id)
+        return {
+            "endpoint ENIs": sorted(pending_endpoints),
+            "security groups": sorted(pending_groups),
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            wait_for(
+                lambda: _round(executor),
+                f"AWS-injected resources in {vpc_id} to delete",
+                timeout_s=timeout_s,
+                until=lambda pending: not any(pending.values()),
+                schedule=schedule or Schedule(initial=2, maximum=10),
+                phase="purge AWS-injected VPC resources",
+            )
+        except WaitTimeoutError as err:
+            LOG.warning("Timed out purging AWS-injected resources: %s", err.last)
+    return {"endpoints": endpoints, "security_groups": deleted_groups}
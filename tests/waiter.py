@@ -0,0 +1,180 @@
+"""
+Wait for AWS (or any) state to converge, without hand-rolled sleep loops.
+
+:func:`wait_for` polls a function on an adaptive schedule -- often at
+first, when the state usually converges, and less often later -- until a
+predicate holds or the deadline passes, and logs progress in one format.
+:func:`wait_for_boto3` does the same through a boto3 native waiter, which
+is preferred wherever boto3 has one.
+"""
+
+import logging
+import math
+import time
+
+from botocore.exceptions import WaiterError
+
+from tests import timing
+
+# The suite's logger; tests/conftest.py attaches its handlers.
+LOG = logging.getLogger("tests.conftest")
+
+DEFAULT_PROGRESS_INTERVAL = 30
+
+
+class Schedule:
+    """
+    Delays between polls: ``initial`` seconds, growing by ``factor`` after
+    every poll, up to ``maximum``.
+
+    :param initial: First delay, in seconds.
+    :param maximum: Largest delay, in seconds.
+    :param factor: Growth factor; 1 makes the schedule fixed.
+    """
+
+    def __init__(self, initial=2, maximum=30, factor=1.5):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+
+    @classmethod
+    def fixed(cls, delay):
+        """
+        A schedule that always waits ``delay`` seconds.
+        """
+        return cls(initial=delay, maximum=delay, factor=1)
+
+    def delays(self):
+        delay = self.initial
+        while True:
+            yield delay
+            delay = min(delay * self.factor, self.maximum)
+
+
+class WaitTimeoutError(TimeoutError):
+    """
+    The waited-for state was not reached before the deadline.
+
+    :param description: What was waited for.
+    :param timeout_s: The timeout, in seconds.
+    :param attempts: Number of polls made.
+    :param last: The last polled state.
+    """
+
+    def __init__(self, description, timeout_s, attempts, last):
+        super().__init__(
+            f"Timed out after {timeout_s}s waiting for {description} "
+            f"({attempts} attempts, last: {last})"
+        )
+        self.description = description
+        self.timeout_s = timeout_s
+        self.attempts = attempts
+        self.last = last
+
+
+def wait_for(
+    poll,
+    description,
+    timeout_s,
+    until=bool,
+    schedule=None,
+    progress_interval=DEFAULT_PROGRESS_INTERVAL,
+    phase=None,
+):
+    """
+    Call ``poll`` until ``until(state)`` holds for the state it returns.
+
+    Exceptions raised by ``poll`` are not caught: a poll that detects a
+    terminal failure should raise rather than wait for the deadline.
+
+    :param poll: Returns the current state; called at least once.
+    :param description: What is waited for, e.g. ``"desiredCount >= 2"``.
+    :param timeout_s: Seconds until the deadline.
+    :param until: Returns True when the state is the wanted one
+        (default: the state is truthy).
+    :param schedule: Delays between polls (default: :class:`Schedule`).
+    :param progress_interval: Seconds between progress log lines.
+    :param phase: Name of the wait in the timing profile (default:
+        ``description``); see :func:`tests.timing.phase`.
+    :return: The state that satisfied ``until``.
+    :raises WaitTimeoutError: If the deadline passes first.
+    """
+    with timing.phase(f"wait {phase or description}"):
+        return _wait_for(
+            poll, description, timeout_s, until, schedule, progress_interval
+        )
+
+
+def _wait_for(poll, description, timeout_s, until, schedule, progress_interval):
+    schedule = schedule or Schedule()
+    start = time.monotonic()
+    deadline = start + timeout_s
+    next_progress = start + progress_interval
+    attempts = 0
+    for delay in schedule.delays():
+        attempts += 1
+        state = poll()
+        now = time.monotonic()
+        if until(state):
+            LOG.info(
+                "Done waiting for %s after %.0fs (%d attempts): %s",
+                description,
+                now - start,
+                attempts,
+                state,
+            )
+            return state
+
+        LOG.debug("Waiting for %s: attempt %d, state: %s", description, attempts, state)
+        if now >= next_progress:
+            LOG.info(
+                "Waiting for %s: %.0fs elapsed, %.0fs left, %d attempts, state: %s",
+                description,
+                now - start,
+                max(0.0, deadline - now),
+                attempts,
+                state,
+            )
+            next_progress = now + progress_interval
+        if now >= deadline:
+            raise WaitTimeoutError(description, timeout_s, attempts, state)
+        time.sleep(min(delay, deadline - now))
+
+
+def wait_for_boto3(
+    client, waiter_name, description, timeout_s, delay=15, phase=None, **kwargs
+):
+    """
+    Wait with a boto3 native waiter, with the timeout expressed in seconds.
+
+    :param client: Boto3 client that provides the waiter.
+    :param waiter_name: Waiter name, e.g. ``"services_stable"``.
+    :param description: What is waited for, for the log.
+    :param timeout_s: Seconds until the deadline.
+    :param delay: Seconds between the waiter's polls.
+    :param phase: Name of the wait in the timing profile (default:
+        ``waiter_name``).
+    :param kwargs: Arguments of the waiter's describe call.
+    :raises WaitTimeoutError: If the deadline passes first.
+    :raises WaiterError: If the waiter reaches a failure state.
+    """
+    with timing.phase(f"wait {phase or waiter_name}"):
+        _wait_for_boto3(client, waiter_name, description, timeout_s, delay, **kwargs)
+
+
+def _wait_for_boto3(client, waiter_name, description, timeout_s, delay, **kwargs):
+    start = time.monotonic()
+    LOG.info("Waiting for %s (timeout %ds)", description, timeout_s)
+    attempts = max(1, math.ceil(timeout_s / delay))
+    try:
+        client.get_waiter(waiter_name).wait(
+            WaiterConfig={"Delay": delay, "MaxAttempts": attempts}, **kwargs
+        )
+    except WaiterError as err:
+        # A failure state (e.g. the service went INACTIVE) is not a timeout.
+        if "Max attempts exceeded" not in str(err):
+            raise
+        raise WaitTimeoutError(
+            description, timeout_s, attempts, err.last_response
+        ) from err
+    LOG.info("Done waiting for %s after %.0fs", description, time.monotonic() - start)
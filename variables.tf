@@ -1091,6 +1091,19 @@ variable "enable_ecr_image_tagging" {
   default     = false
 }
 
+variable "enable_model_fetch_dashboard" {
+  description = <<-EOT
+    Add a "Model fetch" row to the GPU dashboard (gpu_count > 0) with the
+    model-fetch metrics written by docker/vllm/fetch_model.sh: fetch time,
+    cache hits and misses, download throughput and bytes from peers.
+    Enable it only if the container runs that script with
+    FETCH_METRICS_SERVICE set to service_name and enable_cloudwatch_logs
+    is on; otherwise the row stays empty.
+  EOT
+  type        = bool
+  default     = false
+}
+
 variable "ecr_image_tagger_log_level" {
   description = <<-EOT
     Log level for the ECR image tagger Lambda function.
@@ -1106,6 +1119,61 @@ variable "ecr_image_tagger_log_level" {
   }
 }
 
+variable "ecr_image_tagger_max_concurrency" {
+  description = <<-EOT
+    Maximum number of ECR repositories the image tagger Lambda tags
+    concurrently. Images from different repositories (and regions) are
+    independent, so tagging them in parallel shortens the invocation.
+    A failure on one image does not stop the others.
+  EOT
+  type        = number
+  default     = 4
+
+  validation {
+    condition     = var.ecr_image_tagger_max_concurrency >= 1 && var.ecr_image_tagger_max_concurrency <= 16 && floor(var.ecr_image_tagger_max_concurrency) == var.ecr_image_tagger_max_concurrency
+    error_message = "ecr_image_tagger_max_concurrency must be an integer between 1 and 16. Got: ${var.ecr_image_tagger_max_concurrency}"
+  }
+}
+
+variable "ecr_image_tagger_persistent_dedup" {
+  description = <<-EOT
+    When enabled, the ECR image tagger stores the last tagged task
+    definition in an SSM parameter: its ARN if every ECR image is pinned
+    by digest, otherwise the digests its tags resolved to. Periodic
+    SERVICE_STEADY_STATE events for unchanged images are then skipped
+    with a single read, even after a Lambda cold start. When disabled,
+    only the warm Lambda container remembers tagged task definitions.
+  EOT
+  type        = bool
+  default     = true
+}
+
+variable "ecr_image_tagger_image_cache" {
+  description = <<-EOT
+    When enabled, the ECR image tagger caches the image list of each
+    task definition revision in the Lambda's /tmp directory. Revisions
+    are immutable, so a warm Lambda container skips DescribeTaskDefinition
+    for a revision it has already read.
+  EOT
+  type        = bool
+  default     = true
+}
+
+variable "ecr_image_tagger_retry_max_attempts" {
+  description = <<-EOT
+    Maximum attempts of each ECR call the image tagger makes, including
+    the first. Throttled calls are retried with jittered exponential
+    backoff, shared by all concurrent repositories, and never past the
+    Lambda's remaining time.
+  EOT
+  type        = number
+  default     = 8
+  validation {
+    condition     = var.ecr_image_tagger_retry_max_attempts >= 1 && floor(var.ecr_image_tagger_retry_max_attempts) == var.ecr_image_tagger_retry_max_attempts
+    error_message = "ecr_image_tagger_retry_max_attempts must be a positive integer."
+  }
+}
+
 variable "deployed_image_tag_prefix" {
   description = <<-EOT
     Prefix for the tag applied to ECR images after successful